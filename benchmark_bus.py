@@ -0,0 +1,303 @@
+"""Measure how the OpenTherm hub uses the bus for every example configuration.
+
+For each example, ESPHome generates the code, which is then compiled for the
+host together with the stand-ins in host/ and run against the simulated boiler
+in host/boiler_simulator.py. The results are printed as a table, and can be
+saved and compared to an earlier run to catch regressions:
+
+    python benchmark_bus.py --output baseline.json
+    python benchmark_bus.py --baseline baseline.json
+
+With --micro, the time and heap allocations of building a request and processing
+its response are measured instead, without the bus in between.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+import boiler_simulator  # noqa: E402
+from compile_all import config_files, device_name, has_remote_source  # noqa: E402
+
+# Sources of the programs on the host besides their main file, like host/driver.cpp
+SOURCES = [
+    "host/hal.cpp",
+    "host/heap.cpp",
+    "host/OpenTherm.cpp",
+    "host/bus.cpp",
+    "host/preferences.cpp",
+    "components/opentherm/hub.cpp",
+    "components/opentherm/switch.cpp",
+    "components/opentherm/transceiver.cpp",
+]
+
+# Entity setters that are needed to run the hub, the rest only concerns ESPHome itself
+ENTITY_SETTERS = [
+    "set_min_value",
+    "set_max_value",
+    "set_zero_means_zero",
+    "set_mode",
+    "set_auto_min_value",
+    "set_auto_max_value",
+    "set_deadband",
+    "set_heartbeat",
+    "traits.set_min_value",
+    "traits.set_max_value",
+    "traits.set_step",
+]
+
+# Metrics where a higher value is worse, and the allowed regression
+REGRESSION_METRICS = [
+    "status_cycle_mean_ms",
+    "status_cycle_max_ms",
+    "setpoint_latency_mean_ms",
+    "setpoint_latency_max_ms",
+    "startup_ms",
+    "failed_responses",
+    "publishes_per_minute",
+    "hub_bytes",
+    "heap_bytes",
+    "allocations_per_frame",
+]
+REGRESSION_TOLERANCE = 0.1
+
+
+def extract_hub_configs(main_cpp: str) -> Dict[str, str]:
+    """Extract the configuration of every hub and its entities from the generated
+    main.cpp, by the id of the hub.
+    """
+    hubs = [match.group(1) for match in re.finditer(r"(\w+) = new esphome::opentherm::OpenthermHub\(", main_cpp)]
+    if not hubs:
+        raise ValueError("No OpenTherm hub found in generated code")
+    return {hub_var: extract_hub_config(main_cpp, hub_var) for hub_var in hubs}
+
+
+def extract_hub_config(main_cpp: str, hub_var: str) -> str:
+    """Extract the configuration of a hub and its entities from the generated main.cpp."""
+    # The driver creates all entities using the name of the hub field
+    entities: Dict[str, str] = {}
+    for match in re.finditer(rf"\b{hub_var}->set_(\w+_(?:sensor|switch|number|output))\((\w+)\);", main_cpp):
+        entities[match.group(2)] = match.group(1)
+
+    lines: List[str] = []
+    setters = "|".join(re.escape(setter) for setter in ENTITY_SETTERS)
+    for line in main_cpp.splitlines():
+        line = line.strip()
+        var = line.split("->", 1)[0]
+        if var == hub_var or (var in entities and re.match(rf"\w+->(?:{setters})\(", line)):
+            line = re.sub(r"\b\w+\b", lambda m: "hub" if m.group(0) == hub_var else entities.get(m.group(0), m.group(0)), line)
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def build_drivers(file: str, build_dir: str, cxx: str, program: str = "driver", flags: Sequence[str] = ()) -> Dict[str, str]:
+    """Generate the code for an example and compile a host program for every hub
+    in it, the driver, the micro-benchmark or the fuzzer, with extra compiler
+    flags. Returns the programs by the id of their hub.
+    """
+    directory, name = os.path.split(os.path.abspath(file))
+    subprocess.run(
+        ["esphome", "compile", "--only-generate", name],
+        cwd=directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT,
+    )
+    src = os.path.join(directory, ".esphome", "build", device_name(file), "src")
+
+    os.makedirs(os.path.join(build_dir, "esphome", "core"), exist_ok=True)
+    with open(os.path.join(src, "esphome", "core", "defines.h")) as f:
+        defines = [line for line in f if line.startswith("#define OPENTHERM_")]
+    with open(os.path.join(build_dir, "esphome", "core", "defines.h"), "w") as f:
+        f.write("#pragma once\n")
+        f.writelines(defines)
+    with open(os.path.join(src, "main.cpp")) as f:
+        hub_configs = extract_hub_configs(f.read())
+
+    # Every hub has its own bus, so each gets a program of its own
+    drivers: Dict[str, str] = {}
+    for hub_id, hub_config in hub_configs.items():
+        hub_dir = os.path.join(build_dir, hub_id)
+        os.makedirs(hub_dir, exist_ok=True)
+        with open(os.path.join(hub_dir, "hub_config.h"), "w") as f:
+            f.write(hub_config)
+
+        drivers[hub_id] = os.path.join(hub_dir, program)
+        subprocess.run(
+            [
+                # The component targets 32-bit platforms, where long and int have the same size
+                cxx, "-std=gnu++17", "-O2", "-Wall", "-Wno-unused-variable", "-Wno-format", "-DUSE_HOST",
+                "-I", os.path.join(ROOT, "host", "include"),
+                "-I", os.path.join(ROOT, "components", "opentherm"),
+                "-I", hub_dir,
+                "-I", build_dir,
+                *flags,
+                os.path.join(ROOT, "host", f"{program}.cpp"),
+                *[os.path.join(ROOT, source) for source in SOURCES],
+                "-o", drivers[hub_id],
+            ],
+            check=True,
+        )
+    return drivers
+
+
+def build_driver(file: str, build_dir: str, cxx: str, program: str = "driver", flags: Sequence[str] = ()) -> str:
+    """Like build_drivers, for a configuration with a single hub."""
+    drivers = build_drivers(file, build_dir, cxx, program, flags)
+    if len(drivers) != 1:
+        raise ValueError(f"{file} has {len(drivers)} hubs instead of one")
+    return next(iter(drivers.values()))
+
+
+def run_micro(program: str, iterations: int, log_level: int) -> Dict[str, float]:
+    """Run the micro-benchmark and get the time and allocations per frame."""
+    output = subprocess.run([program, str(iterations), str(log_level)], stdout=subprocess.PIPE, text=True, check=True).stdout
+    match = re.search(r"^FRAMES (\S+) (\S+) (\S+) (\S+)$", output, re.MULTILINE)
+    if match is None:
+        raise RuntimeError(f"Unexpected output from micro-benchmark: {output!r}")
+    frames, ns, allocations, allocated_bytes = map(float, match.groups())
+    return {
+        "frames": frames,
+        "ns_per_frame": ns,
+        "allocations_per_frame": allocations,
+        "allocated_bytes_per_frame": allocated_bytes,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> List[str]:
+    regressions = []
+    for file, metrics in results.items():
+        if file not in baseline:
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = baseline[file].get(metric, 0), metrics.get(metric, 0)
+            if new > old * (1 + REGRESSION_TOLERANCE) and new - old >= 1:
+                regressions.append(f"{file}: {metric} went from {old:.0f} to {new:.0f}")
+    return regressions
+
+
+def print_bus_results(results: Dict[str, Dict[str, float]]) -> None:
+    print(
+        f"{'Configuration':<42} {'frames/min':>10} {'Status cycle avg/max (ms)':>26} "
+        f"{'setpoint latency avg/max (ms)':>30} {'startup (ms)':>12} {'unknown':>8} {'timeouts':>8} {'failed':>8} {'violations':>10} {'publish/min':>11} {'hub RAM (B)':>11} {'heap blocks':>11}"
+    )
+    for key, summary in results.items():
+        print(
+            f"✅ {key:<38} {summary['frames_per_minute']:>10.1f} "
+            f"{summary['status_cycle_mean_ms']:>17.0f} / {summary['status_cycle_max_ms']:<6.0f} "
+            f"{summary['setpoint_latency_mean_ms']:>21.0f} / {summary['setpoint_latency_max_ms']:<6.0f} "
+            f"{summary['startup_ms']:>12} "
+            f"{summary['unknown_responses']:>8} {summary['timeouts']:>8} {summary['failed_responses']:>8} "
+            f"{summary['timing_violations'] + summary['invalid_requests']:>10} "
+            f"{summary['publishes_per_minute']:>11.1f} "
+            f"{summary['hub_bytes'] + summary['heap_bytes']:>11} {summary['heap_blocks']:>11}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Configurations to run, defaults to the examples without remote sources")
+    parser.add_argument("--duration", type=int, default=600, help="Simulated time in seconds")
+    parser.add_argument("--setpoint-period", type=int, default=60, help="Seconds between setpoint changes")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the boiler response delays")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results to this JSON file")
+    parser.add_argument("--log-level", type=int, default=1, help="ESPHome log level of the hub, 1 shows errors only")
+    parser.add_argument(
+        "--interrupt-latency", type=int, default=0,
+        help="Maximum latency of the pin interrupt in microseconds, to compare the receive paths in sync mode",
+    )
+    parser.add_argument(
+        "--min-gap", type=int, default=boiler_simulator.MIN_REQUEST_GAP,
+        help="Time in ms the simulated boiler needs between its response and the next request, to simulate a faster boiler for bus_tuning",
+    )
+    parser.add_argument(
+        "--warm-start", action="store_true",
+        help="Run every configuration twice and measure the second run, which starts with the preferences of the first",
+    )
+    parser.add_argument(
+        "--micro", action="store_true",
+        help="Measure the time and heap allocations per frame of building requests and processing responses instead",
+    )
+    parser.add_argument("--iterations", type=int, default=10000, help="Times every message is exchanged with --micro")
+    parser.add_argument("--cxx", default=os.environ.get("CXX", "g++"), help="Host C++ compiler")
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        # Examples that take the component from GitHub would measure that instead
+        # of this tree, and need their secrets
+        for file in sorted(os.listdir(os.path.join(ROOT, "examples"))):
+            path = os.path.join(ROOT, "examples", file)
+            if not file.endswith(".yaml") or file == "secrets.yaml":
+                continue
+            if has_remote_source(config_files(path)):
+                print(f"------- Skipping {file}, it uses remote sources -------")
+                continue
+            files.append(path)
+
+    status = 0
+    results: Dict[str, Dict[str, float]] = {}
+    errors: Dict[str, str] = {}
+    for file in files:
+        key = os.path.basename(file)
+        print(f"------- Benchmarking {key} -------")
+        with tempfile.TemporaryDirectory() as build_dir:
+            try:
+                drivers = build_drivers(file, build_dir, args.cxx, "microbench" if args.micro else "driver")
+                # Configurations with several hubs report each of them
+                for hub_id, driver in drivers.items():
+                    hub_key = key if len(drivers) == 1 else f"{key} {hub_id}"
+                    if args.micro:
+                        results[hub_key] = run_micro(driver, args.iterations, args.log_level)
+                        continue
+                    preferences = os.path.join(os.path.dirname(driver), "preferences.bin")
+                    for _ in range(2 if args.warm_start else 1):
+                        metrics = boiler_simulator.run(
+                            driver, args.duration, args.setpoint_period, args.seed, args.log_level, args.interrupt_latency,
+                            preferences, args.min_gap,
+                        )
+                    results[hub_key] = metrics.summary()
+                    if results[hub_key]["timing_violations"] or results[hub_key]["invalid_requests"]:
+                        status = 1
+            except (subprocess.CalledProcessError, RuntimeError, ValueError, OSError) as e:
+                errors[key] = str(e)
+                status = 1
+
+    print("======= Results =======")
+    if args.micro:
+        print(f"{'Configuration':<42} {'frames':>10} {'ns/frame':>10} {'allocations/frame':>18} {'bytes/frame':>12}")
+        for key, summary in results.items():
+            print(
+                f"✅ {key:<38} {summary['frames']:>10.0f} {summary['ns_per_frame']:>10.1f} "
+                f"{summary['allocations_per_frame']:>18.3f} {summary['allocated_bytes_per_frame']:>12.1f}"
+            )
+    else:
+        print_bus_results(results)
+    for key, error in errors.items():
+        print(f"❌ {key}")
+        print(f"  Error: {error}")
+    print("=======================")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if regressions:
+            status = 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
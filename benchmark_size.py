@@ -0,0 +1,314 @@
+"""Measure how much flash, RAM and IRAM the firmware of every example configuration takes.
+
+Besides the examples, this builds a configuration without the component as a
+reference, and configurations with the hub alone, 10 sensors and all entities,
+to show what the component costs and how it grows with the entities. Every
+firmware is built with `esphome compile` like in compile_all.py, and its ELF file
+is analysed with the size and nm tools of its toolchain. The results are printed
+as a table, and can be saved and compared to an earlier run to catch regressions:
+
+    python benchmark_size.py --output baseline.json
+    python benchmark_size.py --baseline baseline.json
+
+With --components, the synthetic configurations use the component in another
+tree, like a checkout of the base revision, to measure a baseline for them with
+the same toolchain:
+
+    python benchmark_size.py --synthetic --components ../base/components --output baseline.json
+    python benchmark_size.py --synthetic --baseline baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple
+
+from compile_all import BUILD_CACHE_DIR, compile_group, device_name
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "components"))
+
+from opentherm import schema  # noqa: E402
+
+# The synthetic configurations are written here, relative to the examples folder
+SYNTHETIC_DIR = os.path.join(".esphome", "size")
+
+# Sections of the ESP8266 and ESP32 firmware by the memory they end up in. On the
+# ESP8266, .text is the code in IRAM and the code in flash is in .irom0.text.
+SECTION_KINDS = {
+    "text": (".irom0.text", ".flash.text", ".flash.rodata", ".flash.appdesc"),
+    "data": (".data", ".rodata", ".dram0.data", ".noinit"),
+    "bss": (".bss", ".dram0.bss"),
+    "iram": (".text", ".text1", ".iram0.text", ".iram0.vectors"),
+}
+
+# Symbols of the component and the OpenTherm library, as demangled by nm
+COMPONENT_SYMBOL = re.compile(r"\besphome::opentherm::|\bOpenTherm::")
+
+# Allowed growth over the baseline in bytes. IRAM is scarce on the ESP8266, every
+# byte the component puts there is missing for the rest of the firmware, so any
+# growth fails.
+REGRESSION_TOLERANCE = {
+    "text": 1024,
+    "data": 128,
+    "bss": 128,
+    "iram": 0,
+    "opentherm_text": 256,
+    "opentherm_ram": 32,
+    "opentherm_iram": 0,
+}
+
+BASE_CONFIG = """\
+esphome:
+  name: {name}
+  platformio_options:
+    lib_deps:
+    - https://github.com/freebear-nc/opentherm_library.git
+
+external_components:
+  source:
+    type: local
+    path: {components}
+
+esp8266:
+  board: d1_mini
+
+logger:
+
+api:
+ota:
+  - platform: esphome
+wifi:
+  ap:
+    ssid: "Thermostat"
+    password: "MySecretThemostat"
+captive_portal:
+"""
+
+
+def entities_config(platform: str, keys: List[str]) -> str:
+    if not keys:
+        return ""
+    return f"{platform}:\n  - platform: opentherm\n" + "".join(f"    {key}:\n      name: \"{key}\"\n" for key in keys)
+
+
+def load_schema(components: str) -> ModuleType:
+    """Load the schema of the component in a components folder, which can be in
+    another tree with other entities than this one.
+    """
+    if os.path.samefile(components, os.path.join(ROOT, "components")):
+        return schema
+    spec = importlib.util.spec_from_file_location("base_schema", os.path.join(components, "opentherm", "schema.py"))
+    if spec is None or spec.loader is None:
+        raise ValueError(f"No OpenTherm component found in {components}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_configs(components: str = os.path.join(ROOT, "components")) -> Dict[str, str]:
+    """Get the configurations without the component, with the hub alone, with 10
+    sensors and with all entities of the schema, by file name.
+    """
+    components = os.path.abspath(components)
+    schema = load_schema(components)
+    sensors = list(schema.SENSORS.keys())
+    configs = {
+        "size-reference": "",
+        "size-entities-0": "opentherm:\n",
+        "size-entities-10": "opentherm:\n" + entities_config("sensor", sensors[:10]),
+        "size-entities-all": "opentherm:\n"
+            + entities_config("sensor", sensors + list(schema.DIAGNOSTIC_SENSORS.keys()))
+            + entities_config("binary_sensor", list(schema.BINARY_SENSORS.keys()))
+            + entities_config("switch", list(schema.SWITCHES.keys()))
+            + entities_config("number", list(schema.INPUTS.keys())),
+    }
+    return {
+        f"{name}.yaml": BASE_CONFIG.format(name=name, components=components) + config
+        for name, config in configs.items()
+    }
+
+
+def toolchain_prefix(file: str) -> Tuple[str, str]:
+    """Get the path of the ELF file of a compiled configuration, and the prefix of
+    the tools of its toolchain, like xtensa-lx106-elf-.
+    """
+    output = subprocess.run(["esphome", "idedata", file], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    idedata = json.loads(output[output.index("{"):])
+    cc_path: str = idedata["cc_path"]
+    if not cc_path.endswith("gcc"):
+        raise RuntimeError(f"Unexpected compiler {cc_path}")
+    return idedata["prog_path"], cc_path[:-len("gcc")]
+
+
+def analyse_elf(elf: str, prefix: str) -> Dict[str, int]:
+    """Sum the sizes of the sections of the firmware by the memory they take, and
+    of the symbols of the component and the library in them.
+    """
+    sections: List[Tuple[str, int, int]] = []
+    output = subprocess.run([prefix + "size", "-A", elf], stdout=subprocess.PIPE, text=True, check=True).stdout
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0].startswith(".") and parts[1].isdigit():
+            sections.append((parts[0], int(parts[1]), int(parts[2])))
+
+    def kind_of(section: str) -> str:
+        for kind, names in SECTION_KINDS.items():
+            if section in names:
+                return kind
+        return ""
+
+    result = { kind: 0 for kind in SECTION_KINDS }
+    for section, size, _ in sections:
+        kind = kind_of(section)
+        if kind:
+            result[kind] += size
+
+    component = { kind: 0 for kind in SECTION_KINDS }
+    output = subprocess.run([prefix + "nm", "-S", "-C", "--defined-only", elf], stdout=subprocess.PIPE, text=True, check=True).stdout
+    for line in output.splitlines():
+        parts = line.split(maxsplit=3)
+        if len(parts) < 4 or not COMPONENT_SYMBOL.search(parts[3]):
+            continue
+        address, size = int(parts[0], 16), int(parts[1], 16)
+        for section, section_size, section_address in sections:
+            if section_address <= address < section_address + section_size:
+                kind = kind_of(section)
+                if kind:
+                    component[kind] += size
+                break
+
+    result["opentherm_text"] = component["text"]
+    result["opentherm_ram"] = component["data"] + component["bss"]
+    result["opentherm_iram"] = component["iram"]
+    return result
+
+
+def compare(results: Dict[str, Dict[str, int]], baseline: Dict[str, Dict[str, int]]) -> List[str]:
+    regressions = []
+    for key, sizes in results.items():
+        if key not in baseline:
+            continue
+        for metric, tolerance in REGRESSION_TOLERANCE.items():
+            growth = sizes[metric] - baseline[key].get(metric, sizes[metric])
+            if growth > tolerance:
+                regressions.append(f"{key}: {metric} grew by {growth} bytes, to {sizes[metric]}")
+    return regressions
+
+
+def format_size(sizes: Dict[str, int], baseline: Optional[Dict[str, int]], metric: str, width: int) -> str:
+    """Format a size for the table, with its difference to the baseline if there is one."""
+    text = str(sizes[metric])
+    if baseline is not None and metric in baseline:
+        text += f" ({sizes[metric] - baseline[metric]:+d})"
+    return f"{text:>{width}}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Configurations to build, defaults to all examples and the synthetic configurations")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results to this JSON file")
+    parser.add_argument("--synthetic", action="store_true", help="Only build the synthetic configurations, not the examples")
+    parser.add_argument(
+        "--components", default=os.path.join(ROOT, "components"),
+        help="Folder with the component for the synthetic configurations, to measure another tree",
+    )
+    args = parser.parse_args()
+
+    files = [os.path.abspath(file) for file in args.files]
+    output_file = args.output and os.path.abspath(args.output)
+    baseline_file = args.baseline and os.path.abspath(args.baseline)
+    components = os.path.abspath(args.components)
+    os.chdir(os.path.join(ROOT, "examples"))
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+    if not files:
+        os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+        for name, config in synthetic_configs(components).items():
+            with open(os.path.join(SYNTHETIC_DIR, name), "w") as f:
+                f.write(config)
+            files.append(os.path.join(SYNTHETIC_DIR, name))
+        if not args.synthetic:
+            files += sorted(os.path.abspath(file) for file in os.listdir() if file.endswith(".yaml"))
+
+    # Configurations with the same device name share a build directory, so each
+    # group of them is built in its own process
+    groups: Dict[str, List[str]] = {}
+    for file in files:
+        groups.setdefault(device_name(file, file), []).append(file)
+
+    status = 0
+    results: Dict[str, Dict[str, int]] = {}
+    errors: Dict[str, str] = {}
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = [ executor.submit(compile_group, group) for group in groups.values() ]
+        for future in as_completed(futures):
+            for file, res, output in future.result():
+                key = os.path.basename(file)
+                print(f"------- Compiled {key} with status {res} -------")
+                if res != 0:
+                    print(output, end="")
+                    errors[key] = f"Compiling failed with status {res}"
+                    continue
+                try:
+                    elf, prefix = toolchain_prefix(file)
+                    results[key] = analyse_elf(elf, prefix)
+                except (subprocess.CalledProcessError, RuntimeError, ValueError, KeyError, OSError) as e:
+                    errors[key] = str(e)
+    if errors:
+        status = 1
+
+    baseline: Dict[str, Dict[str, int]] = {}
+    if baseline_file:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+
+    # With a baseline, every size is followed by its growth, which needs wider columns
+    extra = 9 if baseline_file else 0
+    print("======= Results =======")
+    print(
+        f"{'Configuration':<36} {'text':>{8 + extra}} {'data':>{7 + extra}} {'bss':>{7 + extra}} {'IRAM':>{7 + extra}} "
+        f"{'opentherm text':>{14 + extra}} {'RAM':>{6 + extra}} {'IRAM':>{6 + extra}}"
+    )
+    for file in files:
+        key = os.path.basename(file)
+        if key not in results:
+            continue
+        sizes, base = results[key], baseline.get(key)
+        print(
+            f"✅ {key:<32} {format_size(sizes, base, 'text', 8 + extra)} {format_size(sizes, base, 'data', 7 + extra)} "
+            f"{format_size(sizes, base, 'bss', 7 + extra)} {format_size(sizes, base, 'iram', 7 + extra)} "
+            f"{format_size(sizes, base, 'opentherm_text', 14 + extra)} {format_size(sizes, base, 'opentherm_ram', 6 + extra)} "
+            f"{format_size(sizes, base, 'opentherm_iram', 6 + extra)}"
+        )
+    for key, error in errors.items():
+        print(f"❌ {key}")
+        print(f"  Error: {error}")
+    print("=======================")
+
+    if output_file:
+        with open(output_file, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_file:
+        regressions = compare(results, baseline)
+        for key in results:
+            if key not in baseline:
+                print(f"No baseline for {key}, it was not compared")
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if regressions:
+            status = 1
+
+    return status
+
+
+# The guard is needed for the process pool, which may import this file again
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,171 @@
+import hashlib
+import json
 import os
+import re
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 
-status = 0
-results = {}
+# Hashes of the configurations that compiled successfully, together with the
+# files they include, their secrets, the component source and the ESPHome
+# version, so unchanged configurations are not compiled again. Use --force to
+# compile everything anyway.
+CACHE_FILE = os.path.join(".esphome", "compile_all_cache.json")
+# PlatformIO build cache shared between all configurations
+BUILD_CACHE_DIR = os.path.join(".esphome", "build_cache")
 
-os.chdir("examples")
+# Configurations with sources that can change without a change here, like
+# external components or packages from git, are always compiled
+REMOTE_SOURCE = re.compile(r"github://|\btype:\s*git\b|\burl:\s*https?://")
+INCLUDE = re.compile(r"!include(_dir_\w+)?\s+([^\s#]+)")
+SECRET = re.compile(r"!secret\s")
 
-for file in os.listdir():
-    if os.path.isfile(file) and file.endswith(".yaml"):
-        print(f"------- Compiling {file} -------")
-        res = os.system(f"esphome compile {file}")
-        print(f"------- Finished compiling {file} with status {res} -------")
-        status += res
-        results[file] = res
+def hash_files(files: List[str], extra: str = "") -> str:
+    h = hashlib.sha256(extra.encode())
+    for file in files:
+        h.update(file.encode())
+        try:
+            with open(file, "rb") as f:
+                h.update(f.read())
+        except OSError:
+            # A missing file fails the build, and is hashed as missing until it exists
+            h.update(b"\0")
+    return h.hexdigest()
 
-print("======= Results =======")
-for file, res in results.items():
-    print(f"{'✅' if res == 0 else '❌'} {file}")
-    if res != 0:
-        print(f"  Status: {res}")
-print("=======================")
+def esphome_version() -> str:
+    try:
+        return subprocess.run(["esphome", "version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).stdout
+    except OSError:
+        return ""
 
-if status != 0:
-    sys.exit(1)
+def config_lines(file: str) -> List[str]:
+    try:
+        with open(file) as f:
+            return [line for line in f if not line.lstrip().startswith("#")]
+    except OSError:
+        return []
+
+def config_files(file: str, files: Optional[List[str]] = None) -> List[str]:
+    # The configuration with the files it includes and the secrets they use
+    files = files if files is not None else []
+    if file in files:
+        return files
+    files.append(file)
+    folder = os.path.dirname(file)
+    for line in config_lines(file):
+        for match in INCLUDE.finditer(line):
+            path = os.path.normpath(os.path.join(folder, match.group(2).strip("\"'")))
+            if match.group(1) and os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(names):
+                        config_files(os.path.join(root, name), files)
+            else:
+                config_files(path, files)
+        if SECRET.search(line):
+            secrets = os.path.join(folder, "secrets.yaml")
+            if secrets not in files:
+                files.append(secrets)
+    return files
+
+def has_remote_source(files: List[str]) -> bool:
+    return any(REMOTE_SOURCE.search(line) for file in files for line in config_lines(file))
+
+def component_files() -> List[str]:
+    files = []
+    for root, dirs, names in os.walk(os.path.join("..", "components", "opentherm")):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        files += [os.path.join(root, name) for name in names if not name.endswith(".pyc")]
+    return sorted(files)
+
+def device_name(file: str, default: Optional[str] = None) -> str:
+    # The name in the esphome section, which is also the name of the build
+    # directory, so configurations with the same name share it. Without a name,
+    # returns the default if there is one.
+    in_esphome = False
+    with open(file) as f:
+        for line in f:
+            if re.match(r"^esphome:", line):
+                in_esphome = True
+            elif re.match(r"^\S", line):
+                in_esphome = False
+            elif in_esphome and (match := re.match(r"^\s+name:\s*[\"']?([^\"'#\s]+)", line)):
+                return match.group(1)
+    if default is not None:
+        return default
+    raise ValueError(f"No device name found in {file}")
+
+def compile_group(files: List[str]) -> List[Tuple[str, int, str]]:
+    results = []
+    env = dict(os.environ, PLATFORMIO_BUILD_CACHE_DIR=os.path.abspath(BUILD_CACHE_DIR))
+    for file in files:
+        res = subprocess.run(["esphome", "compile", file], env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        results.append((file, res.returncode, res.stdout))
+    return results
+
+def main() -> int:
+    os.chdir("examples")
+    os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+
+    force = "--force" in sys.argv[1:]
+    try:
+        with open(CACHE_FILE) as f:
+            cache: Dict[str, str] = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    components = component_files()
+    version = esphome_version()
+    files = sorted(file for file in os.listdir() if os.path.isfile(file) and file.endswith(".yaml") and file != "secrets.yaml")
+    sources = { file: config_files(file) for file in files }
+    remote = { file for file in files if has_remote_source(sources[file]) }
+    hashes = { file: hash_files(sources[file] + components, version) for file in files }
+
+    status = 0
+    results: Dict[str, int] = {}
+    skipped: List[str] = []
+    groups: Dict[str, List[str]] = {}
+    for file in files:
+        if not force and file not in remote and cache.get(file) == hashes[file]:
+            skipped.append(file)
+            results[file] = 0
+        else:
+            # A configuration without a name fails on its own
+            groups.setdefault(device_name(file, file), []).append(file)
+
+    for file in skipped:
+        print(f"------- Skipping {file}, unchanged since its last successful build -------")
+
+    # Each group of configurations sharing a build directory is compiled in its own process
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = [ executor.submit(compile_group, group) for group in groups.values() ]
+        for future in as_completed(futures):
+            group_results = future.result()
+            for file, res, output in group_results:
+                print(f"------- Compiling {file} -------")
+                print(output, end="")
+                print(f"------- Finished compiling {file} with status {res} -------")
+                status += res
+                results[file] = res
+                if res == 0 and file not in remote:
+                    cache[file] = hashes[file]
+                else:
+                    cache.pop(file, None)
+
+    with open(CACHE_FILE, "w") as f:
+        json.dump(cache, f, indent=2)
+
+    print("======= Results =======")
+    for file in files:
+        res = results[file]
+        print(f"{'✅' if res == 0 else '❌'} {file}{' (unchanged)' if file in skipped else ''}")
+        if res != 0:
+            print(f"  Status: {res}")
+    print("=======================")
+
+    return 1 if status != 0 else 0
+
+# The guard is needed for the process pool, which may import this file again
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,14 +2,19 @@ from typing import Any, Dict
 
 import esphome.codegen as cg
 import esphome.config_validation as cv
+from esphome import automation
 from esphome.components import sensor
-from esphome.const import CONF_ID
+from esphome.const import CONF_ID, CONF_TRIGGER_ID
 
 from . import const, schema, validate, generate
 
 AUTO_LOAD = [ "binary_sensor", "sensor", "switch", "number", "output" ]
 MULTI_CONF = True
 
+CONF_ON_CYCLE_COMPLETE = "on_cycle_complete"
+
+CycleCompleteTrigger = generate.opentherm_ns.class_("CycleCompleteTrigger", automation.Trigger.template())
+
 CONFIG_SCHEMA = cv.All(
     cv.Schema({
         cv.GenerateID(): cv.declare_id(generate.OpenthermHub),
@@ -24,25 +29,75 @@ CONFIG_SCHEMA = cv.All(
         cv.Optional("otc_active", False): cv.boolean,
         cv.Optional("ch2_active", False): cv.boolean,
         cv.Optional("sync_mode", False): cv.boolean,
+        cv.Optional("deferred_decoding", False): cv.boolean,
+        cv.Optional("log_frames", True): cv.boolean,
+        cv.Optional("bus_tuning"): cv.Schema({
+            cv.Optional("min_delay", "100ms"): cv.All(
+                cv.positive_time_period_milliseconds,
+                cv.Range(max=cv.TimePeriod(milliseconds=100)),
+            ),
+            cv.Optional("max_error_rate", "2%"): cv.percentage,
+        }),
+        cv.Optional("burst_init", False): cv.boolean,
+        cv.Optional("snapshot", False): cv.boolean,
+        cv.Optional("persist_capabilities", False): cv.boolean,
+        cv.Optional("adaptive_polling"): cv.All(
+            cv.Schema({
+                cv.Optional("min_interval", "0s"): cv.positive_time_period_milliseconds,
+                cv.Optional("max_interval", "5min"): cv.positive_time_period_milliseconds,
+            }),
+            validate.validate_adaptive_polling,
+        ),
+        cv.Optional(CONF_ON_CYCLE_COMPLETE): automation.validate_automation({
+            cv.GenerateID(CONF_TRIGGER_ID): cv.declare_id(CycleCompleteTrigger),
+        }),
         cv.Optional("opentherm_version", 4): cv.int_,
     }).extend(validate.create_entities_schema(schema.INPUTS, (lambda _: cv.use_id(sensor.Sensor))))
       .extend(cv.COMPONENT_SCHEMA),
     cv.only_with_arduino,
+    validate.validate_deferred_decoding,
+    validate.validate_bus_tuning,
 )
 
+FINAL_VALIDATE_SCHEMA = validate.validate_sync_mode_timer
+
 async def to_code(config: Dict[str, Any]) -> None:
     id = str(config[CONF_ID])
-    # Create the hub, passing the two callbacks defined below
+    # Create the hub, passing the three callbacks defined below
     # Since the hub is used in the callbacks, we need to define it first
-    var = cg.new_Pvariable(config[CONF_ID], cg.RawExpression(id + "_handle_interrupt"), cg.RawExpression(id + "_process_response"))
-    # Define two global callbacks to process responses on interrupt
+    var = cg.new_Pvariable(
+        config[CONF_ID],
+        cg.RawExpression(id + "_handle_interrupt"),
+        cg.RawExpression(id + "_process_response"),
+        cg.RawExpression(id + "_handle_timer"),
+    )
+    # Define global callbacks to process responses on interrupt, and to send requests
+    # from a timer interrupt in sync mode
     cg.add_global(cg.RawStatement("void IRAM_ATTR " + id + "_handle_interrupt() { " + id + "->handle_interrupt(); }"))
     cg.add_global(cg.RawStatement("void " + id + "_process_response(unsigned long response, OpenThermResponseStatus status) { " + id + "->process_response(response, status); }"))
+    cg.add_global(cg.RawStatement("void IRAM_ATTR " + id + "_handle_timer() { " + id + "->handle_timer(); }"))
     await cg.register_component(var, config)
 
     input_sensors = []
     for key, value in config.items():
-        if key != CONF_ID:
+        if key == "log_frames":
+            # Frame logging is left out completely unless a hub uses it
+            if value:
+                cg.add_define("OPENTHERM_LOG_FRAMES")
+            cg.add(var.set_log_frames(value))
+        elif key == "bus_tuning":
+            cg.add(var.set_bus_tuning(value["min_delay"].total_milliseconds, value["max_error_rate"]))
+        elif key == "persist_capabilities":
+            # Every hub stores the capabilities of its boiler under its own key
+            if value:
+                cg.add(var.set_persist_capabilities(id))
+        elif key == "adaptive_polling":
+            cg.add(var.set_adaptive_polling(value["min_interval"].total_milliseconds, value["max_interval"].total_milliseconds))
+        elif key == CONF_ON_CYCLE_COMPLETE:
+            for conf in value:
+                trigger = cg.new_Pvariable(conf[CONF_TRIGGER_ID], var)
+                await automation.build_automation(trigger, [], conf)
+        elif key != CONF_ID:
             if key in schema.INPUTS:
                 sensor = await cg.get_variable(value)
                 cg.add(getattr(var, f"set_{key}_{const.INPUT_SENSOR.lower()}")(sensor))
@@ -54,7 +109,7 @@ async def to_code(config: Dict[str, Any]) -> None:
         generate.define_has_component(const.INPUT_SENSOR, input_sensors)
         generate.define_message_handler(const.INPUT_SENSOR, input_sensors, schema.INPUTS)
         generate.define_readers(const.INPUT_SENSOR, input_sensors)
-        generate.add_messages(var, input_sensors, schema.INPUTS)
+        generate.add_messages(var, input_sensors, schema.INPUTS, config)
 
 # Use the freebear-nc forked version of OpenTherm library.
 #    cg.add_library("ihormelnyk/OpenTherm Library", "1.1.4")
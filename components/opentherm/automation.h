@@ -0,0 +1,21 @@
+#pragma once
+
+#include "esphome/core/automation.h"
+
+#include "hub.h"
+
+namespace esphome {
+namespace opentherm {
+
+// Triggered at the end of every cycle, a pass over every message that was due at
+// its start, once the responses of the cycle are published. In snapshot mode all
+// entities then hold values from the same cycle.
+class CycleCompleteTrigger : public Trigger<> {
+public:
+    explicit CycleCompleteTrigger(OpenthermHub *hub) {
+        hub->add_on_cycle_complete_callback([this]() { this->trigger(); });
+    }
+};
+
+} // namespace opentherm
+} // namespace esphome
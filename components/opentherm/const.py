@@ -8,3 +8,4 @@ SWITCH = "switch"
 NUMBER = "number"
 OUTPUT = "output"
 INPUT_SENSOR = "input_sensor"
+DIAGNOSTIC_SENSOR = "diagnostic_sensor"
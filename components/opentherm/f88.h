@@ -0,0 +1,22 @@
+#pragma once
+
+#include <cstdint>
+
+namespace esphome {
+namespace opentherm {
+
+// The f88 data format is a signed fixed point value with 8 fractional bits.
+// Conversions round to the nearest 1/256, also for negative values, and
+// saturate outside the range of the format.
+inline int16_t to_f88(float value) {
+    float scaled = value * 256.0f;
+    if (scaled >= 32767.0f) return INT16_MAX;
+    if (scaled <= -32768.0f) return INT16_MIN;
+    return (int16_t) (scaled < 0 ? scaled - 0.5f : scaled + 0.5f);
+}
+
+// 1/256 is exact, so multiplying gives the same result as dividing
+inline float from_f88(int16_t value) { return value * (1.0f / 256.0f); }
+
+} // namespace opentherm
+} // namespace esphome
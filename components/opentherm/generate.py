@@ -1,76 +1,192 @@
 from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple, TypeVar
 
 import esphome.codegen as cg
-from esphome.const import CONF_ID
+import esphome.config_validation as cv
+from esphome.const import CONF_ID, CONF_UPDATE_INTERVAL
+from esphome.core import CORE
+from esphome.coroutine import coroutine_with_priority
 
 from . import const, schema
 
 opentherm_ns = cg.esphome_ns.namespace("esphome::opentherm")
 OpenthermHub = opentherm_ns.class_("OpenthermHub", cg.Component)
 
+def get_data() -> Dict[str, Any]:
+    """Get the entities, messages and readers collected for all hubs. The defines that list
+    them are added once all components have been generated, as every hub adds its own.
+    """
+    data: Dict[str, Any] = CORE.data.setdefault(const.OPENTHERM, {})
+    if "entities" not in data:
+        data["entities"] = {}
+        data["messages"] = {}
+        data["readers"] = {}
+        data["schedules"] = {}
+        CORE.add_job(define_entity_lists)
+        CORE.add_job(define_message_handlers)
+    return data
+
 def define_has_component(component_type: str, keys: List[str]) -> None:
-    cg.add_define(
-        f"OPENTHERM_{component_type.upper()}_LIST(F, sep)", 
-        cg.RawExpression(" sep ".join(map(lambda key: f"F({key}_{component_type.lower()})", keys)))
-    )
+    entities: Dict[str, List[str]] = get_data()["entities"]
+    type_keys = entities.setdefault(component_type, [])
     for key in keys:
+        if key not in type_keys:
+            type_keys.append(key)
         cg.add_define(f"OPENTHERM_HAS_{component_type.upper()}_{key}")
 
+@coroutine_with_priority(-1000.0)
+async def define_entity_lists() -> None:
+    # The hub has a field for every entity of every hub, so each hub can use the same
+    # class. The fields of entities that are not configured for a hub stay null.
+    entities: Dict[str, List[str]] = CORE.data[const.OPENTHERM]["entities"]
+    for component_type, keys in entities.items():
+        cg.add_define(
+            f"OPENTHERM_{component_type.upper()}_LIST(F, sep)", 
+            cg.RawExpression(" sep ".join(map(lambda key: f"F({key}_{component_type.lower()})", keys)))
+        )
+
+    # Readers take the value to use for hubs that don't have the entity. Different hubs
+    # may use a different component type for the same value, like a number or an output.
+    readers: Dict[str, List[str]] = CORE.data[const.OPENTHERM]["readers"]
+    for key, fields in readers.items():
+        expression = "(default)"
+        for field in reversed(fields):
+            expression = f"(this->{field} != nullptr ? this->{field}->state : {expression})"
+        cg.add_define(f"OPENTHERM_READ_{key}(default)", cg.RawExpression(expression))
+
+    # The hub keeps its messages in lists with a fixed capacity, large enough for the
+    # hub with the most messages, not counting the ones every hub adds itself
+    schedules: Dict[str, Dict[str, Set[str]]] = CORE.data[const.OPENTHERM]["schedules"]
+    for kind in ("initial", "repeating", "bounds"):
+        size = max((len(schedule.get(kind, ())) for schedule in schedules.values()), default=0)
+        cg.add_define(f"OPENTHERM_MAX_{kind.upper()}_MESSAGES", size)
+
+def count_message(hub: cg.MockObj, kind: str, msg: str) -> None:
+    """Count a message the generated code adds to the initial, repeating or bounds
+    messages of a hub, to size its lists at compile time.
+    """
+    schedules: Dict[str, Dict[str, Set[str]]] = get_data()["schedules"]
+    schedules.setdefault(str(hub), {}).setdefault(kind, set()).add(msg)
+
 TSchema = TypeVar("TSchema", bound=schema.EntitySchema)
 
+# Component types that write their value to the boiler, rather than read it
+INPUT_COMPONENT_TYPES = [ const.SWITCH, const.NUMBER, const.OUTPUT, const.INPUT_SENSOR ]
+
 def define_message_handler(component_type: str, keys: List[str], schema_: schema.Schema[TSchema]) -> None:
+    """Add the entities of a component type to the message handler table, which
+    is defined once all components have been generated.
+    """
+    for key in keys:
+        add_message_handler_entity(schema_[key]["message"], component_type.upper(), f"{key}_{component_type.lower()}", schema_[key]["message_data"])
 
-    # The macros defined here should be able to generate things like this:
-    # // Parsing a message and publishing to sensors
+def add_message_handler_entity(msg: str, entity_type: str, field: str, msg_data: str) -> None:
+    """Add a single entry to the message handler table. The hub selects the action
+    for the entry by the entity type, which is usually the upper case component type.
+    """
+    messages: Dict[str, List[Tuple[str, str, str]]] = get_data()["messages"]
+    if msg not in messages:
+        messages[msg] = []
+    # Entities that are used by multiple hubs share a field, so they are only handled once
+    entity = (entity_type, field, msg_data)
+    if entity not in messages[msg]:
+        messages[msg].append(entity)
+
+@coroutine_with_priority(-1000.0)
+async def define_message_handlers() -> None:
+
+    # The macro defined here lists every message with all of its entities, regardless of
+    # their component type, so the hub can handle each message with a single switch case.
+    # For example, to parse a response and publish it to all sensors:
     # case OpenthermMessageID::Message:
-    #     // Can have multiple sensors here, for example for a Status message with multiple flags
+    #     // Can have multiple entities here, for example for a Status message with multiple flags
     #     this->thing_binary_sensor->publish_state(parse_flag8_lb_0(response));
-    #     this->other_binary_sensor->publish_state(parse_flag8_lb_1(response));
+    #     this->other_sensor->publish_state(parse_u8_hb(response));
     #     break;
-    # // Building a message for a write request
+    # Or to build a request, which writes the values of any input entities:
     # case OpenthermMessageID::Message: {
     #     unsigned int data = 0;
     #     data = write_flag8_lb_0(some_input_switch->state, data); // Where input_sensor can also be a number/output/switch
     #     data = write_u8_hb(some_number->state, data);
-    #     return ot->buildRequest(OpenthermMessageType::WriteData, OpenthermMessageID::Message, data);
+    #     return ot->buildRequest(OpenthermMessageType::WRITE_DATA, OpenthermMessageID::Message, data);
     # }
+    # MESSAGE receives the message id and whether it is read or written, ENTITY receives the
+    # upper case component type, so the hub can select a different action for each type.
+    # The table covers the entities of all hubs, so each hub skips the entities it doesn't have.
+    # Inputs with auto_min_value or auto_max_value also have an AUTO_MIN_VALUE or AUTO_MAX_VALUE
+    # entry for the message with their bound, so the hub can apply the bound to the input.
 
-    # There doesn't seem to be a way to combine the handlers for different components, so we'll
-    # have to call them seperately in C++.
+    messages: Dict[str, List[Tuple[str, str, str]]] = CORE.data[const.OPENTHERM]["messages"]
 
-    messages: Dict[str, List[Tuple[str, str]]] = {}
-    for key in keys:
-        msg = schema_[key]["message"]
-        if msg not in messages:
-            messages[msg] = []
-        messages[msg].append((key, schema_[key]["message_data"]))
+    def message_type(entities: List[Tuple[str, str, str]]) -> str:
+        is_write = any(entity_type in map(str.upper, INPUT_COMPONENT_TYPES) for entity_type, _, _ in entities)
+        return "WRITE_DATA" if is_write else "READ_DATA"
 
     cg.add_define(
-        f"OPENTHERM_{component_type.upper()}_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)",
+        "OPENTHERM_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)",
         cg.RawExpression(
-            " msg_sep ".join([ 
-                f"MESSAGE({msg}) "
-                + " entity_sep ".join([ f"ENTITY({key}_{component_type.lower()}, {msg_data})" for key, msg_data in keys ])
+            " msg_sep ".join([
+                f"MESSAGE({msg}, {message_type(entities)}) "
+                + " entity_sep ".join([
+                    f"ENTITY({entity_type}, {field}, {msg_data})"
+                    for entity_type, field, msg_data in entities
+                ])
                 + " postscript"
-                for msg, keys in messages.items()
+                for msg, entities in messages.items()
             ])
         )
     )
 
 def define_readers(component_type: str, keys: List[str]) -> None:
+    readers: Dict[str, List[str]] = get_data()["readers"]
     for key in keys:
-        cg.add_define(f"OPENTHERM_READ_{key}", cg.RawExpression(f"this->{key}_{component_type.lower()}->state"))
-
-def add_messages(hub: cg.MockObj, keys: List[str], schema_: schema.Schema[TSchema]):
-    messages: Set[Tuple[str, bool]] = set()
+        field = f"{key}_{component_type.lower()}"
+        fields = readers.setdefault(key, [])
+        if field not in fields:
+            fields.append(field)
+
+def get_update_interval(key: str, schema_: schema.Schema[TSchema], config: Dict[str, Any]) -> int:
+    """Get the minimum time between two requests for an entity in milliseconds,
+    either from its configuration or the default in the schema.
+    """
+    conf = config.get(key)
+    if isinstance(conf, dict) and CONF_UPDATE_INTERVAL in conf:
+        return conf[CONF_UPDATE_INTERVAL].total_milliseconds
+    return cv.positive_time_period_milliseconds(schema_[key].get("update_interval", "0s")).total_milliseconds
+
+def get_active_flags(key: str, schema_: schema.Schema[TSchema]) -> int:
+    """Get the mask of slave status flags in the Status response of which one has
+    to be set for an entity to be requested at its update interval, or 0 if it
+    is always requested.
+    """
+    if "active_while" not in schema_[key]:
+        return 0
+    flag = schema_[key]["active_while"]
+    message_data = schema.BINARY_SENSORS[flag]["message_data"]
+    if schema.BINARY_SENSORS[flag]["message"] != "Status" or not message_data.startswith("flag8_lb_"):
+        raise ValueError(f"{key} can't depend on {flag}, which is not a slave status flag")
+    return 1 << int(message_data[len("flag8_lb_"):])
+
+def add_messages(hub: cg.MockObj, keys: List[str], schema_: schema.Schema[TSchema], config: Dict[str, Any]):
+    messages: Dict[Tuple[str, bool], Tuple[int, int]] = {}
     for key in keys:
-        messages.add((schema_[key]["message"], schema_[key]["keep_updated"]))
-    for msg, keep_updated in messages:
+        message = (schema_[key]["message"], schema_[key]["keep_updated"])
+        interval = get_update_interval(key, schema_, config)
+        flags = get_active_flags(key, schema_)
+        if message in messages:
+            # A message is requested as often as the most demanding entity needs it
+            other_interval, other_flags = messages[message]
+            interval = min(other_interval, interval)
+            flags = 0 if flags == 0 or other_flags == 0 else flags | other_flags
+        messages[message] = (interval, flags)
+    for (msg, keep_updated), (interval, flags) in messages.items():
         msg_expr = cg.RawExpression(f"OpenThermMessageID::{msg}")
-        if keep_updated:
-            cg.add(hub.add_repeating_message(msg_expr))
-        else:
+        count_message(hub, "initial" if not keep_updated else "repeating", msg)
+        if not keep_updated:
             cg.add(hub.add_initial_message(msg_expr))
+        elif flags:
+            cg.add(hub.add_repeating_message(msg_expr, interval, flags))
+        else:
+            cg.add(hub.add_repeating_message(msg_expr, interval))
 
 def add_property_set(var: cg.MockObj, config_key: str, config: Dict[str, Any]) -> None:
     if config_key in config:
@@ -81,12 +197,13 @@ Create = Callable[[Dict[str, Any], str, cg.MockObj], Awaitable[cg.Pvariable]]
 def create_only_conf(create: Callable[[Dict[str, Any]], Awaitable[cg.Pvariable]]) -> Create:
     return lambda conf, _key, _hub: create(conf)
 
-async def component_to_code(component_type: str, schema_: schema.Schema[TSchema], type: cg.MockObjClass, create: Create, config: Dict[str, Any]) -> List[str]:
+async def component_to_code(component_type: str, schema_: schema.Schema[Any], type: cg.MockObjClass, create: Create, config: Dict[str, Any]) -> List[str]:
     """Generate the code for each configured component in the schema of a component type.
 
     Parameters:
     - component_type: The type of component, e.g. "sensor" or "binary_sensor"
-    - schema_: The schema for that component type, a list of available components
+    - schema_: The schema for that component type, a list of available components.
+      Entities without a message, like the diagnostic sensors, are not requested.
     - type: The type of the component, e.g. sensor.Sensor or OpenthermOutput
     - create: A constructor function for the component, which receives the config, 
       the key and the hub and should asynchronously return the new component
@@ -100,7 +217,7 @@ async def component_to_code(component_type: str, schema_: schema.Schema[TSchema]
 
     keys: List[str] = []
     for key, conf in config.items():
-        if not isinstance(conf, dict):
+        if key not in schema_ or not isinstance(conf, dict):
             continue
         id = conf[CONF_ID]
         if id and id.type == type:
@@ -109,7 +226,8 @@ async def component_to_code(component_type: str, schema_: schema.Schema[TSchema]
             keys.append(key)
 
     define_has_component(component_type, keys)
-    define_message_handler(component_type, keys, schema_)
-    add_messages(hub, keys, schema_)
+    message_keys = [ key for key in keys if "message" in schema_[key] ]
+    define_message_handler(component_type, message_keys, schema_)
+    add_messages(hub, message_keys, schema_, config)
 
     return keys
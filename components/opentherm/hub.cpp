@@ -10,6 +10,44 @@ namespace opentherm {
 
 static const char *TAG = "opentherm";
 
+// Every request and response is logged at debug level. The arguments are only
+// formatted when the opentherm tag is logged at that level, and the calls can be
+// removed altogether with log_frames: false, to save the time and flash space.
+// With multiple hubs, they are compiled in if any hub logs its frames.
+#ifdef OPENTHERM_LOG_FRAMES
+#define OPENTHERM_LOG_FRAME(...) do { if (this->log_frames) { ESP_LOGD(TAG, __VA_ARGS__); } } while (0)
+#else
+#define OPENTHERM_LOG_FRAME(...)
+#endif
+
+// Number of consecutive failed requests after which a message is considered
+// unsupported, and the interval at which unsupported messages are still requested
+static const uint8_t UNSUPPORTED_MESSAGE_FAILURES = 3;
+static const uint32_t UNSUPPORTED_MESSAGE_INTERVAL = 10 * 60 * 1000;
+// Interval at which messages are requested while none of their active flags is set
+static const uint32_t INACTIVE_MESSAGE_INTERVAL = 60 * 1000;
+// Shortest interval other than 0 with adaptive polling, so an interval that was
+// shortened to every cycle can be stretched again
+static const uint32_t ADAPTIVE_INTERVAL_STEP = 1000;
+// Interval at which the diagnostic sensors are published
+static const uint32_t DIAGNOSTICS_INTERVAL = 60 * 1000;
+// Interval at which the bounds for auto_min_value and auto_max_value are requested again,
+// and the number of unanswered requests in a row after which the boiler is considered gone
+static const uint32_t BOUNDS_INTERVAL = 60 * 60 * 1000;
+static const uint8_t BOILER_LOST_TIMEOUTS = 3;
+// Time after the last Status request at which it is sent again while initializing in
+// burst mode, so the next one is sent within a second even if the boiler takes long
+static const uint32_t BURST_STATUS_INTERVAL = 800;
+// Number of exchanges over which the bus tuning counts the failures, the step by
+// which the delay between frames is lowered after each window without too many,
+// and the shortest response timeout
+static const uint8_t BUS_TUNING_EXCHANGES = 32;
+static const uint32_t BUS_TUNING_DELAY_STEP_US = 10000;
+static const uint32_t BUS_TUNING_MIN_TIMEOUT_US = 100000;
+// Number of slots in a row that messages with changed inputs may take ahead of the
+// schedule, after which the most overdue message gets the next one
+static const uint8_t MAX_DIRTY_SLOTS = 2;
+
 namespace message_data {
     bool parse_flag8_lb_0(const unsigned long response) { return response & 0b0000000000000001; }
     bool parse_flag8_lb_1(const unsigned long response) { return response & 0b0000000000000010; }
@@ -37,10 +75,7 @@ namespace message_data {
 
     uint16_t parse_u16(const unsigned long response) { return (uint16_t) (response & 0xffff); }
     int16_t parse_s16(const unsigned long response) { return (int16_t) (response & 0xffff); }
-    float parse_f88(const unsigned long response) {
-        int16_t data = response & 0xffff;
-        return (data / 256.0f);
-    }
+    float parse_f88(const unsigned long response) { return from_f88((int16_t) (response & 0xffff)); }
 
     unsigned int write_flag8_lb_0(const bool value, const unsigned int data) { return value ? data | 0b0000000000000001 : data & 0b1111111111111110; }
     unsigned int write_flag8_lb_1(const bool value, const unsigned int data) { return value ? data | 0b0000000000000010 : data & 0b1111111111111101; }
@@ -60,11 +95,11 @@ namespace message_data {
     unsigned int write_flag8_hb_7(const bool value, const unsigned int data) { return value ? data | 0b1000000000000000 : data & 0b0111111111111111; }
     unsigned int write_u8_lb(const uint8_t value, const unsigned int data) { return (data & 0xff00) | value; }
     unsigned int write_u8_hb(const uint8_t value, const unsigned int data) { return (data & 0x00ff) | (value << 8); }
-    unsigned int write_s8_lb(const int8_t value, const unsigned int data) { return (data & 0xff00) | value; }
-    unsigned int write_s8_hb(const int8_t value, const unsigned int data) { return (data & 0x00ff) | (value << 8); }
+    unsigned int write_s8_lb(const int8_t value, const unsigned int data) { return (data & 0xff00) | (uint8_t) value; }
+    unsigned int write_s8_hb(const int8_t value, const unsigned int data) { return (data & 0x00ff) | ((uint8_t) value << 8); }
     unsigned int write_u16(const uint16_t value, const unsigned int data) { return value; }
-    unsigned int write_s16(const int16_t value, const unsigned int data) { return value; }
-    unsigned int write_f88(const float value, const unsigned int data) { return (unsigned int) (value * 256.0f); }
+    unsigned int write_s16(const int16_t value, const unsigned int data) { return (uint16_t) value; }
+    unsigned int write_f88(const float value, const unsigned int data) { return (uint16_t) to_f88(value); }
 } // namespace message_data
 
 #define OPENTHERM_IGNORE_1(x)
@@ -72,26 +107,32 @@ namespace message_data {
 
 unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
     if (request_id == OpenThermMessageID::MConfigMMemberIDcode) {
-        ESP_LOGD(TAG, "Building Member Config request with id %d", this->master_id);
+        OPENTHERM_LOG_FRAME("Building Member Config request with id %d", this->master_id);
         return ot->buildRequest(OpenThermMessageType::WRITE_DATA, OpenThermMessageID::MConfigMMemberIDcode, this->master_id);
     }
+    // The boiler's member id code identifies it for the stored capabilities, and
+    // is read even if no entity uses it
+    if (request_id == OpenThermMessageID::SConfigSMemberIDcode) {
+        OPENTHERM_LOG_FRAME("Building Slave Config request");
+        return ot->buildRequest(OpenThermMessageType::READ_DATA, OpenThermMessageID::SConfigSMemberIDcode, 0);
+    }
     // First, handle the status request. This requires special logic, because we
     // wouldn't want to inadvertently disable domestic hot water, for example.
     // It is also included in the macro-generated code below, but that will
     // never be executed, because we short-circuit it here. 
     if (request_id == OpenThermMessageID::Status) {
-        ESP_LOGD(TAG, "Building Status request");
+        OPENTHERM_LOG_FRAME("Building Status request");
         bool ch_enable = 
             this->ch_enable
             && 
             #ifdef OPENTHERM_READ_ch_enable
-                OPENTHERM_READ_ch_enable
+                OPENTHERM_READ_ch_enable(true)
             #else
                 true
             #endif 
             && 
             #ifdef OPENTHERM_READ_t_set
-                OPENTHERM_READ_t_set > 0.0
+                OPENTHERM_READ_t_set(1.0f) > 0.0
             #else
                 true
             #endif
@@ -100,7 +141,7 @@ unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
             this->dhw_enable
             && 
             #ifdef OPENTHERM_READ_dhw_enable
-                OPENTHERM_READ_dhw_enable
+                OPENTHERM_READ_dhw_enable(true)
             #else
                 true
             #endif
@@ -109,13 +150,13 @@ unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
             this->cooling_enable
             && 
             #ifdef OPENTHERM_READ_cooling_enable
-                OPENTHERM_READ_cooling_enable
+                OPENTHERM_READ_cooling_enable(true)
             #else
                 true
             #endif 
             && 
             #ifdef OPENTHERM_READ_cooling_control
-                OPENTHERM_READ_cooling_control > 0.0
+                OPENTHERM_READ_cooling_control(1.0f) > 0.0
             #else
                 true
             #endif
@@ -124,7 +165,7 @@ unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
             this->otc_active
             && 
             #ifdef OPENTHERM_READ_otc_active
-                OPENTHERM_READ_otc_active
+                OPENTHERM_READ_otc_active(true)
             #else
                 true
             #endif
@@ -133,65 +174,67 @@ unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
             this->ch2_active
             &&
             #ifdef OPENTHERM_READ_ch2_active
-                OPENTHERM_READ_ch2_active
+                OPENTHERM_READ_ch2_active(true)
             #else
                 true
             #endif
             &&
             #ifdef OPENTHERM_READ_t_set_ch2
-                OPENTHERM_READ_t_set_ch2 > 0.0
+                OPENTHERM_READ_t_set_ch2(1.0f) > 0.0
             #else
                 true
             #endif
             ;
         bool sm_active =
             #ifdef OPENTHERM_READ_sm_active
-                OPENTHERM_READ_sm_active
+                OPENTHERM_READ_sm_active(false)
             #else
                 false
             #endif
             ;
         bool dhw_block =
             #ifdef OPENTHERM_READ_dhw_block
-                OPENTHERM_READ_dhw_block
+                OPENTHERM_READ_dhw_block(false)
             #else
                 false
             #endif
             ;
-        ESP_LOGD(TAG, "Building sm active: %d - DHW Block: %d", sm_active, dhw_block);
+        OPENTHERM_LOG_FRAME("Building sm active: %d - DHW Block: %d", sm_active, dhw_block);
         return ot->buildSetBoilerStatusRequest(ch_enable, dhw_enable, cooling_enable, otc_active, ch2_active,sm_active, dhw_block);
     }
 
-    // Next, we start with the write requests from switches and other inputs,
-    // because we would want to write that data if it is available, rather than
-    // request a read for that type (in the case that both read and write are
-    // supported).
-    #define OPENTHERM_MESSAGE_WRITE_MESSAGE(msg) \
+    // Next, build the request for the message with a single lookup. Messages
+    // with input entities, like switches and numbers, are written with the
+    // current values of those entities. Other messages are simple read requests,
+    // which only change with the message id. If a message is both read by a
+    // sensor and written by an input, we write the data, as the response will
+    // contain the value anyway. With multiple hubs, a message is only written by
+    // the hubs that have one of its input entities.
+    #define OPENTHERM_MESSAGE_REQUEST_MESSAGE(msg, msg_type) \
         case OpenThermMessageID::msg: { \
-            ESP_LOGD(TAG, "Building %s write request", #msg); \
+            OPENTHERM_LOG_FRAME("Building %s request", #msg); \
+            OpenThermMessageType type = OpenThermMessageType::READ_DATA; \
             unsigned int data = 0;
-    #define OPENTHERM_MESSAGE_WRITE_ENTITY(key, msg_data) \
-            data = message_data::write_ ## msg_data(this->key->state, data);
-    #define OPENTHERM_MESSAGE_WRITE_POSTSCRIPT \
-            return ot->buildRequest(OpenThermMessageType::WRITE_DATA, request_id, data); \
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY(type, key, msg_data) \
+            OPENTHERM_MESSAGE_REQUEST_ENTITY_ ## type(key, msg_data)
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_WRITE(key, msg_data) \
+            if (this->key != nullptr) { \
+                type = OpenThermMessageType::WRITE_DATA; \
+                data = message_data::write_ ## msg_data(this->key->state, data); \
+            }
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_SENSOR OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_BINARY_SENSOR OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_SWITCH OPENTHERM_MESSAGE_REQUEST_ENTITY_WRITE
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_NUMBER OPENTHERM_MESSAGE_REQUEST_ENTITY_WRITE
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_OUTPUT OPENTHERM_MESSAGE_REQUEST_ENTITY_WRITE
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_INPUT_SENSOR OPENTHERM_MESSAGE_REQUEST_ENTITY_WRITE
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_AUTO_MIN_VALUE OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_REQUEST_ENTITY_AUTO_MAX_VALUE OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_REQUEST_POSTSCRIPT \
+            return ot->buildRequest(type, request_id, data); \
         }
     switch (request_id) {
-        OPENTHERM_SWITCH_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_WRITE_MESSAGE, OPENTHERM_MESSAGE_WRITE_ENTITY, , OPENTHERM_MESSAGE_WRITE_POSTSCRIPT, )
-        OPENTHERM_NUMBER_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_WRITE_MESSAGE, OPENTHERM_MESSAGE_WRITE_ENTITY, , OPENTHERM_MESSAGE_WRITE_POSTSCRIPT, )
-        OPENTHERM_OUTPUT_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_WRITE_MESSAGE, OPENTHERM_MESSAGE_WRITE_ENTITY, , OPENTHERM_MESSAGE_WRITE_POSTSCRIPT, )
-        OPENTHERM_INPUT_SENSOR_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_WRITE_MESSAGE, OPENTHERM_MESSAGE_WRITE_ENTITY, , OPENTHERM_MESSAGE_WRITE_POSTSCRIPT, )
-    }
-
-    // Finally, handle the simple read requests, which only change with the message id.
-    #define OPENTHERM_MESSAGE_READ_MESSAGE(msg) \
-        case OpenThermMessageID::msg: \
-        ESP_LOGD(TAG, "Building %s read request", #msg); \
-        return ot->buildRequest(OpenThermMessageType::READ_DATA, request_id, 0);
-    switch (request_id) {
-        OPENTHERM_SENSOR_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_READ_MESSAGE, OPENTHERM_IGNORE_2, , , )
-    }
-    switch (request_id) {
-        OPENTHERM_BINARY_SENSOR_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_READ_MESSAGE, OPENTHERM_IGNORE_2, , , )
+        OPENTHERM_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_REQUEST_MESSAGE, OPENTHERM_MESSAGE_REQUEST_ENTITY, , OPENTHERM_MESSAGE_REQUEST_POSTSCRIPT, )
     }
 
     // And if we get here, a message was requested which somehow wasn't handled.
@@ -201,116 +244,843 @@ unsigned int OpenthermHub::build_request(OpenThermMessageID request_id) {
     return 0;
 }
 
-OpenthermHub::OpenthermHub(void(*handle_interrupt_callback)(void), void(*process_response_callback)(unsigned long, OpenThermResponseStatus))
-    : Component(), handle_interrupt_callback(handle_interrupt_callback), process_response_callback(process_response_callback) {
+OpenthermHub::OpenthermHub(
+    void(*handle_interrupt_callback)(void),
+    void(*process_response_callback)(unsigned long, OpenThermResponseStatus),
+    void(*handle_timer_callback)(void)
+)
+    : Component(), handle_interrupt_callback(handle_interrupt_callback), process_response_callback(process_response_callback),
+      handle_timer_callback(handle_timer_callback) {
 }
 
 void IRAM_ATTR OpenthermHub::handle_interrupt() {
-    this->ot->handleInterrupt();
+    if (this->sync_mode) {
+        this->transceiver.handle_interrupt();
+    } else {
+        this->ot->handleInterrupt();
+    }
+}
+
+void IRAM_ATTR OpenthermHub::handle_timer() {
+    this->transceiver.handle_timer();
+}
+
+void OpenthermHub::add_repeating_message(OpenThermMessageID message_id, uint32_t interval, uint8_t active_flags) {
+    for (auto &message : this->repeating_messages) {
+        if (message.id == message_id) {
+            message.interval = std::min(message.interval, interval);
+            message.adaptive_interval = message.interval;
+            message.active_flags = message.active_flags == 0 || active_flags == 0 ? 0 : message.active_flags | active_flags;
+            return;
+        }
+    }
+    if (!this->repeating_messages.push_back({ message_id, interval, interval, 0, 0, 0, active_flags, false, false, false, false, false, false })) {
+        ESP_LOGE(TAG, "No room for repeating message %d", message_id);
+    }
+}
+
+void OpenthermHub::add_initial_message(OpenThermMessageID message_id) {
+    if (!this->initial_messages.contains(message_id) && !this->initial_messages.push_back(message_id)) {
+        ESP_LOGE(TAG, "No room for initial message %d", message_id);
+    }
+}
+
+void OpenthermHub::set_input_message(OpenThermMessageID message_id) {
+    for (auto &message : this->repeating_messages) {
+        if (message.id == message_id) {
+            message.writes = true;
+        }
+    }
+}
+
+void OpenthermHub::mark_message_dirty(OpenThermMessageID message_id) {
+    for (auto &message : this->repeating_messages) {
+        if (message.id == message_id) {
+            message.dirty = true;
+        }
+    }
+    // The setpoints and cooling control are also used to decide on the enable
+    // flags in the Status request, so that has to be sent again as well
+    if (message_id == OpenThermMessageID::TSet
+        || message_id == OpenThermMessageID::TsetCH2
+        || message_id == OpenThermMessageID::CoolingControl) {
+        this->mark_message_dirty(OpenThermMessageID::Status);
+    }
+}
+
+OpenThermMessageID OpenthermHub::next_repeating_message() {
+    uint32_t now = millis();
+    OpenthermRepeatingMessage* next = nullptr;
+
+    // Messages with changed input values preempt the schedule, so a new setpoint
+    // reaches the boiler in the next free slot, even if the boiler didn't answer it
+    // before. The one that waited longest goes first, except for the Status message,
+    // which is only dirty because of the setpoint that goes with it. After a few of
+    // them the schedule gets a slot, so inputs that change all the time can't hold
+    // up the Status message and the sensors.
+    if (this->dirty_slots < MAX_DIRTY_SLOTS) {
+        for (auto &message : this->repeating_messages) {
+            if (!message.dirty) {
+                continue;
+            }
+            if (next == nullptr
+                || (next->id == OpenThermMessageID::Status && message.id != OpenThermMessageID::Status)
+                || (message.id != OpenThermMessageID::Status && now - message.last_request > now - next->last_request)) {
+                next = &message;
+            }
+        }
+    }
+    this->dirty_slots = next != nullptr ? this->dirty_slots + 1 : 0;
+
+    // Otherwise pick the message that is most overdue. Messages that were never
+    // requested go first, in the order they were added. Messages with an interval
+    // of 0 are always due, so the Status message guarantees that we never stop
+    // talking to the boiler.
+    if (next == nullptr) {
+        int32_t next_overdue = 0;
+        for (auto &message : this->repeating_messages) {
+            int32_t overdue = this->overdue_time(message, now);
+            if (next == nullptr || overdue > next_overdue) {
+                next = &message;
+                next_overdue = overdue;
+            }
+        }
+    }
+
+    // The request is built from the current input values, so any changes up to
+    // this point are included and the message is no longer dirty.
+    next->last_request = now;
+    next->requested = true;
+    next->dirty = false;
+    next->pending = false;
+    return next->id;
+}
+
+bool OpenthermHub::has_dirty_message() {
+    for (auto &message : this->repeating_messages) {
+        if (message.dirty) {
+            return true;
+        }
+    }
+    return false;
+}
+
+int32_t OpenthermHub::overdue_time(const OpenthermRepeatingMessage &message, uint32_t now) {
+    if (!message.requested) {
+        return INT32_MAX;
+    }
+    uint32_t interval = message.adaptive_interval;
+    if (this->is_unsupported(message)) {
+        interval = std::max(interval, UNSUPPORTED_MESSAGE_INTERVAL);
+    } else if (!this->is_active(message, this->slave_status_flags)) {
+        interval = std::max(interval, INACTIVE_MESSAGE_INTERVAL);
+    }
+    return (int32_t) (now - message.last_request) - (int32_t) interval;
+}
+
+void OpenthermHub::start_cycle() {
+    // The Status message starts and ends the cycles, so it is not waited for
+    uint32_t now = millis();
+    for (auto &message : this->repeating_messages) {
+        message.pending = message.id != OpenThermMessageID::Status && this->overdue_time(message, now) >= 0;
+    }
+}
+
+bool OpenthermHub::is_cycle_pending() {
+    // A message that is no longer due, because it became unsupported or inactive,
+    // doesn't hold up the cycle
+    uint32_t now = millis();
+    for (auto &message : this->repeating_messages) {
+        if (message.pending && this->overdue_time(message, now) >= 0) {
+            return true;
+        }
+    }
+    return false;
+}
+
+void OpenthermHub::add_bounds_message(OpenThermMessageID message_id) {
+    this->add_initial_message(message_id);
+    this->add_repeating_message(message_id, BOUNDS_INTERVAL);
+    if (!this->bounds_messages.contains(message_id) && !this->bounds_messages.push_back(message_id)) {
+        ESP_LOGE(TAG, "No room for bounds message %d", message_id);
+    }
+}
+
+void OpenthermHub::refresh_bounds() {
+    if (this->bounds_messages.empty()) {
+        return;
+    }
+    ESP_LOGI(TAG, "Boiler is responding again, requesting the bounds of the inputs");
+    for (auto &message : this->repeating_messages) {
+        if (this->bounds_messages.contains(message.id)) {
+            // Messages that were never requested go first
+            message.requested = false;
+        }
+    }
+}
+
+void OpenthermHub::update_slave_status_flags(uint8_t flags) {
+    for (auto &message : this->repeating_messages) {
+        if (this->is_active(message, this->slave_status_flags) && !this->is_active(message, flags)) {
+            message.requested = false;
+        }
+    }
+    this->slave_status_flags = flags;
+}
+
+void OpenthermHub::apply_capabilities() {
+    ESP_LOGI(TAG, "Starting with the stored capabilities of the boiler");
+    // Bounds are applied as if they were just received
+    for (uint8_t i = 0; i < this->capabilities.response_count; i++) {
+        this->publish_response((OpenThermMessageID) this->capabilities.response_ids[i], this->capabilities.response_data[i], true);
+    }
+    // Unsupported messages start their schedule now, instead of being tried three times
+    uint32_t now = millis();
+    for (auto &message : this->repeating_messages) {
+        if (!message.writes && (this->capabilities.unsupported[message.id / 8] & (1 << (message.id % 8)))) {
+            message.failures = UNSUPPORTED_MESSAGE_FAILURES;
+            message.last_request = now;
+            message.requested = true;
+        }
+    }
+    this->capabilities_cached = true;
+}
+
+void OpenthermHub::update_capabilities(OpenThermMessageID message_id, uint16_t data) {
+    uint8_t i = 0;
+    while (i < this->capabilities.response_count && this->capabilities.response_ids[i] != message_id) {
+        i++;
+    }
+    if (i < this->capabilities.response_count && this->capabilities.response_data[i] == data) {
+        return;
+    }
+
+    // Another boiler, or one with a new firmware, may support other messages
+    bool identity = message_id == OpenThermMessageID::SConfigSMemberIDcode
+        || message_id == OpenThermMessageID::SlaveVersion
+        || message_id == OpenThermMessageID::OpenThermVersionSlave;
+    if (identity && i < this->capabilities.response_count) {
+        ESP_LOGW(TAG, "Boiler differs from the one the stored capabilities are from, learning them again");
+        for (auto &message : this->repeating_messages) {
+            if (this->is_unsupported(message)) {
+                message.failures = 0;
+                message.requested = false;
+            }
+        }
+        this->capabilities = {};
+        this->capabilities_cached = false;
+        i = 0;
+    }
+
+    if (i == this->capabilities.response_count) {
+        if (i == OPENTHERM_CACHED_RESPONSES) {
+            return;
+        }
+        this->capabilities.response_ids[i] = message_id;
+        this->capabilities.response_count++;
+    }
+    this->capabilities.response_data[i] = data;
+    this->capabilities_changed = true;
+}
+
+void OpenthermHub::set_unsupported(OpenThermMessageID message_id, bool unsupported) {
+    // Only changes are stored, to spare the flash
+    uint8_t mask = 1 << (message_id % 8);
+    if (((this->capabilities.unsupported[message_id / 8] & mask) != 0) == unsupported) {
+        return;
+    }
+    this->capabilities.unsupported[message_id / 8] ^= mask;
+    this->capabilities_changed = true;
+}
+
+bool OpenthermHub::is_unsupported(const OpenthermRepeatingMessage &message) {
+    return message.failures >= UNSUPPORTED_MESSAGE_FAILURES;
+}
+
+void OpenthermHub::update_message_support(OpenThermMessageID message_id, bool supported) {
+    // We always need the Status message to keep communicating with the boiler
+    if (message_id == OpenThermMessageID::Status) {
+        return;
+    }
+
+    for (auto &message : this->repeating_messages) {
+        if (message.id != message_id) {
+            continue;
+        }
+        if (supported) {
+            if (this->is_unsupported(message)) {
+                ESP_LOGI(TAG, "Boiler responded to request with id %d again, resuming its normal schedule", message_id);
+            }
+            // The message may still be stored as unsupported after reset_message_support
+            this->set_unsupported(message_id, false);
+            message.failures = 0;
+        } else if (!message.writes && !this->is_unsupported(message)) {
+            message.failures++;
+            if (this->is_unsupported(message)) {
+                ESP_LOGW(
+                    TAG, "Boiler does not seem to support request with id %d, only sending it every %" PRIu32 " s from now on",
+                    message_id, UNSUPPORTED_MESSAGE_INTERVAL / 1000
+                );
+                this->set_unsupported(message_id, true);
+            }
+        }
+        return;
+    }
+}
+
+void OpenthermHub::reset_message_support() {
+    for (auto &message : this->repeating_messages) {
+        if (this->is_unsupported(message)) {
+            // Messages that were never requested go first
+            message.requested = false;
+        }
+        message.failures = 0;
+    }
 }
 
 void OpenthermHub::process_response(unsigned long response, OpenThermResponseStatus status) {
     OpenThermMessageID msgId = ot->getDataID(response);
+    OpenThermMessageType type = ot->getMessageType(response);
+
+    // A missing response to a message the boiler answered before is a failure of the
+    // bus, like a garbled response. A missing response to any other message counts
+    // against the message instead, below.
+    bool lost = false;
+    if (status == OpenThermResponseStatus::TIMEOUT) {
+        for (auto &message : this->repeating_messages) {
+            if (message.id == this->current_request_id) {
+                lost = message.has_data && !this->is_unsupported(message);
+            }
+        }
+    }
+
+    // For the bus tuning, responses for unknown messages or without data are answers
+    // all the same
+    if (this->bus_tuning && this->sync_mode) {
+        bool failed = status == OpenThermResponseStatus::TIMEOUT
+            ? lost
+            : !ot->isValidResponse(response)
+                && (OpenTherm::parity(response) || (type != OpenThermMessageType::UNKNOWN_DATA_ID && type != OpenThermMessageType::DATA_INVALID));
+        this->tune_bus(failed, status != OpenThermResponseStatus::TIMEOUT && !failed);
+    }
+
+    // Keep track of the statistics for the diagnostic sensors
+    if (status == OpenThermResponseStatus::TIMEOUT) {
+        this->timeouts++;
+        if (this->consecutive_timeouts < BOILER_LOST_TIMEOUTS) {
+            this->consecutive_timeouts++;
+        }
+    } else {
+        // A boiler that answers again after a while may have restarted with different
+        // bounds and support for other messages
+        if (this->consecutive_timeouts >= BOILER_LOST_TIMEOUTS) {
+            this->reset_message_support();
+            this->refresh_bounds();
+        }
+        this->consecutive_timeouts = 0;
+        this->latency_last = millis() - this->request_timestamp;
+        this->latency_sum += this->latency_last;
+        this->latency_max = std::max(this->latency_max, this->latency_last);
+        this->latency_count++;
+        if (!OpenTherm::parity(response) && type == OpenThermMessageType::UNKNOWN_DATA_ID) {
+            this->unknown_ids++;
+        } else if (!ot->isValidResponse(response)) {
+            this->invalid_responses++;
+        }
+    }
 
     // First check if the response is valid and short-circuit execution if it isn't.
     if (!ot->isValidResponse(response)) {
         ESP_LOGW(
             TAG, 
-            "Received invalid OpenTherm response (id: %u): %08x, status=%s, type=%s", msgId, response,
-            ot->statusToString(ot->getLastResponseStatus()),
+            "Received invalid OpenTherm response (id: %u): %08" PRIx32 ", status=%s, type=%s", msgId, (uint32_t) response,
+            ot->statusToString(status),
             ot->messageTypeToString(ot->getMessageType(response))
         );
+        // A correctly transmitted response indicating that the boiler doesn't know
+        // the message or has no data for it counts against the request, and so does
+        // a missing response while the boiler answered the request before it, unless
+        // it was lost on the bus. When the boiler is gone, every request times out,
+        // which says nothing about the messages. Other invalid responses are likely
+        // caused by interference.
+        bool rejected = !OpenTherm::parity(response)
+            && (type == OpenThermMessageType::UNKNOWN_DATA_ID || type == OpenThermMessageType::DATA_INVALID);
+        bool missed = status == OpenThermResponseStatus::TIMEOUT && this->consecutive_timeouts == 1 && !lost;
+        if (rejected || missed) {
+            this->update_message_support(this->current_request_id, false);
+        }
         return;
     }
 
-    ESP_LOGD(TAG, "Received OpenTherm response with id %d: %s", msgId, String(response, HEX).c_str());
+    this->update_message_support(this->current_request_id, true);
+
+    OPENTHERM_LOG_FRAME("Received OpenTherm response with id %d: %08" PRIx32, msgId, (uint32_t) response);
+
+    // Most responses repeat the data of the previous one, which is then neither
+    // decoded nor published again, except to sensors with a heartbeat. In snapshot
+    // mode the data is kept until the end of the cycle.
+    uint16_t data = response & 0xFFFF;
+    if (msgId == OpenThermMessageID::Status) {
+        this->update_slave_status_flags(data & 0xFF);
+    }
+    if (this->persist_capabilities && type == OpenThermMessageType::READ_ACK && this->initial_messages.contains(msgId)) {
+        this->update_capabilities(msgId, data);
+    }
+    for (auto &message : this->repeating_messages) {
+        if (message.id == msgId) {
+            // The Status message marks the cycles, so it keeps its interval, and so do
+            // the values configured to be read every cycle, which control depends on
+            if (this->adaptive_polling && message.has_data && type == OpenThermMessageType::READ_ACK
+                && msgId != OpenThermMessageID::Status && message.interval != 0) {
+                this->adapt_interval(message, message.last_data != data);
+            }
+            message.changed = message.changed || !message.has_data || message.last_data != data;
+            message.last_data = data;
+            message.has_data = true;
+            if (!this->snapshot) {
+                this->publish_response(msgId, data, message.changed);
+                message.changed = false;
+            }
+            return;
+        }
+    }
+    // Messages that are only sent once are published right away
+    this->publish_response(msgId, data, true);
+}
+
+void OpenthermHub::adapt_interval(OpenthermRepeatingMessage &message, bool data_changed) {
+    // The configured interval stays within the bounds, so a value that changes as
+    // expected is requested as configured. A changed value halves the interval and
+    // an unchanged one doubles it, which settles where about half the requests
+    // see a new value.
+    uint32_t min_interval = std::min(message.interval, this->adaptive_min_interval);
+    uint32_t max_interval = std::max(message.interval, this->adaptive_max_interval);
+    if (data_changed) {
+        uint32_t interval = message.adaptive_interval / 2;
+        message.adaptive_interval = interval < ADAPTIVE_INTERVAL_STEP ? min_interval : std::max(interval, min_interval);
+    } else {
+        message.adaptive_interval = std::min(std::max(message.adaptive_interval * 2, ADAPTIVE_INTERVAL_STEP), max_interval);
+    }
+}
+
+void OpenthermHub::publish_response(OpenThermMessageID message_id, uint32_t data, bool data_changed) {
+    uint32_t now = millis();
 
-    // Define the handler helpers to publish the results to all sensors
-    #define OPENTHERM_MESSAGE_RESPONSE_MESSAGE(msg) \
+    // Define the handler helpers to publish the results to all sensors and binary
+    // sensors. Inputs only write their values, so they ignore the response, but
+    // they do take the bounds reported by the boiler if configured to.
+    #define OPENTHERM_MESSAGE_RESPONSE_MESSAGE(msg, msg_type) \
         case OpenThermMessageID::msg: \
-            ESP_LOGD(TAG, "Received %s response", #msg);
-    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY(key, msg_data) \
-            this->key->publish_state(message_data::parse_ ## msg_data(response));
+            OPENTHERM_LOG_FRAME("Received %s response", #msg);
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY(type, key, msg_data) \
+            OPENTHERM_MESSAGE_RESPONSE_ENTITY_ ## type(key, msg_data)
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_SENSOR(key, msg_data) \
+            if (this->key != nullptr && (data_changed || this->key->is_heartbeat_due(now))) { \
+                this->key->publish_filtered(message_data::parse_ ## msg_data(data), now); \
+            }
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_BINARY_SENSOR(key, msg_data) \
+            if (this->key != nullptr && data_changed) { \
+                this->key->publish_state(message_data::parse_ ## msg_data(data)); \
+            }
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_SWITCH OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_NUMBER OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_OUTPUT OPENTHERM_IGNORE_2
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_INPUT_SENSOR OPENTHERM_IGNORE_2
+    // A bound that would leave no valid values, like a maximum of 0 from a boiler
+    // that doesn't fill in the message, is ignored.
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_AUTO_BOUND(key, msg_data, bound, name, valid) \
+            if (this->key != nullptr && this->key->auto_ ## bound && data_changed) { \
+                float value = message_data::parse_ ## msg_data(data); \
+                if (valid) { \
+                    ESP_LOGD(TAG, "Setting %s of %s to %.1f, as reported by the boiler", name, #key, value); \
+                    this->key->set_ ## bound(value); \
+                    this->key->clamp_to_bounds(); \
+                } else { \
+                    ESP_LOGW(TAG, "Ignoring %s of %.1f for %s reported by the boiler", name, value, #key); \
+                } \
+            }
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_AUTO_MIN_VALUE(key, msg_data) \
+            OPENTHERM_MESSAGE_RESPONSE_ENTITY_AUTO_BOUND(key, msg_data, min_value, "minimum", value <= this->key->get_max_value())
+    #define OPENTHERM_MESSAGE_RESPONSE_ENTITY_AUTO_MAX_VALUE(key, msg_data) \
+            OPENTHERM_MESSAGE_RESPONSE_ENTITY_AUTO_BOUND(key, msg_data, max_value, "maximum", value >= this->key->get_min_value())
     #define OPENTHERM_MESSAGE_RESPONSE_POSTSCRIPT \
             break;
 
-    // Then use those to create a switch statement for each thing we would want
-    // to report. We use a separate switch statement for each type, because some
-    // messages include results for multiple types, like flags and a number.
-    switch (msgId) {
-        OPENTHERM_SENSOR_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_RESPONSE_MESSAGE, OPENTHERM_MESSAGE_RESPONSE_ENTITY, , OPENTHERM_MESSAGE_RESPONSE_POSTSCRIPT, )
+    // Then use those to create a single switch statement, which publishes the
+    // response to every entity of the message, like the flags and the number in
+    // the ASFflags message.
+    switch (message_id) {
+        OPENTHERM_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_RESPONSE_MESSAGE, OPENTHERM_MESSAGE_RESPONSE_ENTITY, , OPENTHERM_MESSAGE_RESPONSE_POSTSCRIPT, )
     }
-    switch (msgId) {
-        OPENTHERM_BINARY_SENSOR_MESSAGE_HANDLERS(OPENTHERM_MESSAGE_RESPONSE_MESSAGE, OPENTHERM_MESSAGE_RESPONSE_ENTITY, , OPENTHERM_MESSAGE_RESPONSE_POSTSCRIPT, )
+}
+
+void OpenthermHub::complete_cycle() {
+    if (this->snapshot) {
+        for (auto &message : this->repeating_messages) {
+            if (message.has_data) {
+                this->publish_response(message.id, message.last_data, message.changed);
+                message.changed = false;
+            }
+        }
     }
+    this->cycle_complete_callback.call();
 }
 
 void OpenthermHub::setup() {
     ESP_LOGD(TAG, "Setting up OpenTherm component");
-    this->ot = new OpenTherm(this->in_pin, this->out_pin, false);
-    this->ot->begin(this->handle_interrupt_callback, this->process_response_callback);
+    this->ot = new (this->ot_storage) OpenTherm(this->in_pin, this->out_pin, false);
+    // In sync mode the library is only used to build and check frames
+    this->transceiver.set_deferred_decoding(this->deferred_decoding);
+    if (this->sync_mode && !this->transceiver.setup(this->in_pin, this->out_pin, this->handle_interrupt_callback, this->handle_timer_callback)) {
+        ESP_LOGE(TAG, "No hardware timer available for sync mode, falling back to normal mode");
+        this->sync_mode = false;
+    }
+    if (!this->sync_mode) {
+        this->ot->begin(this->handle_interrupt_callback, this->process_response_callback);
+    }
 
     this->add_initial_message(OpenThermMessageID::MConfigMMemberIDcode);
     // Ensure that there is at least one request, as we are required to
     // communicate at least once every second. Sending the status request is
     // good practice anyway.
-    this->add_repeating_message(OpenThermMessageID::Status);
+    this->add_repeating_message(OpenThermMessageID::Status, 0);
+
+    if (this->persist_capabilities) {
+        this->add_initial_message(OpenThermMessageID::SConfigSMemberIDcode);
+        this->capabilities_pref = global_preferences->make_preference<OpenthermCapabilities>(this->capabilities_key, true);
+        this->capabilities_loaded = this->capabilities_pref.load(&this->capabilities)
+            && this->capabilities.response_count <= OPENTHERM_CACHED_RESPONSES;
+        if (!this->capabilities_loaded) {
+            this->capabilities = {};
+        }
+    }
+
+    // Mark messages as dirty when one of their input values changes, so the new
+    // value is written to the boiler without waiting for its turn. Entities like
+    // numbers call their callbacks for every state they publish, so only an actual
+    // change counts.
+    #define OPENTHERM_DIRTY_MESSAGE(msg, msg_type) \
+        { \
+            OPENTHERM_DIRTY_MESSAGE_ ## msg_type(msg)
+    #define OPENTHERM_DIRTY_MESSAGE_WRITE_DATA(msg) \
+            OpenThermMessageID message_id = OpenThermMessageID::msg;
+    #define OPENTHERM_DIRTY_MESSAGE_READ_DATA(msg)
+    #define OPENTHERM_DIRTY_ENTITY(type, key, msg_data) \
+            OPENTHERM_DIRTY_ENTITY_ ## type(key, msg_data)
+    #define OPENTHERM_DIRTY_ENTITY_INPUT(key, msg_data) \
+            if (this->key != nullptr) { \
+                this->set_input_message(message_id); \
+                this->key->add_on_state_callback([this, message_id, last = NAN](auto state) mutable { \
+                    if ((float) state != last && !(std::isnan(last) && std::isnan((float) state))) { \
+                        last = state; \
+                        this->mark_message_dirty(message_id); \
+                    } \
+                }); \
+            }
+    #define OPENTHERM_DIRTY_ENTITY_SENSOR OPENTHERM_IGNORE_2
+    #define OPENTHERM_DIRTY_ENTITY_BINARY_SENSOR OPENTHERM_IGNORE_2
+    #define OPENTHERM_DIRTY_ENTITY_SWITCH OPENTHERM_DIRTY_ENTITY_INPUT
+    #define OPENTHERM_DIRTY_ENTITY_NUMBER OPENTHERM_DIRTY_ENTITY_INPUT
+    #define OPENTHERM_DIRTY_ENTITY_OUTPUT OPENTHERM_DIRTY_ENTITY_INPUT
+    #define OPENTHERM_DIRTY_ENTITY_INPUT_SENSOR OPENTHERM_DIRTY_ENTITY_INPUT
+    #define OPENTHERM_DIRTY_ENTITY_AUTO_MIN_VALUE OPENTHERM_IGNORE_2
+    #define OPENTHERM_DIRTY_ENTITY_AUTO_MAX_VALUE OPENTHERM_IGNORE_2
+    #define OPENTHERM_DIRTY_POSTSCRIPT \
+        }
+    OPENTHERM_MESSAGE_HANDLERS(OPENTHERM_DIRTY_MESSAGE, OPENTHERM_DIRTY_ENTITY, , OPENTHERM_DIRTY_POSTSCRIPT, )
 
     this->current_message_iterator = this->initial_messages.begin();
+    if (this->burst_init) {
+        // The loop runs every 16 ms by default, which would add up to that to every gap
+        this->high_freq.start();
+    }
 }
 
 void OpenthermHub::on_shutdown() {
-    this->ot->end();
+    if (this->sync_mode) {
+        this->transceiver.end();
+    } else {
+        this->ot->end();
+    }
 }
 
 void OpenthermHub::loop() {
-    if (this->ot->isReady()) {
+    // The entities are all set up by now, so they can take the stored values
+    if (this->capabilities_loaded) {
+        this->capabilities_loaded = false;
+        this->apply_capabilities();
+    }
+
+    if (this->sync_mode ? this->transceiver.is_ready() : this->ot->isReady()) {
         if (this->initializing && this->current_message_iterator == this->initial_messages.end()) {
             this->initializing = false;
-            this->current_message_iterator = this->repeating_messages.begin();
-        } else if (this->current_message_iterator == this->repeating_messages.end()) {
-            this->current_message_iterator = this->repeating_messages.begin();
+            this->capabilities_cached = false;
+            this->high_freq.stop();
         }
 
-        unsigned long request = this->build_request(*this->current_message_iterator);
-        if (this->sync_mode)
-        {
-            ESP_LOGD(TAG, "Sending SYNC OpenTherm request with id %d: %s", ot->getDataID(request), String(request, HEX).c_str());
-            this->ot->sendRequest(request);
+        // With stored capabilities, the initial messages only revalidate them, so the
+        // schedule with the setpoints and Status message gets every other slot
+        bool initial = this->initializing;
+        if (initial && this->capabilities_cached) {
+            this->initial_turn = !this->initial_turn;
+            initial = this->initial_turn;
         }
-        else
-        {
+
+        // A burst of initial messages is interrupted by the Status message, which
+        // carries the enable flags and keeps the boiler in contact, and by changed
+        // inputs, so the first setpoint isn't held up by the burst
+        bool keepalive = this->initializing && this->burst_init
+            && (!this->status_requested || millis() - this->status_timestamp >= BURST_STATUS_INTERVAL);
+        if (initial && !keepalive && this->burst_init && this->has_dirty_message()) {
+            initial = false;
+        }
+
+        OpenThermMessageID request_id;
+        if (keepalive || initial) {
+            if (keepalive) {
+                request_id = OpenThermMessageID::Status;
+            } else {
+                request_id = *this->current_message_iterator;
+                this->current_message_iterator++;
+            }
+            // Repeating messages that are also initial messages, like the bounds,
+            // and the Status keepalive start their schedule now, so they aren't
+            // requested twice in a row
+            for (auto &message : this->repeating_messages) {
+                if (message.id == request_id) {
+                    message.last_request = millis();
+                    message.requested = true;
+                    message.pending = false;
+                }
+            }
+        } else {
+            request_id = this->next_repeating_message();
+        }
+
+        this->current_request_id = request_id;
+        this->request_timestamp = millis();
+        this->period_requests++;
+        // A cycle ends with the first Status request after every message that was due
+        // at its start has been requested, so it is a full pass over the schedule, and
+        // the next cycle starts with that Status request
+        bool cycle_completed = false;
+        if (request_id == OpenThermMessageID::Status) {
+            if (!this->is_cycle_pending()) {
+                if (this->status_requested) {
+                    this->cycle_time = this->request_timestamp - this->cycle_timestamp;
+                    cycle_completed = true;
+                }
+                this->cycle_timestamp = this->request_timestamp;
+                this->start_cycle();
+            }
+            this->status_timestamp = this->request_timestamp;
+            this->status_requested = true;
+        }
+        unsigned long request = this->build_request(request_id);
+        if (this->sync_mode) {
+            // Returns immediately, the timer interrupt sends the request
+            this->transceiver.send_request_async(request);
+        } else {
             this->ot->sendRequestAsync(request);
-            ESP_LOGD(TAG, "Sent OpenTherm request with id %d: %s", ot->getDataID(request), String(request, HEX).c_str());
         }
-        this->current_message_iterator++;
+        OPENTHERM_LOG_FRAME("Sent OpenTherm request with id %d: %08" PRIx32, ot->getDataID(request), (uint32_t) request);
+
+        // Finish the previous cycle while the boiler works on the response
+        if (cycle_completed) {
+            this->complete_cycle();
+        }
+    }
+
+    if (this->sync_mode) {
+        uint32_t response;
+        OpenThermResponseStatus status;
+        if (this->transceiver.process(response, status)) {
+            this->process_response(response, status);
+        }
+    } else {
+        this->ot->process();
+    }
+
+    // Only store what was learned from a complete set of initial messages
+    if (this->persist_capabilities && this->capabilities_changed && !this->initializing) {
+        this->capabilities_changed = false;
+        this->capabilities_pref.save(&this->capabilities);
+    }
+
+    if (millis() - this->diagnostics_timestamp >= DIAGNOSTICS_INTERVAL) {
+        this->publish_diagnostics();
+    }
+}
+
+void OpenthermHub::tune_bus(bool failed, bool answered) {
+    this->tuning_exchanges++;
+    if (failed) {
+        this->tuning_failures++;
+    } else if (answered) {
+        this->tuning_response_delay_max = std::max(this->tuning_response_delay_max, this->transceiver.get_response_delay());
+    }
+    if (this->tuning_exchanges < BUS_TUNING_EXCHANGES) {
+        return;
+    }
+
+    // A boiler that gets a request too soon after its response may answer it wrongly
+    // or not at all, and a response that comes after the timeout is missed as well,
+    // so with too many failures both go back to the timing of the library right away,
+    // and the delay won't go as low again. Otherwise the delay is lowered step by step,
+    // and the timeout is set to twice the longest time the boiler took to respond,
+    // plus the time the response itself takes. Any error rate above 0 allows at least
+    // one failure per window.
+    uint8_t allowed = (uint8_t) ceilf(this->tuning_max_error_rate * BUS_TUNING_EXCHANGES);
+    uint32_t delay = this->transceiver.get_request_delay();
+    uint32_t timeout = this->transceiver.get_response_timeout();
+    if (this->tuning_failures > allowed) {
+        if (delay < OPENTHERM_REQUEST_DELAY_US) {
+            this->tuning_delay_floor = std::max(this->tuning_delay_floor, std::min(delay + BUS_TUNING_DELAY_STEP_US, OPENTHERM_REQUEST_DELAY_US));
+        }
+        delay = OPENTHERM_REQUEST_DELAY_US;
+        timeout = OPENTHERM_RESPONSE_TIMEOUT_US;
+    } else {
+        delay = std::max(delay - std::min(delay, BUS_TUNING_DELAY_STEP_US), this->tuning_delay_floor);
+        if (this->tuning_response_delay_max > 0) {
+            timeout = std::min(timeout, std::max(2 * this->tuning_response_delay_max, BUS_TUNING_MIN_TIMEOUT_US) + OPENTHERM_FRAME_US);
+        }
     }
 
-    if (!this->sync_mode)
-      this->ot->process();
+    if (delay != this->transceiver.get_request_delay() || timeout != this->transceiver.get_response_timeout()) {
+        ESP_LOGD(
+            TAG, "Bus tuning: %u of %u exchanges failed, delay %" PRIu32 " ms, timeout %" PRIu32 " ms",
+            this->tuning_failures, this->tuning_exchanges, delay / 1000, timeout / 1000
+        );
+        this->transceiver.set_request_delay(delay);
+        this->transceiver.set_response_timeout(timeout);
+    }
+    this->tuning_exchanges = 0;
+    this->tuning_failures = 0;
 }
 
-#define ID(x) x
-#define SHOW2(x) #x
-#define SHOW(x) SHOW2(x)
+void OpenthermHub::publish_diagnostics() {
+    uint32_t now = millis();
+    uint32_t elapsed = now - this->diagnostics_timestamp;
+
+    // Latencies are only published if there were any responses in this period
+    if (this->latency_count > 0) {
+        #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_latency_last
+            if (this->bus_latency_last_diagnostic_sensor != nullptr) {
+                this->bus_latency_last_diagnostic_sensor->publish_state(this->latency_last);
+            }
+        #endif
+        #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_latency_avg
+            if (this->bus_latency_avg_diagnostic_sensor != nullptr) {
+                this->bus_latency_avg_diagnostic_sensor->publish_state((float) this->latency_sum / this->latency_count);
+            }
+        #endif
+        #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_latency_max
+            if (this->bus_latency_max_diagnostic_sensor != nullptr) {
+                this->bus_latency_max_diagnostic_sensor->publish_state(this->latency_max);
+            }
+        #endif
+    }
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_cycle_time
+        if (this->bus_cycle_time_diagnostic_sensor != nullptr && this->cycle_time > 0) {
+            this->bus_cycle_time_diagnostic_sensor->publish_state(this->cycle_time);
+        }
+    #endif
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_frames_per_minute
+        if (this->bus_frames_per_minute_diagnostic_sensor != nullptr) {
+            this->bus_frames_per_minute_diagnostic_sensor->publish_state(this->period_requests * 60000.0f / elapsed);
+        }
+    #endif
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_invalid_responses
+        if (this->bus_invalid_responses_diagnostic_sensor != nullptr) {
+            this->bus_invalid_responses_diagnostic_sensor->publish_state(this->invalid_responses);
+        }
+    #endif
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_timeouts
+        if (this->bus_timeouts_diagnostic_sensor != nullptr) {
+            this->bus_timeouts_diagnostic_sensor->publish_state(this->timeouts);
+        }
+    #endif
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_unknown_ids
+        if (this->bus_unknown_ids_diagnostic_sensor != nullptr) {
+            this->bus_unknown_ids_diagnostic_sensor->publish_state(this->unknown_ids);
+        }
+    #endif
+    // Without sync mode, the library always uses its own timing
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_request_delay
+        if (this->bus_request_delay_diagnostic_sensor != nullptr) {
+            uint32_t delay = this->sync_mode ? this->transceiver.get_request_delay() : OPENTHERM_REQUEST_DELAY_US;
+            this->bus_request_delay_diagnostic_sensor->publish_state(delay / 1000.0f);
+        }
+    #endif
+    #ifdef OPENTHERM_HAS_DIAGNOSTIC_SENSOR_bus_response_timeout
+        if (this->bus_response_timeout_diagnostic_sensor != nullptr) {
+            uint32_t timeout = this->sync_mode ? this->transceiver.get_response_timeout() : OPENTHERM_RESPONSE_TIMEOUT_US;
+            this->bus_response_timeout_diagnostic_sensor->publish_state(timeout / 1000.0f);
+        }
+    #endif
+
+    this->diagnostics_timestamp = now;
+    this->latency_sum = 0;
+    this->latency_max = 0;
+    this->latency_count = 0;
+    this->period_requests = 0;
+}
 
 void OpenthermHub::dump_config() {
     ESP_LOGCONFIG(TAG, "OpenTherm:");
     ESP_LOGCONFIG(TAG, "  In: GPIO%d", this->in_pin);
     ESP_LOGCONFIG(TAG, "  Out: GPIO%d", this->out_pin);
-    ESP_LOGCONFIG(TAG, "  Sensors: %s", SHOW(OPENTHERM_SENSOR_LIST(ID, )));
-    ESP_LOGCONFIG(TAG, "  Binary sensors: %s", SHOW(OPENTHERM_BINARY_SENSOR_LIST(ID, )));
-    ESP_LOGCONFIG(TAG, "  Switches: %s", SHOW(OPENTHERM_SWITCH_LIST(ID, )));
-    ESP_LOGCONFIG(TAG, "  Input sensors: %s", SHOW(OPENTHERM_INPUT_SENSOR_LIST(ID, )));
-    ESP_LOGCONFIG(TAG, "  Outputs: %s", SHOW(OPENTHERM_OUTPUT_LIST(ID, )));
-    ESP_LOGCONFIG(TAG, "  Numbers: %s", SHOW(OPENTHERM_NUMBER_LIST(ID, )));
+    ESP_LOGCONFIG(TAG, "  Sync mode: %s", this->sync_mode ? "YES" : "NO");
+    if (this->sync_mode) {
+        ESP_LOGCONFIG(TAG, "  Deferred decoding: %s", this->deferred_decoding ? "YES" : "NO");
+    }
+    if (this->bus_tuning && this->sync_mode) {
+        ESP_LOGCONFIG(
+            TAG, "  Bus tuning: delay down to %" PRIu32 " ms, up to %.0f%% failed exchanges",
+            this->tuning_min_delay / 1000, this->tuning_max_error_rate * 100
+        );
+    }
+    ESP_LOGCONFIG(TAG, "  Burst init: %s", this->burst_init ? "YES" : "NO");
+    ESP_LOGCONFIG(TAG, "  Persist capabilities: %s", this->persist_capabilities ? "YES" : "NO");
+    if (this->adaptive_polling) {
+        ESP_LOGCONFIG(TAG, "  Adaptive polling: %" PRIu32 " - %" PRIu32 " ms", this->adaptive_min_interval, this->adaptive_max_interval);
+    }
+    // Only list the entities of this hub, the lists contain those of all hubs
+    #define OPENTHERM_DUMP_ENTITY(entity) \
+        if (this->entity != nullptr) { \
+            ESP_LOGCONFIG(TAG, "  - %s", #entity); \
+        }
+    ESP_LOGCONFIG(TAG, "  Sensors:");
+    OPENTHERM_SENSOR_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Binary sensors:");
+    OPENTHERM_BINARY_SENSOR_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Switches:");
+    OPENTHERM_SWITCH_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Input sensors:");
+    OPENTHERM_INPUT_SENSOR_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Outputs:");
+    OPENTHERM_OUTPUT_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Numbers:");
+    OPENTHERM_NUMBER_LIST(OPENTHERM_DUMP_ENTITY, )
+    ESP_LOGCONFIG(TAG, "  Diagnostic sensors:");
+    OPENTHERM_DIAGNOSTIC_SENSOR_LIST(OPENTHERM_DUMP_ENTITY, )
     ESP_LOGCONFIG(TAG, "  Initial requests:");
     for (auto type : this->initial_messages) {
         ESP_LOGCONFIG(TAG, "  - %d", type);
     }
     ESP_LOGCONFIG(TAG, "  Repeating requests:");
-    for (auto type : this->repeating_messages) {
-        ESP_LOGCONFIG(TAG, "  - %d", type);
+    for (auto &message : this->repeating_messages) {
+        if (message.active_flags != 0) {
+            ESP_LOGCONFIG(TAG, "  - %d (every %" PRIu32 " ms while status flags 0x%02X)", message.id, message.interval, message.active_flags);
+        } else {
+            ESP_LOGCONFIG(TAG, "  - %d (every %" PRIu32 " ms)", message.id, message.interval);
+        }
+    }
+    ESP_LOGCONFIG(TAG, "  Requests not supported by the boiler (sent every %" PRIu32 " s):", UNSUPPORTED_MESSAGE_INTERVAL / 1000);
+    for (auto &message : this->repeating_messages) {
+        if (this->is_unsupported(message)) {
+            ESP_LOGCONFIG(TAG, "  - %d", message.id);
+        }
     }
 }
 
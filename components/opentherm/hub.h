@@ -1,19 +1,27 @@
 #pragma once
 
 #include "esphome/core/component.h"
+#include "esphome/core/hal.h"
+#include "esphome/core/helpers.h"
 #include "esphome/core/log.h"
+#include "esphome/core/preferences.h"
 
 #include "OpenTherm.h"
 
 #include "esphome/components/sensor/sensor.h"
 #include "esphome/components/binary_sensor/binary_sensor.h"
 
+#include "sensor.h"
 #include "switch.h"
 #include "number.h"
 #include "output.h"
+#include "transceiver.h"
+#include "f88.h"
 
-#include <unordered_map>
-#include <unordered_set>
+#include <algorithm>
+#include <cmath>
+#include <new>
+#include <string>
 
 // Ensure that all component macros are defined, even if the component is not used
 #ifndef OPENTHERM_SENSOR_LIST
@@ -34,29 +42,105 @@
 #ifndef OPENTHERM_INPUT_SENSOR_LIST
 #define OPENTHERM_INPUT_SENSOR_LIST(F, sep)
 #endif
-
-#ifndef OPENTHERM_SENSOR_MESSAGE_HANDLERS
-#define OPENTHERM_SENSOR_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
-#endif
-#ifndef OPENTHERM_BINARY_SENSOR_MESSAGE_HANDLERS
-#define OPENTHERM_BINARY_SENSOR_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
+#ifndef OPENTHERM_DIAGNOSTIC_SENSOR_LIST
+#define OPENTHERM_DIAGNOSTIC_SENSOR_LIST(F, sep)
 #endif
-#ifndef OPENTHERM_SWITCH_MESSAGE_HANDLERS
-#define OPENTHERM_SWITCH_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
+
+#ifndef OPENTHERM_MESSAGE_HANDLERS
+#define OPENTHERM_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
 #endif
-#ifndef OPENTHERM_NUMBER_MESSAGE_HANDLERS
-#define OPENTHERM_NUMBER_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
+
+// The largest number of initial, repeating and bounds messages the generated code
+// adds to a hub, not counting the ones the hub adds itself
+#ifndef OPENTHERM_MAX_INITIAL_MESSAGES
+#define OPENTHERM_MAX_INITIAL_MESSAGES 0
 #endif
-#ifndef OPENTHERM_OUTPUT_MESSAGE_HANDLERS
-#define OPENTHERM_OUTPUT_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
+#ifndef OPENTHERM_MAX_REPEATING_MESSAGES
+#define OPENTHERM_MAX_REPEATING_MESSAGES 0
 #endif
-#ifndef OPENTHERM_INPUT_SENSOR_MESSAGE_HANDLERS
-#define OPENTHERM_INPUT_SENSOR_MESSAGE_HANDLERS(MESSAGE, ENTITY, entity_sep, postscript, msg_sep)
+#ifndef OPENTHERM_MAX_BOUNDS_MESSAGES
+#define OPENTHERM_MAX_BOUNDS_MESSAGES 0
 #endif
 
 namespace esphome {
 namespace opentherm {
 
+// A list with a capacity fixed at compile time, which is stored in place instead
+// of on the heap, and keeps the order in which the items were added
+template<typename T, size_t N> class OpenthermFixedList {
+protected:
+    T items[N > 0 ? N : 1];
+    size_t count = 0;
+
+public:
+    // Returns false if the list is full
+    bool push_back(const T &item) {
+        if (this->count >= N) {
+            return false;
+        }
+        this->items[this->count++] = item;
+        return true;
+    }
+    bool contains(const T &item) const { return std::find(this->begin(), this->end(), item) != this->end(); }
+    bool empty() const { return this->count == 0; }
+    size_t size() const { return this->count; }
+
+    T *begin() { return this->items; }
+    T *end() { return this->items + this->count; }
+    const T *begin() const { return this->items; }
+    const T *end() const { return this->items + this->count; }
+};
+
+// A repeating message with the information needed to schedule it. The small
+// fields are kept together and the flags in single bits, so the struct has no
+// padding between them.
+struct OpenthermRepeatingMessage {
+    OpenThermMessageID id;
+    // Minimum time between two requests in milliseconds, 0 means every cycle
+    uint32_t interval;
+    // Time between two requests with adaptive polling, which starts at interval
+    uint32_t adaptive_interval;
+    // Time of the last request
+    uint32_t last_request;
+    // Data of the last valid response, to only publish it to the entities when it changed
+    uint16_t last_data;
+    // Number of consecutive requests the boiler didn't answer or didn't support
+    uint8_t failures;
+    // Slave status flags in the Status response, like flame_on, of which one has to be
+    // set for the message to be requested at its interval. 0 means always.
+    uint8_t active_flags;
+    // Whether there has been a request at all
+    bool requested : 1;
+    // Set when an input value for this message changed and it should be sent as soon as possible
+    bool dirty : 1;
+    // Whether last_data holds a response
+    bool has_data : 1;
+    // Whether the data changed since it was last published, which is at the end of
+    // the cycle in snapshot mode
+    bool changed : 1;
+    // Whether the message writes the values of inputs of this hub, which is then
+    // never considered unsupported, so a setpoint is always sent
+    bool writes : 1;
+    // Whether the message was due when the current cycle started and hasn't been
+    // requested since, which keeps the cycle from ending
+    bool pending : 1;
+};
+
+// Maximum number of responses to initial messages kept in the capabilities
+static const uint8_t OPENTHERM_CACHED_RESPONSES = 24;
+
+// What the hub learned about the boiler, stored in the preferences to start
+// with after a restart instead of waiting for the initial messages
+struct OpenthermCapabilities {
+    // Bitmap of the message ids the boiler doesn't support
+    uint8_t unsupported[32];
+    // Data of the responses to the initial messages, like the member id code,
+    // versions and bounds
+    uint8_t response_count;
+    uint8_t response_ids[OPENTHERM_CACHED_RESPONSES];
+    uint16_t response_data[OPENTHERM_CACHED_RESPONSES];
+};
+
 // OpenTherm component for ESPHome
 class OpenthermHub : public Component {
 protected:
@@ -64,51 +148,167 @@ protected:
     int in_pin, out_pin;
     // Master id for MConfigMMemberIDcode command
     int master_id = 0;
-    // The OpenTherm interface from @ihormelnyk's library
+    // The OpenTherm interface from @ihormelnyk's library, which is constructed in
+    // setup once the pins are known, in place in the hub instead of on the heap
     OpenTherm* ot;
-
-    // Use macros to create fields for every entity specified in the ESPHome configuration
-    #define OPENTHERM_DECLARE_SENSOR(entity) sensor::Sensor* entity;
+    alignas(OpenTherm) uint8_t ot_storage[sizeof(OpenTherm)];
+    // Interrupt driven exchange of frames, used instead of the library in sync mode
+    OpenthermTransceiver transceiver;
+
+    // Use macros to create fields for every entity specified in the ESPHome configuration.
+    // With multiple hubs, every hub has the fields of all of them, which stay null if
+    // the entity is not configured for this hub.
+    #define OPENTHERM_DECLARE_SENSOR(entity) OpenthermSensor* entity = nullptr;
     OPENTHERM_SENSOR_LIST(OPENTHERM_DECLARE_SENSOR, )
 
-    #define OPENTHERM_DECLARE_BINARY_SENSOR(entity) binary_sensor::BinarySensor* entity;
+    #define OPENTHERM_DECLARE_BINARY_SENSOR(entity) binary_sensor::BinarySensor* entity = nullptr;
     OPENTHERM_BINARY_SENSOR_LIST(OPENTHERM_DECLARE_BINARY_SENSOR, )
 
-    #define OPENTHERM_DECLARE_SWITCH(entity) OpenthermSwitch* entity;
+    #define OPENTHERM_DECLARE_SWITCH(entity) OpenthermSwitch* entity = nullptr;
     OPENTHERM_SWITCH_LIST(OPENTHERM_DECLARE_SWITCH, )
 
-    #define OPENTHERM_DECLARE_NUMBER(entity) OpenthermNumber* entity;
+    #define OPENTHERM_DECLARE_NUMBER(entity) OpenthermNumber* entity = nullptr;
     OPENTHERM_NUMBER_LIST(OPENTHERM_DECLARE_NUMBER, )
 
-    #define OPENTHERM_DECLARE_OUTPUT(entity) OpenthermOutput* entity;
+    #define OPENTHERM_DECLARE_OUTPUT(entity) OpenthermOutput* entity = nullptr;
     OPENTHERM_OUTPUT_LIST(OPENTHERM_DECLARE_OUTPUT, )
 
-    #define OPENTHERM_DECLARE_INPUT_SENSOR(entity) sensor::Sensor* entity;
+    #define OPENTHERM_DECLARE_INPUT_SENSOR(entity) sensor::Sensor* entity = nullptr;
     OPENTHERM_INPUT_SENSOR_LIST(OPENTHERM_DECLARE_INPUT_SENSOR, )
 
-    // The set of initial messages to send on starting communication with the boiler
-    std::unordered_set<OpenThermMessageID> initial_messages;
+    #define OPENTHERM_DECLARE_DIAGNOSTIC_SENSOR(entity) sensor::Sensor* entity = nullptr;
+    OPENTHERM_DIAGNOSTIC_SENSOR_LIST(OPENTHERM_DECLARE_DIAGNOSTIC_SENSOR, )
+
+    // The initial messages to send on starting communication with the boiler, in the
+    // order they were added, and the Member and Slave Config messages of the hub itself
+    OpenthermFixedList<OpenThermMessageID, OPENTHERM_MAX_INITIAL_MESSAGES + 2> initial_messages;
     // and the repeating messages which are sent repeatedly to update various sensors
-    // and boiler parameters (like the setpoint).
-    std::unordered_set<OpenThermMessageID> repeating_messages;
+    // and boiler parameters (like the setpoint), and the Status message.
+    OpenthermFixedList<OpenthermRepeatingMessage, OPENTHERM_MAX_REPEATING_MESSAGES + 1> repeating_messages;
     // Indicates if we are still working on the initial requests or not
     bool initializing = true;
-    // Index for the current request in one of the _requests sets.
-    std::unordered_set<OpenThermMessageID>::const_iterator current_message_iterator;
+    // Runs the loop continuously while initializing in burst mode
+    HighFrequencyLoopRequester high_freq;
+    // The next request in the initial_messages list.
+    const OpenThermMessageID *current_message_iterator;
+    // The id of the last request that was sent, to attribute timeouts to
+    OpenThermMessageID current_request_id;
+    // Messages with the bounds for inputs with auto_min_value or auto_max_value
+    OpenthermFixedList<OpenThermMessageID, OPENTHERM_MAX_BOUNDS_MESSAGES> bounds_messages;
+    // Number of requests in a row that the boiler didn't answer, to notice when it restarts
+    uint8_t consecutive_timeouts = 0;
+    // Number of slots in a row taken by messages with changed inputs
+    uint8_t dirty_slots = 0;
+    // Slave status flags from the last Status response. Until the boiler sent them,
+    // all messages with active flags are requested at their normal interval.
+    uint8_t slave_status_flags = 0xFF;
 
     // Create OpenTherm messages based on the message id
     unsigned int build_request(OpenThermMessageID request_id);
+    // Mark a repeating message as written with the values of inputs of this hub
+    void set_input_message(OpenThermMessageID message_id);
+    // Time in milliseconds since a repeating message became due, negative if it
+    // isn't due yet and INT32_MAX if it was never requested
+    int32_t overdue_time(const OpenthermRepeatingMessage &message, uint32_t now);
+    // Select the repeating message that is most overdue and mark it as requested
+    OpenThermMessageID next_repeating_message();
+    // Whether the value of an input changed and its message wasn't sent yet
+    bool has_dirty_message();
+    // Start a cycle, in which every repeating message that is due now is requested
+    // once before it ends
+    void start_cycle();
+    // Whether a message that was due at the start of the cycle still has to be requested
+    bool is_cycle_pending();
+    // Keep track of repeating messages that the boiler doesn't seem to support,
+    // these are only requested once in a while to check if they became available
+    void update_message_support(OpenThermMessageID message_id, bool supported);
+    // Give every message a new chance after the boiler stopped responding for a
+    // while, as their failures say nothing about the messages themselves, and a
+    // restarted boiler may support other messages
+    void reset_message_support();
+    // Publish the data of a response to the entities of its message. Unchanged data
+    // is only published to sensors with a heartbeat.
+    void publish_response(OpenThermMessageID message_id, uint32_t data, bool data_changed);
+    // Called when a cycle ends, with the first Status request after every message that
+    // was due at its start. In snapshot mode the responses of the cycle are published
+    // now, all at once.
+    void complete_cycle();
+    CallbackManager<void()> cycle_complete_callback;
+    bool is_unsupported(const OpenthermRepeatingMessage &message);
+    // Shorten or stretch the interval of a message with adaptive polling
+    void adapt_interval(OpenthermRepeatingMessage &message, bool data_changed);
+    bool is_active(const OpenthermRepeatingMessage &message, uint8_t flags) {
+        return message.active_flags == 0 || (message.active_flags & flags) != 0;
+    }
+    // Take the new slave status flags, requesting messages that just became inactive
+    // once more, so their entities show the value of the idle boiler
+    void update_slave_status_flags(uint8_t flags);
+    // Request the bounds again in the next free slots, after the boiler restarted
+    void refresh_bounds();
+
+    // Capabilities stored in the preferences, and whether they were loaded at
+    // startup and are still being revalidated by the initial messages, which are
+    // then sent in every other slot
+    bool persist_capabilities = false;
+    uint32_t capabilities_key = 0;
+    ESPPreferenceObject capabilities_pref;
+    OpenthermCapabilities capabilities{};
+    bool capabilities_loaded = false;
+    bool capabilities_cached = false;
+    bool capabilities_changed = false;
+    bool initial_turn = false;
+    // Publish the loaded capabilities and skip the unsupported messages
+    void apply_capabilities();
+    // Keep the response to an initial message, dropping the capabilities when it
+    // shows a different boiler than the one they were learned from
+    void update_capabilities(OpenThermMessageID message_id, uint16_t data);
+    void set_unsupported(OpenThermMessageID message_id, bool unsupported);
+
+    // Statistics about the communication on the bus for the diagnostic sensors.
+    // The counters are totals since boot, the rest covers one publishing period.
+    uint32_t request_timestamp = 0;
+    uint32_t status_timestamp = 0;
+    bool status_requested = false;
+    uint32_t cycle_timestamp = 0;
+    uint32_t diagnostics_timestamp = 0;
+    uint32_t latency_last = 0, latency_sum = 0, latency_max = 0, latency_count = 0;
+    uint32_t cycle_time = 0;
+    uint32_t period_requests = 0;
+    uint32_t invalid_responses = 0, timeouts = 0, unknown_ids = 0;
+
+    // Publish the statistics to the configured diagnostic sensors and start a new period
+    void publish_diagnostics();
+
+    // Bus tuning in sync mode, which lowers the delay between frames and the response
+    // timeout while the exchanges succeed, and backs off when they fail. Counted over
+    // a window of exchanges, except for the longest response delay seen since boot.
+    bool bus_tuning = false;
+    uint32_t tuning_min_delay = 0;
+    // Lowest delay to try again, just above the last one that failed
+    uint32_t tuning_delay_floor = 0;
+    float tuning_max_error_rate = 0;
+    uint8_t tuning_exchanges = 0, tuning_failures = 0;
+    uint32_t tuning_response_delay_max = 0;
+    // Count an exchange and adjust the timing after every window
+    void tune_bus(bool failed, bool answered);
 
     // Callbacks to pass to OpenTherm interface for globally defined interrupts
     void(*handle_interrupt_callback)();
     void(*process_response_callback)(unsigned long, OpenThermResponseStatus);
+    void(*handle_timer_callback)();
 
 public:
     // Constructor with references to the global interrupt handlers
-    OpenthermHub(void(*handle_interrupt_callback)(void), void(*process_response_callback)(unsigned long, OpenThermResponseStatus));
+    OpenthermHub(
+        void(*handle_interrupt_callback)(void),
+        void(*process_response_callback)(unsigned long, OpenThermResponseStatus),
+        void(*handle_timer_callback)(void)
+    );
 
     // Interrupt handler, which notifies the OpenTherm interface of an interrupt
     void IRAM_ATTR handle_interrupt();
+    // Timer interrupt handler, which sends the next half bit of a request in sync mode
+    void IRAM_ATTR handle_timer();
 
     // Handle responses from the OpenTherm interface
     void process_response(unsigned long response, OpenThermResponseStatus status);
@@ -121,7 +321,7 @@ public:
     void set_opentherm_version(float) { return; }
     void set_opentherm_version_controller(float) { return; }
 
-    #define OPENTHERM_SET_SENSOR(entity) void set_ ## entity(sensor::Sensor* sensor) { this->entity = sensor; }
+    #define OPENTHERM_SET_SENSOR(entity) void set_ ## entity(OpenthermSensor* sensor) { this->entity = sensor; }
     OPENTHERM_SENSOR_LIST(OPENTHERM_SET_SENSOR, )
 
     #define OPENTHERM_SET_BINARY_SENSOR(entity) void set_ ## entity(binary_sensor::BinarySensor* binary_sensor) { this->entity = binary_sensor; }
@@ -139,23 +339,61 @@ public:
     #define OPENTHERM_SET_INPUT_SENSOR(entity) void set_ ## entity(sensor::Sensor* sensor) { this->entity = sensor; }
     OPENTHERM_INPUT_SENSOR_LIST(OPENTHERM_SET_INPUT_SENSOR, )
 
-    // Add a request to the set of initial requests
-    void add_initial_message(OpenThermMessageID message_id) { this->initial_messages.insert(message_id); }
-    // Add a request to the set of repeating requests. Note that a large number of repeating
-    // requests will slow down communication with the boiler. Each request may take up to 1 second,
-    // so with all sensors enabled, it may take about half a minute before a change in setpoint
-    // will be processed.
-    void add_repeating_message(OpenThermMessageID message_id) { this->repeating_messages.insert(message_id); }
+    #define OPENTHERM_SET_DIAGNOSTIC_SENSOR(entity) void set_ ## entity(sensor::Sensor* sensor) { this->entity = sensor; }
+    OPENTHERM_DIAGNOSTIC_SENSOR_LIST(OPENTHERM_SET_DIAGNOSTIC_SENSOR, )
+
+    // Add a request to the list of initial requests, if it isn't in there yet
+    void add_initial_message(OpenThermMessageID message_id);
+    // Add a request to the set of repeating requests, to be sent at most once every interval
+    // milliseconds. Each request may take up to 1 second, so every message with an interval
+    // of 0 (sent every cycle) adds to the time before a change in setpoint is processed.
+    // If the message was already added, the shortest interval is kept.
+    // With active_flags, the message is only requested at its interval while one of
+    // these slave status flags is set, and otherwise once a minute. If the message was
+    // already added without flags, it stays unconditional.
+    void add_repeating_message(OpenThermMessageID message_id, uint32_t interval = 0, uint8_t active_flags = 0);
+    // Mark a repeating message as dirty, so it is sent in the next free slot, before
+    // any other scheduled messages. Called automatically when an input value changes.
+    // Marking a message multiple times before it is sent results in a single request
+    // containing the latest values.
+    void mark_message_dirty(OpenThermMessageID message_id);
+    // Add a message with the bounds for inputs with auto_min_value or auto_max_value. It is
+    // requested during initialization, and after that only once an hour or when the boiler
+    // comes back after it stopped responding, as the bounds rarely change.
+    void add_bounds_message(OpenThermMessageID message_id);
 
     // There are five status variables, which can either be set as a simple variable,
     // or using a switch. ch_enable and dhw_enable default to true, the others to false.
     bool ch_enable = true, dhw_enable = true, cooling_enable, otc_active, ch2_active;
 
-    // Synchronous communication mode prevents other components from disabling interrupts while
-    // we are talking to the boiler. Enable if you experience random intermittent invalid response errors.
-    // Very likely to happen while using Dallas temperature sensors.
+    // Synchronous communication mode sends requests from a hardware timer interrupt and decodes
+    // responses in the pin interrupt, instead of toggling the pins from the main loop, so other
+    // components can't disturb the timing of the frames. Enable if you experience random
+    // intermittent invalid response errors. Very likely to happen while using Dallas temperature sensors.
     bool sync_mode = false;
 
+    // Decode responses in the loop from the edges recorded by the pin interrupt,
+    // instead of in the interrupt itself. Only used in sync mode.
+    bool deferred_decoding = false;
+
+    // Send the initial messages as fast as the boiler allows, running the loop
+    // continuously and sending Status at least once a second in between
+    bool burst_init = false;
+
+    // Publish the responses of a cycle together at its end, so the entities always
+    // show the values of the same cycle
+    bool snapshot = false;
+
+    // Bounds of the intervals with adaptive polling, which shortens the interval of a
+    // read message while its value changes and stretches it while it doesn't
+    bool adaptive_polling = false;
+    uint32_t adaptive_min_interval = 0;
+    uint32_t adaptive_max_interval = 0;
+
+    // Whether to log every request and response, only has effect when frame
+    // logging is compiled in, which happens if any hub enables it
+    bool log_frames = true;
+
     // Setters for the status variables
     void set_ch_enable(bool ch_enable) { this->ch_enable = ch_enable; }
     void set_dhw_enable(bool dhw_enable) { this->dhw_enable = dhw_enable; }
@@ -163,6 +401,29 @@ public:
     void set_otc_active(bool otc_active) { this->otc_active = otc_active; }
     void set_ch2_active(bool ch2_active) { this->ch2_active = ch2_active; }
     void set_sync_mode(bool sync_mode) { this->sync_mode = sync_mode; }
+    void set_deferred_decoding(bool deferred_decoding) { this->deferred_decoding = deferred_decoding; }
+    void set_log_frames(bool log_frames) { this->log_frames = log_frames; }
+    void set_burst_init(bool burst_init) { this->burst_init = burst_init; }
+    void set_bus_tuning(uint32_t min_delay, float max_error_rate) {
+        this->bus_tuning = true;
+        this->tuning_min_delay = min_delay * 1000;
+        this->tuning_delay_floor = this->tuning_min_delay;
+        this->tuning_max_error_rate = max_error_rate;
+    }
+    void set_snapshot(bool snapshot) { this->snapshot = snapshot; }
+    void set_persist_capabilities(const std::string &key) {
+        this->persist_capabilities = true;
+        this->capabilities_key = fnv1_hash("opentherm_capabilities_" + key);
+    }
+    void set_adaptive_polling(uint32_t min_interval, uint32_t max_interval) {
+        this->adaptive_polling = true;
+        this->adaptive_min_interval = min_interval;
+        this->adaptive_max_interval = max_interval;
+    }
+
+    void add_on_cycle_complete_callback(std::function<void()> &&callback) {
+        this->cycle_complete_callback.add(std::move(callback));
+    }
 
     float get_setup_priority() const override{
         return setup_priority::HARDWARE;
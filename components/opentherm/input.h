@@ -5,10 +5,16 @@ namespace opentherm {
 
 class OpenthermInput {
 public:
-    bool auto_min_value, auto_max_value;
+    // Whether to use the bounds reported by the boiler, which the hub applies when it receives them
+    bool auto_min_value = false, auto_max_value = false;
 
     virtual void set_min_value(float min_value) = 0;
     virtual void set_max_value(float max_value) = 0;
+    virtual float get_min_value() = 0;
+    virtual float get_max_value() = 0;
+    // Bring the current value within new bounds, publishing it if it changed, so the
+    // boiler gets the clamped value
+    virtual void clamp_to_bounds() = 0;
 
     virtual void set_auto_min_value(bool auto_min_value) { this->auto_min_value = auto_min_value; }
     virtual void set_auto_max_value(bool auto_max_value) { this->auto_max_value = auto_max_value; }
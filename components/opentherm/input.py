@@ -1,9 +1,9 @@
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import esphome.codegen as cg
 import esphome.config_validation as cv
 
-from . import schema, generate
+from . import const, schema, generate
 
 CONF_min_value = "min_value"
 CONF_max_value = "max_value"
@@ -37,3 +37,23 @@ def generate_setters(entity: cg.MockObj, conf: Dict[str, Any]) -> None:
     generate.add_property_set(entity, CONF_max_value, conf)
     generate.add_property_set(entity, CONF_auto_min_value, conf)
     generate.add_property_set(entity, CONF_auto_max_value, conf)
+
+async def generate_auto_bounds(component_type: str, keys: List[str], config: Dict[str, Any]) -> None:
+    """Let the hub request the bounds of inputs with auto_min_value or auto_max_value
+    from the boiler, and apply them to the input when they are received.
+    """
+    hub = await cg.get_variable(config[const.CONF_OPENTHERM_ID])
+    for key in keys:
+        entity = schema.INPUTS[key]
+        bounds = [
+            (CONF_auto_min_value, entity.get("auto_min_value")),
+            (CONF_auto_max_value, entity.get("auto_max_value")),
+        ]
+        for conf_key, bound in bounds:
+            if bound is None or not config[key].get(conf_key, False):
+                continue
+            generate.add_message_handler_entity(bound["message"], conf_key.upper(), f"{key}_{component_type.lower()}", bound["message_data"])
+            # A bounds message is also an initial and a repeating message
+            for kind in ("initial", "repeating", "bounds"):
+                generate.count_message(hub, kind, bound["message"])
+            cg.add(hub.add_bounds_message(cg.RawExpression(f"OpenThermMessageID::{bound['message']}")))
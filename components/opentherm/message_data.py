@@ -0,0 +1,228 @@
+# This file contains a Python implementation of the message data formats in
+# hub.cpp, to decode captured bus traffic offline. Decoding many frames at once
+# requires NumPy, which is not needed for the component itself.
+
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, NamedTuple, Union
+
+from . import schema
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Value = Union[bool, int, float]
+
+# Message types, as in the OpenTherm specification
+READ_DATA = 0
+WRITE_DATA = 1
+INVALID_DATA = 2
+RESERVED = 3
+READ_ACK = 4
+WRITE_ACK = 5
+DATA_INVALID = 6
+UNKNOWN_DATA_ID = 7
+
+# Message ids, named as in the OpenThermMessageID enum of the OpenTherm library
+MESSAGE_IDS: Dict[str, int] = {
+    "Status": 0,
+    "TSet": 1,
+    "MConfigMMemberIDcode": 2,
+    "SConfigSMemberIDcode": 3,
+    "RemoteRequest": 4,
+    "ASFflags": 5,
+    "RBPflags": 6,
+    "CoolingControl": 7,
+    "TsetCH2": 8,
+    "TrOverride": 9,
+    "TSP": 10,
+    "TSPindexTSPvalue": 11,
+    "FHBsize": 12,
+    "FHBindexFHBvalue": 13,
+    "MaxRelModLevelSetting": 14,
+    "MaxCapacityMinModLevel": 15,
+    "TrSet": 16,
+    "RelModLevel": 17,
+    "CHPressure": 18,
+    "DHWFlowRate": 19,
+    "DayTime": 20,
+    "Date": 21,
+    "Year": 22,
+    "TrSetCH2": 23,
+    "Tr": 24,
+    "Tboiler": 25,
+    "Tdhw": 26,
+    "Toutside": 27,
+    "Tret": 28,
+    "Tstorage": 29,
+    "Tcollector": 30,
+    "TflowCH2": 31,
+    "Tdhw2": 32,
+    "Texhaust": 33,
+    "TboilerHeatExchanger": 34,
+    "BoilerFanSpeedSetpointAndActual": 35,
+    "FlameCurrent": 36,
+    "TdhwSetUBTdhwSetLB": 48,
+    "MaxTSetUBMaxTSetLB": 49,
+    "OTCratio": 50,
+    "TdhwSet": 56,
+    "MaxTSet": 57,
+    "Hcratio": 58,
+    "RemoteOverrideFunction": 100,
+    "OEMDiagnosticCode": 115,
+    "SuccessfulBurnerStarts": 116,
+    "CHPumpStarts": 117,
+    "DHWPumpValveStarts": 118,
+    "DHWBurnerStarts": 119,
+    "BurnerOperationHours": 120,
+    "CHPumpOperationHours": 121,
+    "DHWPumpValveOperationHours": 122,
+    "DHWBurnerOperationHours": 123,
+    "OpenThermVersionMaster": 124,
+    "OpenThermVersionSlave": 125,
+    "MasterVersion": 126,
+    "SlaveVersion": 127,
+}
+
+class Format(NamedTuple):
+    kind: str
+    """One of flag8, u8, s8, u16, s16 or f88"""
+
+    shift: int
+    """Position of the flag bit or the byte within the 16 data bits"""
+
+    scale: int
+    """Factor to multiply the value with"""
+
+_FORMAT_PATTERN = re.compile(r"^(?:(flag8)_(lb|hb)_([0-7])|(u8|s8)_(lb|hb)(?:_(60))?|(u16|s16|f88))$")
+
+def parse_format(message_data: str) -> Format:
+    """Parse a message_data string as documented in schema.EntitySchema."""
+    match = _FORMAT_PATTERN.match(message_data)
+    if match is None:
+        raise ValueError(f"Unknown message data format: {message_data}")
+    flag, flag_byte, bit, byte_kind, byte, scale, word_kind = match.groups()
+    if flag:
+        return Format(flag, int(bit) + (8 if flag_byte == "hb" else 0), 1)
+    if byte_kind:
+        return Format(byte_kind, 8 if byte == "hb" else 0, int(scale or 1))
+    return Format(word_kind, 0, 1)
+
+def parse(message_data: str, data: int) -> Value:
+    """Get a value from the 16 data bits of a message, like parse_* in hub.cpp."""
+    fmt = parse_format(message_data)
+    if fmt.kind == "flag8":
+        return bool((data >> fmt.shift) & 1)
+    if fmt.kind in ("u8", "s8"):
+        value = (data >> fmt.shift) & 0xff
+        if fmt.kind == "s8" and value & 0x80:
+            value -= 0x100
+        return value * fmt.scale
+    value = data & 0xffff
+    if fmt.kind in ("s16", "f88") and value & 0x8000:
+        value -= 0x10000
+    return value / 256 if fmt.kind == "f88" else value
+
+def write(message_data: str, value: Value, data: int = 0) -> int:
+    """Set a value in the 16 data bits of a message, like write_* in hub.cpp.
+    Other bits in data are kept for the flag and byte formats.
+    """
+    fmt = parse_format(message_data)
+    if fmt.scale != 1:
+        raise ValueError(f"Message data format {message_data} can only be parsed")
+    if fmt.kind == "flag8":
+        return (data | (1 << fmt.shift)) if value else (data & ~(1 << fmt.shift) & 0xffff)
+    if fmt.kind in ("u8", "s8"):
+        return (data & ~(0xff << fmt.shift) & 0xffff) | ((int(value) & 0xff) << fmt.shift)
+    if fmt.kind == "f88":
+        # Round to the nearest step, half away from zero, and saturate outside the
+        # range of the format like to_f88 in f88.h
+        scaled = value * 256
+        if scaled >= 0x7fff:
+            return 0x7fff
+        if scaled <= -0x8000:
+            return 0x8000
+        return int(scaled - 0.5 if scaled < 0 else scaled + 0.5) & 0xffff
+    return int(value) & 0xffff
+
+def parity(frame: int) -> bool:
+    """Whether the number of set bits is odd, valid frames have even parity."""
+    return bin(frame).count("1") % 2 == 1
+
+def build_frame(msg_type: int, msg_id: int, data: int) -> int:
+    """Build a frame with the parity bit set, like OpenTherm::buildResponse."""
+    frame = (msg_type << 28) | (msg_id << 16) | (data & 0xffff)
+    return frame | (1 << 31) if parity(frame) else frame
+
+def decode_frame(
+    frame: int,
+    schema_: schema.Schema[Any],
+    message_types: Iterable[int] = (READ_ACK, WRITE_ACK),
+) -> Dict[str, Value]:
+    """Decode a single frame into the values of all entities in the schema that
+    use its message. Frames with a parity error or another message type than
+    the given ones (by default the responses of the boiler) decode to nothing.
+    """
+    if parity(frame) or (frame >> 28) & 7 not in tuple(message_types):
+        return {}
+    msg_id = (frame >> 16) & 0xff
+    return {
+        key: parse(entity["message_data"], frame & 0xffff)
+        for key, entity in schema_.items()
+        if MESSAGE_IDS[entity["message"]] == msg_id
+    }
+
+def parse_array(message_data: str, data: "np.ndarray") -> "np.ndarray":
+    """Vectorized version of parse, for an array with the 16 data bits of many messages."""
+    import numpy as np
+
+    fmt = parse_format(message_data)
+    data = np.asarray(data).astype(np.uint16)
+    if fmt.kind == "flag8":
+        return ((data >> fmt.shift) & 1).astype(bool)
+    if fmt.kind in ("u8", "s8"):
+        byte = ((data >> fmt.shift) & 0xff).astype(np.uint8)
+        values = byte.view(np.int8) if fmt.kind == "s8" else byte
+        return values.astype(np.int32) * fmt.scale
+    if fmt.kind == "u16":
+        return data
+    signed = data.view(np.int16)
+    return signed / 256.0 if fmt.kind == "f88" else signed
+
+def parity_array(frames: "np.ndarray") -> "np.ndarray":
+    """Vectorized version of parity."""
+    import numpy as np
+
+    folded: "np.ndarray" = np.asarray(frames).astype(np.uint32)
+    for shift in (16, 8, 4, 2, 1):
+        folded = folded ^ (folded >> shift)
+    return (folded & 1).astype(bool)
+
+def decode_frames(
+    frames: "np.ndarray",
+    schema_: schema.Schema[Any],
+    message_types: Iterable[int] = (READ_ACK, WRITE_ACK),
+) -> Dict[str, "np.ndarray"]:
+    """Vectorized version of decode_frame, for an array of raw 32-bit frames.
+    Returns an array for every entity in the schema with the same shape as
+    frames, containing the decoded value as a float where the frame contains a
+    value for that entity and NaN everywhere else.
+    """
+    import numpy as np
+
+    frames = np.asarray(frames).astype(np.uint32)
+    valid = ~parity_array(frames) & np.isin((frames >> 28) & 7, list(message_types))
+    msg_ids = (frames >> 16) & 0xff
+    data = (frames & 0xffff).astype(np.uint16)
+
+    # Select the frames for each message only once, as many entities share a message
+    selections: Dict[int, "np.ndarray"] = {}
+    result: Dict[str, "np.ndarray"] = {}
+    for key, entity in schema_.items():
+        msg_id = MESSAGE_IDS[entity["message"]]
+        if msg_id not in selections:
+            selections[msg_id] = valid & (msg_ids == msg_id)
+        selection = selections[msg_id]
+        values = np.full(frames.shape, np.nan)
+        values[selection] = parse_array(entity["message_data"], data[selection])
+        result[key] = values
+    return result
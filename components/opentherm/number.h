@@ -1,6 +1,7 @@
 #pragma once
 
 #include "esphome/components/number/number.h"
+#include "esphome/core/helpers.h"  // for clamp()
 #include "input.h"
 
 namespace esphome {
@@ -16,6 +17,18 @@ protected:
 public:
     void set_min_value(float min_value) override { this->traits.set_min_value(min_value); }
     void set_max_value(float max_value) override { this->traits.set_max_value(max_value); }
+    float get_min_value() override { return this->traits.get_min_value(); }
+    float get_max_value() override { return this->traits.get_max_value(); }
+
+    void clamp_to_bounds() override {
+        if (!this->has_state()) {
+            return;
+        }
+        float value = clamp(this->state, this->get_min_value(), this->get_max_value());
+        if (value != this->state) {
+            this->publish_state(value);
+        }
+    }
 };
 
 } // namespace opentherm
@@ -40,3 +40,4 @@ async def to_code(config: Dict[str, Any]) -> None:
         config
     )
     generate.define_readers(COMPONENT_TYPE, keys)
+    await input.generate_auto_bounds(COMPONENT_TYPE, keys, config)
@@ -1,7 +1,8 @@
 #pragma once
 
 #include "esphome/components/output/float_output.h"
-#include "esphome/core/helpers.h"  // for clamp() and lerp()
+#include "esphome/core/helpers.h"  // for clamp()
+#include "f88.h"
 #include "input.h"
 
 namespace esphome {
@@ -12,7 +13,13 @@ protected:
     bool has_state_ = false;
     const char* id = nullptr;
 
-    float min_value, max_value;
+    // The bounds and the last state in the f88 format of the messages, so the
+    // state is scaled and compared in integers, and always a value the boiler
+    // receives exactly
+    int16_t min_value, max_value;
+    int16_t fixed_state = 0;
+
+    CallbackManager<void(float)> state_callback_;
 
 public:
     float state;
@@ -20,19 +27,48 @@ public:
     void set_id(const char* id) { this->id = id; }
 
     void write_state(float state) override {
-        this->state = state < 0.003 && this->zero_means_zero_ ? 0.0
-                    : clamp(lerp(state, min_value, max_value), min_value, max_value);
+        int16_t new_state = 0;
+        if (state >= 0.003 || !this->zero_means_zero_) {
+            int32_t range = (int32_t) this->max_value - this->min_value;
+            int32_t offset = (int32_t) (state * range + 0.5f);
+            new_state = clamp<int32_t>(this->min_value + offset, this->min_value, this->max_value);
+        }
+        // A change smaller than the resolution of the message doesn't count either
+        bool changed = !this->has_state_ || new_state != this->fixed_state;
+        this->fixed_state = new_state;
+        this->state = from_f88(new_state);
         this->has_state_ = true;
         ESP_LOGD("opentherm.output", "Output set to %.2f", this->state);
+        // Only notify on changes, so a controller writing the same value every second
+        // doesn't cause any extra messages to the boiler
+        if (changed) {
+            this->state_callback_.call(this->state);
+        }
     };
 
     bool has_state() { return this->has_state_; };
 
-    void set_min_value(float min_value) override { this->min_value = min_value; }
-    void set_max_value(float max_value) override { this->max_value = max_value; }
+    void add_on_state_callback(std::function<void(float)> &&callback) { this->state_callback_.add(std::move(callback)); }
+
+    void set_min_value(float min_value) override { this->min_value = to_f88(min_value); }
+    void set_max_value(float max_value) override { this->max_value = to_f88(max_value); }
+
+    float get_min_value() override { return from_f88(this->min_value); }
+    float get_max_value() override { return from_f88(this->max_value); }
 
-    float get_min_value() { return this->min_value; }
-    float get_max_value() { return this->max_value; }
+    void clamp_to_bounds() override {
+        // An output that is off stays off
+        if (!this->has_state_ || (this->fixed_state == 0 && this->zero_means_zero_)) {
+            return;
+        }
+        int16_t new_state = clamp(this->fixed_state, this->min_value, this->max_value);
+        if (new_state != this->fixed_state) {
+            this->fixed_state = new_state;
+            this->state = from_f88(new_state);
+            ESP_LOGD("opentherm.output", "Output clamped to %.2f", this->state);
+            this->state_callback_.call(this->state);
+        }
+    }
 };
 
 } // namespace opentherm
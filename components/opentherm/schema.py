@@ -15,6 +15,7 @@ from esphome.const import (
     UNIT_PERCENT,
     UNIT_KILOWATT,
     UNIT_EMPTY,
+    UNIT_MILLISECOND,
     DEVICE_CLASS_COLD,
     DEVICE_CLASS_HEAT,
     DEVICE_CLASS_PRESSURE,
@@ -41,6 +42,18 @@ class EntitySchema(TypedDict):
     the initialization phase (False)
     """
 
+    update_interval: NotRequired[str]
+    """Default minimum time between two requests for this value, as a time period
+    like "5min". Values without an interval are requested in every cycle. Only
+    used if keep_updated is True, and can be overridden in the configuration.
+    """
+
+    active_while: NotRequired[str]
+    """Key of the Status binary sensor, like "flame_on", that has to be set for
+    the value to be requested at its update interval. While the flag is cleared,
+    the value doesn't change and is requested once a minute.
+    """
+
     message_data: str
     """Instructions on how to interpret the data in the message
       - flag8_[hb|lb]_[0-7]: data is a byte of single bit flags,
@@ -50,6 +63,8 @@ class EntitySchema(TypedDict):
                     in the high (hb) or low byte (lb)
       - s8_[hb|lb]: data is an signed 8-bit integer,
                     in the high (hb) or low byte (lb)
+      - u8_[hb|lb]_60: data is an unsigned 8-bit integer,
+                       in the high (hb) or low byte (lb), multiplied by 60
       - f88: data is a signed fixed point value with
               1 sign bit, 7 integer bits, 8 fractional bits
       - u16: data is an unsigned 16-bit integer
@@ -72,6 +87,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "RelModLevel",
         "keep_updated": True,
+        "active_while": "flame_on",
         "message_data": "f88",
     }),
     "ch_pressure": SensorSchema({
@@ -82,6 +98,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "CHPressure",
         "keep_updated": True,
+        "update_interval": "30s",
         "message_data": "f88",
     }),
     "dhw_flow_rate": SensorSchema({
@@ -92,6 +109,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "DHWFlowRate",
         "keep_updated": True,
+        "active_while": "dhw_active",
         "message_data": "f88",
     }),
     "t_boiler": SensorSchema({
@@ -112,6 +130,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Tdhw",
         "keep_updated": True,
+        "active_while": "dhw_active",
         "message_data": "f88",
     }),
     "t_outside": SensorSchema({
@@ -122,6 +141,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Toutside",
         "keep_updated": True,
+        "update_interval": "1min",
         "message_data": "f88",
     }),
     "t_ret": SensorSchema({
@@ -142,6 +162,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Tstorage",
         "keep_updated": True,
+        "update_interval": "30s",
         "message_data": "f88",
     }),
     "t_collector": SensorSchema({
@@ -152,6 +173,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Tcollector",
         "keep_updated": True,
+        "update_interval": "30s",
         "message_data": "s16",
     }),
     "t_flow_ch2": SensorSchema({
@@ -182,6 +204,8 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Texhaust",
         "keep_updated": True,
+        "update_interval": "10s",
+        "active_while": "flame_on",
         "message_data": "s16",
     }),
     "burner_starts": SensorSchema({
@@ -191,6 +215,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "SuccessfulBurnerStarts",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "ch_pump_starts": SensorSchema({
@@ -200,6 +225,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "CHPumpStarts",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "dhw_pump_valve_starts": SensorSchema({
@@ -209,6 +235,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "DHWPumpValveStarts",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "dhw_burner_starts": SensorSchema({
@@ -218,6 +245,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "DHWBurnerStarts",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "burner_operation_hours": SensorSchema({
@@ -227,6 +255,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "BurnerOperationHours",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "ch_pump_operation_hours": SensorSchema({
@@ -236,6 +265,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "CHPumpOperationHours",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "dhw_pump_valve_operation_hours": SensorSchema({
@@ -245,6 +275,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "DHWPumpValveOperationHours",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "dhw_burner_operation_hours": SensorSchema({
@@ -254,6 +285,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_TOTAL_INCREASING,
         "message": "DHWBurnerOperationHours",
         "keep_updated": True,
+        "update_interval": "5min",
         "message_data": "u16",
     }),
     "t_dhw_set_ub": SensorSchema({
@@ -322,6 +354,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "TdhwSet",
         "keep_updated": True,
+        "update_interval": "1min",
         "message_data": "f88",
     }),
     "max_t_set": SensorSchema({
@@ -332,6 +365,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "MaxTSet",
         "keep_updated": True,
+        "update_interval": "1min",
         "message_data": "f88",
     }),
     "otc_hc_ratio": SensorSchema({
@@ -342,6 +376,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_MEASUREMENT,
         "message": "Hcratio",
         "keep_updated": True,
+        "update_interval": "1min",
         "message_data": "f88",
     }),
     "oem_fault_code": SensorSchema({
@@ -351,6 +386,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_NONE,
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "u8_lb",
     }),
     "t_heat_exchanger": SensorSchema({
@@ -380,6 +416,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_NONE,
         "message": "FlameCurrent",
         "keep_updated": True,
+        "active_while": "flame_on",
         "message_data": "f88",
     }),
     "oem_diagnostic_code": SensorSchema({
@@ -389,6 +426,7 @@ SENSORS: Schema[SensorSchema] = Schema({
         "state_class": STATE_CLASS_NONE,
         "message": "OEMDiagnosticCode",
         "keep_updated": True,
+        "update_interval": "1min",
         "message_data": "u16",
     }),
     "max_capacity": SensorSchema({
@@ -455,6 +493,86 @@ SENSORS: Schema[SensorSchema] = Schema({
     }),
 })
 
+class DiagnosticSensorSchema(TypedDict):
+    """A sensor with statistics about the communication on the bus, which the hub
+    keeps track of itself, instead of reading it from the boiler.
+    """
+    description: str
+    unit_of_measurement: NotRequired[str]
+    accuracy_decimals: int
+    icon: NotRequired[str]
+    state_class: str
+
+DIAGNOSTIC_SENSORS: Schema[DiagnosticSensorSchema] = Schema({
+    "bus_latency_last": DiagnosticSensorSchema({
+        "description": "Bus: Time between the last request and its response",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-outline",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_latency_avg": DiagnosticSensorSchema({
+        "description": "Bus: Average time between a request and its response",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-outline",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_latency_max": DiagnosticSensorSchema({
+        "description": "Bus: Maximum time between a request and its response",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-outline",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_cycle_time": DiagnosticSensorSchema({
+        "description": "Bus: Duration of the last cycle, a pass over every message that was due at its start",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-sync-outline",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_frames_per_minute": DiagnosticSensorSchema({
+        "description": "Bus: Number of requests per minute",
+        "unit_of_measurement": "frames/min",
+        "accuracy_decimals": 1,
+        "icon": "mdi:swap-horizontal",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_invalid_responses": DiagnosticSensorSchema({
+        "description": "Bus: Number of invalid responses",
+        "accuracy_decimals": 0,
+        "icon": "mdi:alert-circle-outline",
+        "state_class": STATE_CLASS_TOTAL_INCREASING,
+    }),
+    "bus_timeouts": DiagnosticSensorSchema({
+        "description": "Bus: Number of requests without a response",
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-alert-outline",
+        "state_class": STATE_CLASS_TOTAL_INCREASING,
+    }),
+    "bus_unknown_ids": DiagnosticSensorSchema({
+        "description": "Bus: Number of responses indicating an unknown message id",
+        "accuracy_decimals": 0,
+        "icon": "mdi:help-circle-outline",
+        "state_class": STATE_CLASS_TOTAL_INCREASING,
+    }),
+    "bus_request_delay": DiagnosticSensorSchema({
+        "description": "Bus: Time between a response and the next request, as set by bus_tuning",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-sand",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+    "bus_response_timeout": DiagnosticSensorSchema({
+        "description": "Bus: Time to wait for a response, as set by bus_tuning",
+        "unit_of_measurement": UNIT_MILLISECOND,
+        "accuracy_decimals": 0,
+        "icon": "mdi:timer-alert-outline",
+        "state_class": STATE_CLASS_MEASUREMENT,
+    }),
+})
+
 class BinarySensorSchema(EntitySchema):
     device_class: NotRequired[str]
     icon: NotRequired[str]
@@ -583,12 +701,14 @@ BINARY_SENSORS: Schema = Schema({
         "description": "Service Request",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_0",
     }),
     "lockout_reset": BinarySensorSchema({
         "description": "Lockout Reset",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_1",
     }),
     "low_water_pressure": BinarySensorSchema({
@@ -596,6 +716,7 @@ BINARY_SENSORS: Schema = Schema({
         "description": "Low Water Pressure",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_2",
     }),
     "flame_fault": BinarySensorSchema({
@@ -603,6 +724,7 @@ BINARY_SENSORS: Schema = Schema({
         "description": "Gas/Flame Fault",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_3",
     }),
     "air_pressure_fault": BinarySensorSchema({
@@ -610,6 +732,7 @@ BINARY_SENSORS: Schema = Schema({
         "description": "Air Pressure Fault",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_4",
     }),
     "water_over_temperature": BinarySensorSchema({
@@ -617,6 +740,7 @@ BINARY_SENSORS: Schema = Schema({
         "description": "Water Over Temperature",
         "message": "ASFflags",
         "keep_updated": True,
+        "update_interval": "10s",
         "message_data": "flag8_hb_5",
     }),
 })
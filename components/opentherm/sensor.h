@@ -0,0 +1,38 @@
+#pragma once
+
+#include "esphome/components/sensor/sensor.h"
+
+#include <cmath>
+
+namespace esphome {
+namespace opentherm {
+
+// A sensor that only publishes a value that changed by more than the deadband,
+// unless nothing was published for the heartbeat period
+class OpenthermSensor : public sensor::Sensor {
+protected:
+    float deadband = 0;
+    // Maximum time between two publications in milliseconds, 0 means no limit
+    uint32_t heartbeat = 0;
+    uint32_t last_publish = 0;
+
+public:
+    void set_deadband(float deadband) { this->deadband = deadband; }
+    void set_heartbeat(uint32_t heartbeat) { this->heartbeat = heartbeat; }
+
+    bool is_heartbeat_due(uint32_t now) {
+        return this->heartbeat > 0 && now - this->last_publish >= this->heartbeat;
+    }
+
+    void publish_filtered(float value, uint32_t now) {
+        // NaN never compares as within the deadband, so the first value is always published
+        if (std::fabs(value - this->get_raw_state()) <= this->deadband && !this->is_heartbeat_due(now)) {
+            return;
+        }
+        this->last_publish = now;
+        this->publish_state(value);
+    }
+};
+
+} // namespace opentherm
+} // namespace esphome
@@ -1,28 +1,64 @@
 from typing import Any, Dict
 
+import esphome.codegen as cg
 import esphome.config_validation as cv
 from esphome.components import sensor
+from esphome.const import ENTITY_CATEGORY_DIAGNOSTIC
 
 from . import const, schema, validate, generate
 
 DEPENDENCIES = [ const.OPENTHERM ]
 COMPONENT_TYPE = const.SENSOR
 
+CONF_DEADBAND = "deadband"
+CONF_HEARTBEAT = "heartbeat"
+
+OpenthermSensor = generate.opentherm_ns.class_("OpenthermSensor", sensor.Sensor)
+
+async def new_openthermsensor(config: Dict[str, Any]) -> cg.Pvariable:
+    var = await sensor.new_sensor(config)
+    if CONF_DEADBAND in config:
+        cg.add(var.set_deadband(config[CONF_DEADBAND]))
+    if CONF_HEARTBEAT in config:
+        cg.add(var.set_heartbeat(config[CONF_HEARTBEAT]))
+    return var
+
 def get_entity_validation_schema(entity: schema.SensorSchema) -> cv.Schema:
     return sensor.sensor_schema(
+        OpenthermSensor,
         unit_of_measurement = entity["unit_of_measurement"] if "unit_of_measurement" in entity else sensor._UNDEF,
         accuracy_decimals = entity["accuracy_decimals"],
         device_class=entity["device_class"] if "device_class" in entity else sensor._UNDEF,
         icon = entity["icon"] if "icon" in entity else sensor._UNDEF,
         state_class = entity["state_class"]
+    ).extend({
+        cv.Optional(CONF_DEADBAND): cv.positive_float,
+        cv.Optional(CONF_HEARTBEAT): cv.positive_time_period_milliseconds,
+    })
+
+def get_diagnostic_validation_schema(entity: schema.DiagnosticSensorSchema) -> cv.Schema:
+    return sensor.sensor_schema(
+        unit_of_measurement = entity["unit_of_measurement"] if "unit_of_measurement" in entity else sensor._UNDEF,
+        accuracy_decimals = entity["accuracy_decimals"],
+        icon = entity["icon"] if "icon" in entity else sensor._UNDEF,
+        state_class = entity["state_class"],
+        entity_category = ENTITY_CATEGORY_DIAGNOSTIC
     )
 
-CONFIG_SCHEMA = validate.create_component_schema(schema.SENSORS, get_entity_validation_schema)
+CONFIG_SCHEMA = validate.create_component_schema(schema.SENSORS, get_entity_validation_schema) \
+    .extend(validate.create_entities_schema(schema.DIAGNOSTIC_SENSORS, get_diagnostic_validation_schema))
 
 async def to_code(config: Dict[str, Any]) -> None:
     await generate.component_to_code(
         COMPONENT_TYPE,
         schema.SENSORS,
+        OpenthermSensor,
+        generate.create_only_conf(new_openthermsensor),
+        config
+    )
+    await generate.component_to_code(
+        const.DIAGNOSTIC_SENSOR,
+        schema.DIAGNOSTIC_SENSORS,
         sensor.Sensor,
         generate.create_only_conf(sensor.new_sensor),
         config
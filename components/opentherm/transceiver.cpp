@@ -0,0 +1,353 @@
+#include "transceiver.h"
+
+#include "esphome/core/log.h"
+
+#ifdef USE_ESP32
+#include <esp_arduino_version.h>
+#endif
+
+namespace esphome {
+namespace opentherm {
+
+static const char *TAG = "opentherm.transceiver";
+
+// A frame consists of a start bit, 32 data bits and a stop bit, each sent as two
+// halves of 500 µs with a transition in the middle
+static const uint8_t FRAME_BITS = 34;
+static const uint8_t FRAME_HALF_BITS = 2 * FRAME_BITS;
+static const uint32_t HALF_BIT_US = 500;
+// Like in the OpenTherm library, edges more than 750 µs after the last one are in
+// the middle of a bit
+static const uint32_t MID_BIT_US = 750;
+// Decoder position before the first edge of the response
+static const uint8_t NO_EDGE = 0xFF;
+
+// The same check as OpenTherm::isValidResponse, which needs an instance of the library
+static bool is_valid_response(uint32_t response) {
+    if (OpenTherm::parity(response)) {
+        return false;
+    }
+    uint8_t type = (response >> 28) & 7;
+    return type == OpenThermMessageType::READ_ACK || type == OpenThermMessageType::WRITE_ACK;
+}
+
+#ifdef USE_ESP8266
+// The ESP8266 has only one timer that is free to use
+static bool timer1_in_use = false;
+#endif
+
+bool OpenthermTransceiver::setup(int in_pin, int out_pin, void(*handle_interrupt_callback)(), void(*handle_timer_callback)()) {
+    this->in_pin = in_pin;
+    this->out_pin = out_pin;
+    this->handle_timer_callback = handle_timer_callback;
+
+    #if defined(USE_ESP32) && ESP_ARDUINO_VERSION_MAJOR >= 3
+        this->timer = timerBegin(1000000);
+        if (this->timer == nullptr) {
+            return false;
+        }
+        timerAttachInterrupt(this->timer, handle_timer_callback);
+        timerAlarm(this->timer, HALF_BIT_US, true, 0);
+        timerStop(this->timer);
+    #elif defined(USE_ESP32)
+        // Use the next free timer, ticking every microsecond
+        static uint8_t next_timer = 0;
+        this->timer = timerBegin(next_timer, 80, true);
+        if (this->timer == nullptr) {
+            return false;
+        }
+        next_timer++;
+        timerAttachInterrupt(this->timer, handle_timer_callback, true);
+        timerAlarmWrite(this->timer, HALF_BIT_US, true);
+    #elif defined(USE_ESP8266)
+        if (timer1_in_use) {
+            return false;
+        }
+        timer1_in_use = true;
+        timer1_attachInterrupt(handle_timer_callback);
+    #elif !defined(USE_HOST)
+        // The host harness in host/ provides a simulated timer, other platforms are not supported
+        return false;
+    #endif
+
+    pinMode(in_pin, INPUT);
+    pinMode(out_pin, OUTPUT);
+    digitalWrite(out_pin, HIGH);
+    attachInterrupt(digitalPinToInterrupt(in_pin), handle_interrupt_callback, CHANGE);
+
+    // Give the boiler some time to notice the idle bus before the first request
+    this->timestamp = micros();
+    this->state = DELAY;
+    return true;
+}
+
+void OpenthermTransceiver::end() {
+    if (this->state == UNAVAILABLE) {
+        return;
+    }
+    this->state = UNAVAILABLE;
+    this->stop_timer();
+    detachInterrupt(digitalPinToInterrupt(this->in_pin));
+    #if defined(USE_ESP32)
+        timerDetachInterrupt(this->timer);
+        timerEnd(this->timer);
+        this->timer = nullptr;
+    #elif defined(USE_ESP8266)
+        timer1_detachInterrupt();
+        timer1_in_use = false;
+    #endif
+    // Leave the bus idle
+    digitalWrite(this->out_pin, HIGH);
+}
+
+bool OpenthermTransceiver::start_timer() {
+    #if defined(USE_ESP32) && ESP_ARDUINO_VERSION_MAJOR >= 3
+        timerRestart(this->timer);
+        timerStart(this->timer);
+    #elif defined(USE_ESP32)
+        timerWrite(this->timer, 0);
+        timerAlarmEnable(this->timer);
+    #elif defined(USE_ESP8266)
+        // 80 MHz divided by 16 ticks 5 times every microsecond
+        timer1_enable(TIM_DIV16, TIM_EDGE, TIM_LOOP);
+        timer1_write(HALF_BIT_US * 5);
+    #elif defined(USE_HOST)
+        host_timer_start(this->handle_timer_callback, HALF_BIT_US);
+    #else
+        return false;
+    #endif
+    return true;
+}
+
+void IRAM_ATTR OpenthermTransceiver::stop_timer() {
+    #if defined(USE_ESP32) && ESP_ARDUINO_VERSION_MAJOR >= 3
+        timerStop(this->timer);
+    #elif defined(USE_ESP32)
+        timerAlarmDisable(this->timer);
+    #elif defined(USE_ESP8266)
+        timer1_disable();
+    #elif defined(USE_HOST)
+        host_timer_stop();
+    #endif
+}
+
+void IRAM_ATTR OpenthermTransceiver::write_half_bit(uint8_t half_bit) {
+    // The start and stop bits are always 1, the frame is sent most significant bit first
+    uint8_t bit = half_bit / 2;
+    bool value = bit == 0 || bit == FRAME_BITS - 1 || ((this->frame >> (32 - bit)) & 1);
+    // A 1 is active in the first half and idle in the second, a 0 the other way
+    // around. Like the library, the output is low when active.
+    bool active = (half_bit % 2 == 0) == value;
+    digitalWrite(this->out_pin, active ? LOW : HIGH);
+}
+
+bool OpenthermTransceiver::send_request_async(uint32_t request) {
+    if (this->state != READY) {
+        return false;
+    }
+
+    this->frame = request;
+    this->index = 1;
+    // The pin interrupt only records edges while waiting for the response, so the
+    // buffer is empty until the request is sent
+    this->edges_tail = this->edges_head;
+    this->decode_position = NO_EDGE;
+    this->state = SENDING;
+    this->write_half_bit(0);
+    if (!this->start_timer()) {
+        ESP_LOGE(TAG, "Failed to start the timer");
+        digitalWrite(this->out_pin, HIGH);
+        this->state = READY;
+        return false;
+    }
+    return true;
+}
+
+void IRAM_ATTR OpenthermTransceiver::handle_timer() {
+    if (this->state != SENDING) {
+        return;
+    }
+
+    if (this->index < FRAME_HALF_BITS) {
+        this->write_half_bit(this->index);
+        this->index++;
+    } else {
+        // The stop bit ends idle, so the bus is left idle
+        this->stop_timer();
+        this->timestamp = micros();
+        this->state = RESPONSE_WAITING;
+    }
+}
+
+void IRAM_ATTR OpenthermTransceiver::handle_interrupt() {
+    uint32_t now = micros();
+    if (this->deferred_decoding) {
+        if (this->state == RESPONSE_WAITING) {
+            // The lowest bit of the time holds the level, two microseconds are precise enough
+            uint8_t head = this->edges_head;
+            this->edges[head & (EDGE_BUFFER_SIZE - 1)] = (now & ~1u) | (digitalRead(this->in_pin) == HIGH);
+            this->edges_head = head + 1;
+        }
+        return;
+    }
+
+    // The input is high when the boiler's output is active
+    switch (this->state) {
+        case RESPONSE_WAITING:
+            this->state = digitalRead(this->in_pin) == HIGH ? RESPONSE_START_BIT : RESPONSE_INVALID;
+            this->response_delay = now - this->timestamp;
+            this->timestamp = now;
+            break;
+        case RESPONSE_START_BIT:
+            if (now - this->timestamp < MID_BIT_US && digitalRead(this->in_pin) == LOW) {
+                this->state = RESPONSE_RECEIVING;
+                this->frame = 0;
+                this->index = 0;
+            } else {
+                this->state = RESPONSE_INVALID;
+            }
+            this->timestamp = now;
+            break;
+        case RESPONSE_RECEIVING:
+            // Only the transitions in the middle of a bit carry data, the ones
+            // between two bits with the same value are ignored
+            if (now - this->timestamp > MID_BIT_US) {
+                if (this->index < 32) {
+                    this->frame = (this->frame << 1) | (digitalRead(this->in_pin) == LOW);
+                    this->index++;
+                    this->timestamp = now;
+                } else {
+                    // This is the stop bit, the frame ends half a bit later
+                    this->state = RESPONSE_READY;
+                    this->timestamp = now + HALF_BIT_US;
+                }
+            }
+            break;
+        default:
+            break;
+    }
+}
+
+void OpenthermTransceiver::decode_edges() {
+    uint8_t head = this->edges_head;
+    if ((uint8_t) (head - this->edges_tail) > EDGE_BUFFER_SIZE) {
+        // The interrupt overwrote edges that weren't decoded yet
+        this->state = RESPONSE_INVALID;
+        return;
+    }
+
+    while (this->edges_tail != head) {
+        uint32_t edge = this->edges[this->edges_tail & (EDGE_BUFFER_SIZE - 1)];
+        this->edges_tail++;
+        uint32_t time = edge & ~1u;
+        bool level = edge & 1;
+        // Like with the interrupt decoder, the timeout runs from the last edge, not
+        // from the end of the request
+        uint32_t last_timestamp = this->timestamp;
+        this->timestamp = time;
+
+        if (this->decode_position == NO_EDGE) {
+            // The response starts with the first half of the start bit, which is active
+            if (!level) {
+                this->state = RESPONSE_INVALID;
+                return;
+            }
+            this->decode_position = 0;
+            this->response_delay = time - last_timestamp;
+            this->decode_timestamp = time;
+            this->decode_level = level;
+            continue;
+        }
+
+        // Every edge changes the level, otherwise the interrupt missed one
+        if (level == this->decode_level) {
+            this->state = RESPONSE_INVALID;
+            return;
+        }
+        this->decode_level = level;
+
+        // Like the interrupt decoder, the time is measured from the last edge in the
+        // middle of a bit, so the latency of the edges between bits doesn't count.
+        // After the middle of a bit, edges less than 750 µs later are between two
+        // bits with the same value. After the start or such an edge, the middle of
+        // the next bit follows.
+        uint32_t interval = time - this->decode_timestamp;
+        if (interval < HALF_BIT_US / 2) {
+            this->state = RESPONSE_INVALID;
+            return;
+        }
+        if (this->decode_position % 2 == 1 && interval < MID_BIT_US) {
+            this->decode_position++;
+            continue;
+        }
+        this->decode_position += this->decode_position % 2 == 0 ? 1 : 2;
+
+        // Going idle in the middle of a bit means it was active in the first half, a 1
+        this->decode_timestamp = time;
+        uint8_t bit = this->decode_position / 2;
+        bool value = !level;
+        if (bit == 0 || bit == FRAME_BITS - 1) {
+            if (!value) {
+                this->state = RESPONSE_INVALID;
+                return;
+            }
+            if (bit == FRAME_BITS - 1) {
+                // The frame ends half a bit after the middle of the stop bit
+                this->state = RESPONSE_READY;
+                this->timestamp = time + HALF_BIT_US;
+                return;
+            }
+        } else {
+            this->frame = (this->frame << 1) | value;
+        }
+    }
+}
+
+bool OpenthermTransceiver::process(uint32_t &response, OpenThermResponseStatus &status) {
+    if (this->deferred_decoding && this->state == RESPONSE_WAITING) {
+        this->decode_edges();
+    }
+
+    State state = this->state;
+    uint32_t now = micros();
+
+    switch (state) {
+        case RESPONSE_WAITING:
+        case RESPONSE_START_BIT:
+        case RESPONSE_RECEIVING:
+            if (now - this->timestamp > this->response_timeout_us) {
+                response = 0;
+                status = OpenThermResponseStatus::TIMEOUT;
+                // Like after an invalid response, a late response may still be on
+                // the bus, so the next request waits for the delay
+                this->timestamp = now;
+                this->state = DELAY;
+                return true;
+            }
+            return false;
+        case RESPONSE_READY:
+        case RESPONSE_INVALID:
+            response = this->frame;
+            status = state == RESPONSE_READY && is_valid_response(response)
+                ? OpenThermResponseStatus::SUCCESS
+                : OpenThermResponseStatus::INVALID;
+            if (state == RESPONSE_INVALID) {
+                // The rest of the response may still be on the bus, the delay only
+                // starts once it has certainly ended
+                this->timestamp = now + FRAME_HALF_BITS * HALF_BIT_US;
+            }
+            this->state = DELAY;
+            return true;
+        case DELAY:
+            // The delay may start in the future, when the end of the response was predicted
+            if ((int32_t) (now - this->timestamp) > (int32_t) this->request_delay_us) {
+                this->state = READY;
+            }
+            return false;
+        default:
+            return false;
+    }
+}
+
+} // namespace opentherm
+} // namespace esphome
@@ -0,0 +1,124 @@
+#pragma once
+
+#include "esphome/core/hal.h"
+
+#include "OpenTherm.h"
+
+namespace esphome {
+namespace opentherm {
+
+// The same timing as the OpenTherm library: the boiler has a second to respond,
+// and the next request is sent at least 100 ms after the response
+static const uint32_t OPENTHERM_RESPONSE_TIMEOUT_US = 1000000;
+static const uint32_t OPENTHERM_REQUEST_DELAY_US = 100000;
+// Duration of a frame of 34 bits, each a millisecond long
+static const uint32_t OPENTHERM_FRAME_US = 34000;
+
+// Number of edges the pin interrupt can record before the loop decodes them. A
+// frame has at most 68, the rest leaves room for glitches. Must be a power of two.
+static const uint8_t EDGE_BUFFER_SIZE = 128;
+
+// Exchanges frames with the boiler without blocking the main loop, used in sync
+// mode. The OpenTherm library sends a request by toggling the output pin from the
+// main loop, and receives the response in whatever time the loop has left. Here
+// the request is sent one half bit at a time from a 500 µs hardware timer
+// interrupt and the response is decoded in the interrupt of the input pin, so the
+// timing of the frames does not depend on what other components do in the loop.
+class OpenthermTransceiver {
+public:
+    enum State : uint8_t {
+        // Not set up, or no hardware timer available
+        UNAVAILABLE,
+        READY,
+        SENDING,
+        RESPONSE_WAITING,
+        RESPONSE_START_BIT,
+        RESPONSE_RECEIVING,
+        RESPONSE_READY,
+        RESPONSE_INVALID,
+        // Waiting for the minimum time between a response and the next request
+        DELAY,
+    };
+
+protected:
+    int in_pin, out_pin;
+    void(*handle_timer_callback)();
+
+    volatile State state = UNAVAILABLE;
+    // The frame being sent or received
+    volatile uint32_t frame = 0;
+    // Index of the half bit that is sent next, or of the bit that is received next
+    volatile uint8_t index = 0;
+    // Time of the last change on the bus in microseconds, to time the response
+    // and the delay before the next request from
+    volatile uint32_t timestamp = 0;
+    // Time from the end of the last request to the start of its response
+    volatile uint32_t response_delay = 0;
+
+    // Time to wait for a response, and between a response and the next request
+    uint32_t response_timeout_us = OPENTHERM_RESPONSE_TIMEOUT_US;
+    uint32_t request_delay_us = OPENTHERM_REQUEST_DELAY_US;
+
+#ifdef USE_ESP32
+    hw_timer_t *timer = nullptr;
+#endif
+
+    // With deferred decoding the pin interrupt only records the time and new
+    // level of every edge of the response, the loop decodes them later. The
+    // interrupt writes edges_head and the loop edges_tail, so no locking is needed.
+    bool deferred_decoding = false;
+    volatile uint32_t edges[EDGE_BUFFER_SIZE];
+    volatile uint8_t edges_head = 0;
+    uint8_t edges_tail = 0;
+    // Position of the last decoded edge in half bits since the start of the
+    // response, and its time and level
+    uint8_t decode_position = 0;
+    uint32_t decode_timestamp = 0;
+    bool decode_level = false;
+
+    // Decode the recorded edges, moving to RESPONSE_READY or RESPONSE_INVALID
+    // once the frame is complete or can't be decoded
+    void decode_edges();
+
+    bool start_timer();
+    void IRAM_ATTR stop_timer();
+    void IRAM_ATTR write_half_bit(uint8_t half_bit);
+
+public:
+    // Set up the pins and the hardware timer. The callbacks are global functions
+    // that call handle_interrupt and handle_timer, as generated for the hub.
+    // Returns false if no hardware timer is available, sync mode can't be used then.
+    bool setup(int in_pin, int out_pin, void(*handle_interrupt_callback)(), void(*handle_timer_callback)());
+
+    // Stop the timer and detach the interrupts, after which the hardware timer is free again
+    void end();
+
+    // Decode the response in the loop instead of in the pin interrupt, set before setup
+    void set_deferred_decoding(bool deferred_decoding) { this->deferred_decoding = deferred_decoding; }
+
+    // Change the timing, for the bus tuning of the hub
+    void set_response_timeout(uint32_t response_timeout_us) { this->response_timeout_us = response_timeout_us; }
+    void set_request_delay(uint32_t request_delay_us) { this->request_delay_us = request_delay_us; }
+    uint32_t get_response_timeout() { return this->response_timeout_us; }
+    uint32_t get_request_delay() { return this->request_delay_us; }
+    uint32_t get_response_delay() { return this->response_delay; }
+
+    bool is_available() { return this->state != UNAVAILABLE; }
+    bool is_ready() { return this->state == READY; }
+
+    // Start sending a request, returns immediately
+    bool send_request_async(uint32_t request);
+
+    // Finish the exchange from the main loop. Returns true once the response was
+    // received or the boiler did not answer in time, together with the response
+    // and its status like the library passes to its response callback.
+    bool process(uint32_t &response, OpenThermResponseStatus &status);
+
+    // Called from the interrupt of the input pin
+    void IRAM_ATTR handle_interrupt();
+    // Called every 500 µs from the hardware timer interrupt while sending
+    void IRAM_ATTR handle_timer();
+};
+
+} // namespace opentherm
+} // namespace esphome
@@ -1,6 +1,9 @@
-from typing import Callable
+from typing import Any, Callable, Dict
 
 import esphome.config_validation as cv
+import esphome.final_validate as fv
+from esphome.const import CONF_PLATFORM, CONF_UPDATE_INTERVAL
+from esphome.core import CORE
 
 from . import const, schema, generate
 
@@ -10,7 +13,57 @@ def create_entities_schema(entities: schema.Schema[schema.T], get_entity_validat
         schema[cv.Optional(key)] = get_entity_validation_schema(entity)
     return cv.Schema(schema)
 
-def create_component_schema(entities: schema.Schema[schema.T], get_entity_validation_schema: Callable[[schema.T], cv.Schema]) -> cv.Schema:
+def create_update_interval_schema(entity: schema.EntitySchema) -> cv.Schema:
+    # Only values which are kept updated are requested more than once
+    if not entity["keep_updated"]:
+        return cv.Schema({})
+    return cv.Schema({
+        cv.Optional(CONF_UPDATE_INTERVAL, entity.get("update_interval", "0s")): cv.positive_time_period_milliseconds,
+    })
+
+def create_component_schema(entities: schema.Schema[generate.TSchema], get_entity_validation_schema: Callable[[generate.TSchema], cv.Schema]) -> cv.Schema:
     return cv.Schema({ cv.GenerateID(const.CONF_OPENTHERM_ID): cv.use_id(generate.OpenthermHub) }) \
-        .extend(create_entities_schema(entities, get_entity_validation_schema)) \
+        .extend(create_entities_schema(entities, lambda entity: get_entity_validation_schema(entity).extend(create_update_interval_schema(entity)))) \
         .extend(cv.COMPONENT_SCHEMA)
+
+def validate_deferred_decoding(config: Dict[str, Any]) -> Dict[str, Any]:
+    # Responses are only decoded by the component itself in sync mode
+    if config["deferred_decoding"] and not config["sync_mode"]:
+        raise cv.Invalid("deferred_decoding requires sync_mode")
+    return config
+
+def validate_adaptive_polling(config: Dict[str, Any]) -> Dict[str, Any]:
+    if config["min_interval"] > config["max_interval"]:
+        raise cv.Invalid("min_interval must not be larger than max_interval")
+    return config
+
+def validate_bus_tuning(config: Dict[str, Any]) -> Dict[str, Any]:
+    # The library has a fixed timing, only the component itself can change it
+    if "bus_tuning" in config and not config["sync_mode"]:
+        raise cv.Invalid("bus_tuning requires sync_mode")
+    return config
+
+# Platforms that use timer1 of the ESP8266, directly or through the waveform
+# generator of the Arduino core, by component
+ESP8266_TIMER1_PLATFORMS = {
+    "output": ["esp8266_pwm", "ac_dimmer"],
+}
+# Components that use timer1 of the ESP8266 themselves
+ESP8266_TIMER1_COMPONENTS = ["lightwaverf"]
+
+def validate_sync_mode_timer(config: Dict[str, Any]) -> Dict[str, Any]:
+    # Sync mode sends the requests from timer1 on the ESP8266, the only timer that
+    # is free to use, so it can't be shared with other hubs or components
+    if not config["sync_mode"] or not CORE.is_esp8266:
+        return config
+    full_config = fv.full_config.get()
+    if sum(1 for hub in full_config.get("opentherm", []) if hub["sync_mode"]) > 1:
+        raise cv.Invalid("Only one hub can use sync_mode on the ESP8266, as it has only one free timer", path=["sync_mode"])
+    for component, platforms in ESP8266_TIMER1_PLATFORMS.items():
+        for item in full_config.get(component, []):
+            if item.get(CONF_PLATFORM) in platforms:
+                raise cv.Invalid(f"sync_mode uses timer1 of the ESP8266, which the {item[CONF_PLATFORM]} {component} also uses", path=["sync_mode"])
+    for component in ESP8266_TIMER1_COMPONENTS:
+        if component in full_config:
+            raise cv.Invalid(f"sync_mode uses timer1 of the ESP8266, which {component} also uses", path=["sync_mode"])
+    return config
@@ -0,0 +1,201 @@
+"""Fuzz how the OpenTherm hub processes responses, with all entities enabled.
+
+ESPHome generates the code for a configuration with every entity of the schema
+and the optional features that change how responses are processed, which is
+compiled for the host together with host/fuzz.cpp and the address and undefined
+behaviour sanitizers. The fuzzer starts from a corpus of responses for every
+message, written from the schema, and runs random and mutated inputs for the
+given time. It fails on a crash, a sanitizer error, a response that is logged
+without bound, or a hub that no longer builds valid requests:
+
+    python fuzz_hub.py --duration 600
+
+With --libfuzzer, the same target is built with clang for coverage-guided
+fuzzing by libFuzzer. The corpus can also be used with AFL, by building
+host/fuzz.cpp with afl-clang++ and running it with @@ as the input file.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from benchmark_bus import build_driver
+from benchmark_size import BASE_CONFIG, entities_config
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "components"))
+
+from opentherm import message_data, schema  # noqa: E402
+
+# The configuration and corpus are written here, relative to the examples folder
+FUZZ_DIR = os.path.join(".esphome", "fuzz")
+
+FUZZ_OPTIONS = """\
+opentherm:
+  sync_mode: true
+  bus_tuning: {}
+  adaptive_polling: {}
+  persist_capabilities: true
+  snapshot: true
+"""
+
+SANITIZER_FLAGS = ["-O1", "-g", "-fno-omit-frame-pointer", "-fsanitize=address,undefined", "-fno-sanitize-recover=undefined"]
+LIBFUZZER_FLAGS = ["-O1", "-g", "-fsanitize=fuzzer,address,undefined", "-DHOST_LIBFUZZER"]
+
+# Response statuses and time steps as decoded by host/fuzz.cpp
+STATUS_SUCCESS = 1
+STATUS_INVALID = 2
+STATUS_TIMEOUT = 3
+STEP_1S = 2 << 6
+
+# Values to send for every data format, before they are written to the 16 data bits
+SAMPLE_VALUES: Dict[str, List[message_data.Value]] = {
+    "flag8": [False, True],
+    "u8": [0, 1, 100, 255],
+    "s8": [-128, -1, 0, 60, 127],
+    "u16": [0, 1, 1000, 65535],
+    "s16": [-32768, -1, 0, 1000, 32767],
+    "f88": [-40.0, -0.5, 0.0, 21.5, 60.25, 127.99],
+}
+
+
+def fuzz_config() -> str:
+    """Get the configuration with every entity of the schema."""
+    numbers = "number:\n  - platform: opentherm\n"
+    for key, entity in schema.INPUTS.items():
+        numbers += f"    {key}:\n      name: \"{key}\"\n"
+        for auto in ("auto_min_value", "auto_max_value"):
+            if auto in entity:
+                numbers += f"      {auto}: true\n"
+    return (
+        BASE_CONFIG.format(name="fuzz-hub", components=os.path.join(ROOT, "components"))
+        + FUZZ_OPTIONS
+        + entities_config("sensor", list(schema.SENSORS.keys()) + list(schema.DIAGNOSTIC_SENSORS.keys()))
+        + entities_config("binary_sensor", list(schema.BINARY_SENSORS.keys()))
+        + entities_config("switch", list(schema.SWITCHES.keys()))
+        + numbers
+    )
+
+
+def record(frame: int, status: int = STATUS_SUCCESS, control: int = STEP_1S) -> bytes:
+    """Encode a response as read by host/fuzz.cpp, by default as a successful
+    response to its own message after a second.
+    """
+    return frame.to_bytes(4, "little") + bytes([status, control])
+
+
+def sample_data(formats: List[str]) -> List[int]:
+    """Get the data of responses with sample values for all the formats of a message."""
+    samples = []
+    for i in range(max(len(SAMPLE_VALUES[message_data.parse_format(fmt).kind]) for fmt in formats)):
+        data = 0
+        for fmt in formats:
+            kind = message_data.parse_format(fmt).kind
+            values = SAMPLE_VALUES[kind]
+            # Scaled formats can only be parsed, write their raw byte instead
+            data = message_data.write(re.sub(r"_60$", "", fmt), values[i % len(values)], data)
+        samples.append(data)
+    return samples
+
+
+def message_formats() -> Dict[int, List[str]]:
+    """Get the data formats used by the entities of every message."""
+    formats: Dict[int, List[str]] = {}
+    # The diagnostic sensors have no message of their own
+    schemas: List[schema.Schema] = [schema.SENSORS, schema.BINARY_SENSORS, schema.SWITCHES, schema.INPUTS]
+    for schema_ in schemas:
+        for entity in schema_.values():
+            msg_id = message_data.MESSAGE_IDS[entity["message"]]
+            formats.setdefault(msg_id, []).append(entity["message_data"])
+            for auto in ("auto_min_value", "auto_max_value"):
+                if auto in entity:
+                    auto_id = message_data.MESSAGE_IDS[entity[auto]["message"]]
+                    formats.setdefault(auto_id, []).append(entity[auto]["message_data"])
+    return formats
+
+
+def seed_corpus() -> Dict[str, bytes]:
+    """Get the seed inputs by file name: for every message the responses with its
+    sample values and the ways the boiler can fail to answer it, and all messages
+    answered in turn.
+    """
+    corpus: Dict[str, bytes] = {}
+    all_messages = b""
+    for msg_id, formats in sorted(message_formats().items()):
+        responses = [
+            record(message_data.build_frame(msg_type, msg_id, data))
+            for data in sample_data(formats)
+            for msg_type in (message_data.READ_ACK, message_data.WRITE_ACK)
+        ]
+        failures = [
+            record(message_data.build_frame(message_data.UNKNOWN_DATA_ID, msg_id, 0)),
+            record(message_data.build_frame(message_data.DATA_INVALID, msg_id, 0)),
+            record(message_data.build_frame(message_data.READ_ACK, msg_id, 0) ^ (1 << 31), STATUS_INVALID),
+            record(0, STATUS_TIMEOUT),
+        ]
+        corpus[f"message-{msg_id:03d}"] = b"".join(responses + failures + responses[:2])
+        all_messages += responses[-1]
+    corpus["all-messages"] = all_messages
+    return corpus
+
+
+def run_fuzzer(program: str, corpus_dir: str, duration: int, libfuzzer: bool) -> Tuple[int, float, str]:
+    """Run the fuzzer, and get its exit status, the inputs it ran per second and its output."""
+    if libfuzzer:
+        command = [program, f"-max_total_time={duration}", "-print_final_stats=1", corpus_dir]
+        pattern = r"stat::average_exec_per_sec:\s+(\d+)"
+    else:
+        command = [program, "-t", str(duration), corpus_dir]
+        pattern = r"^EXECS \S+ (\S+)"
+    res = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    match = re.search(pattern, res.stdout, re.MULTILINE)
+    return res.returncode, float(match.group(1)) if match else 0.0, res.stdout
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*", help="Inputs to run once instead of fuzzing, like a saved crash")
+    parser.add_argument("--duration", type=int, default=600, help="Time to fuzz in seconds")
+    parser.add_argument("--libfuzzer", action="store_true", help="Build for libFuzzer with clang instead of the standalone fuzzer")
+    parser.add_argument("--cxx", default=None, help="Host C++ compiler, defaults to g++, or clang++ with --libfuzzer")
+    args = parser.parse_args()
+
+    cxx = args.cxx or os.environ.get("CXX", "clang++" if args.libfuzzer else "g++")
+    inputs = [os.path.abspath(file) for file in args.inputs]
+    os.chdir(os.path.join(ROOT, "examples"))
+    corpus_dir = os.path.join(FUZZ_DIR, "corpus")
+    os.makedirs(corpus_dir, exist_ok=True)
+    config = os.path.join(FUZZ_DIR, "fuzz-hub.yaml")
+    with open(config, "w") as f:
+        f.write(fuzz_config())
+    # Inputs libFuzzer added to the corpus in earlier runs are kept
+    for name, data in seed_corpus().items():
+        with open(os.path.join(corpus_dir, name), "wb") as f:
+            f.write(data)
+
+    build_dir = os.path.join(FUZZ_DIR, "build")
+    try:
+        program = build_driver(config, build_dir, cxx, "fuzz", LIBFUZZER_FLAGS if args.libfuzzer else SANITIZER_FLAGS)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        print(f"Building the fuzzer failed: {e}")
+        return 1
+
+    if inputs:
+        res = subprocess.run([program, *inputs])
+        return 1 if res.returncode != 0 else 0
+
+    print(f"------- Fuzzing for {args.duration} s -------")
+    status, execs_per_second, output = run_fuzzer(os.path.abspath(program), corpus_dir, args.duration, args.libfuzzer)
+    if status != 0:
+        print(output, end="")
+        print(f"❌ The fuzzer failed with status {status}, the input is saved in {os.path.abspath(os.curdir)}")
+        return 1
+    print(f"✅ No failures in {args.duration} s, {execs_per_second:.0f} inputs/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -55,13 +55,21 @@ sections = {
     ]) + LINESEP,
     "binary_sensor": LINESEP.join([
         f"- `{key}`: {sch['description']}"
+        + (MD_LINEBREAK + f"  Default `update_interval`: {sch['update_interval']}" if "update_interval" in sch else "")
         for key, sch in schema.BINARY_SENSORS.items()
     ]) + LINESEP,
     "sensor": LINESEP.join([
         f"- `{key}`: {sch['description']}" 
         + (f" ({sch['unit_of_measurement']})" if "unit_of_measurement" in sch else "")
+        + (MD_LINEBREAK + f"  Default `update_interval`: {sch['update_interval']}" if "update_interval" in sch else "")
+        + (MD_LINEBREAK + f"  Requested at full rate only while `{sch['active_while']}`, otherwise once a minute" if "active_while" in sch else "")
         for key, sch in schema.SENSORS.items()
     ]) + LINESEP,
+    "diagnostic_sensor": LINESEP.join([
+        f"- `{key}`: {sch['description']}"
+        + (f" ({sch['unit_of_measurement']})" if "unit_of_measurement" in sch else "")
+        for key, sch in schema.DIAGNOSTIC_SENSORS.items()
+    ]) + LINESEP,
 }
 
 replace_docs(sections)
@@ -0,0 +1,206 @@
+#include "OpenTherm.h"
+
+#include "esphome/core/hal.h"
+#include "host_bus.h"
+
+// Duration of a single frame on the bus: start bit, 32 data bits and stop bit
+static const uint32_t FRAME_DURATION_US = 34 * 1000;
+
+OpenTherm::OpenTherm(int inPin, int outPin, bool isSlave)
+    : status(OpenThermStatus::NOT_INITIALIZED), inPin(inPin), outPin(outPin), isSlave(isSlave),
+      response(0), responseStatus(OpenThermResponseStatus::NONE), responseTimestamp(0), responsePending(false),
+      handleInterruptCallback(nullptr), processResponseCallback(nullptr) {
+}
+
+void OpenTherm::begin(void (*handleInterruptCallback)(void)) {
+    this->handleInterruptCallback = handleInterruptCallback;
+    this->status = OpenThermStatus::READY;
+}
+
+void OpenTherm::begin(void (*handleInterruptCallback)(void), void (*processResponseCallback)(unsigned long, OpenThermResponseStatus)) {
+    this->begin(handleInterruptCallback);
+    this->processResponseCallback = processResponseCallback;
+}
+
+bool OpenTherm::isReady() {
+    return this->status == OpenThermStatus::READY;
+}
+
+bool OpenTherm::sendRequestAsync(unsigned long request) {
+    if (!this->isReady()) {
+        return false;
+    }
+
+    this->status = OpenThermStatus::REQUEST_SENDING;
+    this->response = 0;
+    this->responseStatus = OpenThermResponseStatus::NONE;
+
+    // The library bit-bangs the request, which blocks for the duration of a frame
+    uint32_t start = esphome::micros();
+    uint32_t delay_ms, frame;
+    bool answered = host_bus_exchange(start / 1000, request & 0xffffffff, delay_ms, frame);
+    host_advance_time_us(FRAME_DURATION_US);
+
+    if (answered) {
+        this->responsePending = true;
+        this->response = frame;
+        // The response is available once the boiler waited and transmitted it
+        this->responseTimestamp = esphome::micros() + delay_ms * 1000 + FRAME_DURATION_US;
+    } else {
+        this->responsePending = false;
+        this->responseTimestamp = esphome::micros();
+    }
+
+    this->status = OpenThermStatus::RESPONSE_WAITING;
+    return true;
+}
+
+unsigned long OpenTherm::sendRequest(unsigned long request) {
+    if (!this->sendRequestAsync(request)) {
+        return 0;
+    }
+    while (!this->isReady()) {
+        this->process();
+        host_advance_time_us(1000);
+    }
+    return this->response;
+}
+
+bool OpenTherm::sendResponse(unsigned long) {
+    return false;
+}
+
+unsigned long OpenTherm::getLastResponse() {
+    return this->response;
+}
+
+OpenThermResponseStatus OpenTherm::getLastResponseStatus() {
+    return this->responseStatus;
+}
+
+void OpenTherm::handleInterrupt() {
+}
+
+void OpenTherm::process() {
+    OpenThermStatus st = this->status;
+    uint32_t now = esphome::micros();
+
+    // Stands in for the interrupt handler receiving the response
+    if (st == OpenThermStatus::RESPONSE_WAITING && this->responsePending && (int32_t) (now - this->responseTimestamp) >= 0) {
+        this->responsePending = false;
+        this->status = st = OpenThermStatus::RESPONSE_READY;
+    }
+    if (st == OpenThermStatus::READY) {
+        return;
+    }
+
+    uint32_t ts = this->responseTimestamp;
+    if (st == OpenThermStatus::RESPONSE_WAITING && this->responsePending) {
+        return;
+    }
+    if (st != OpenThermStatus::NOT_INITIALIZED && st != OpenThermStatus::DELAY && (now - ts) > 1000000) {
+        this->status = OpenThermStatus::READY;
+        this->responseStatus = OpenThermResponseStatus::TIMEOUT;
+        if (this->processResponseCallback != nullptr) {
+            this->processResponseCallback(this->response, this->responseStatus);
+        }
+    } else if (st == OpenThermStatus::RESPONSE_READY) {
+        this->status = OpenThermStatus::DELAY;
+        this->responseStatus = (this->isSlave ? isValidRequest(this->response) : isValidResponse(this->response))
+            ? OpenThermResponseStatus::SUCCESS
+            : OpenThermResponseStatus::INVALID;
+        if (this->processResponseCallback != nullptr) {
+            this->processResponseCallback(this->response, this->responseStatus);
+        }
+    } else if (st == OpenThermStatus::DELAY) {
+        if ((now - ts) > 100000) {
+            this->status = OpenThermStatus::READY;
+        }
+    }
+}
+
+void OpenTherm::end() {
+    this->status = OpenThermStatus::NOT_INITIALIZED;
+}
+
+bool OpenTherm::parity(unsigned long frame) {
+    uint8_t p = 0;
+    while (frame > 0) {
+        if (frame & 1) p++;
+        frame = frame >> 1;
+    }
+    return (p & 1);
+}
+
+OpenThermMessageType OpenTherm::getMessageType(unsigned long message) {
+    return static_cast<OpenThermMessageType>((message >> 28) & 7);
+}
+
+OpenThermMessageID OpenTherm::getDataID(unsigned long frame) {
+    return static_cast<OpenThermMessageID>((frame >> 16) & 0xff);
+}
+
+unsigned long OpenTherm::buildRequest(OpenThermMessageType type, OpenThermMessageID id, unsigned int data) {
+    unsigned long request = data;
+    if (type == OpenThermMessageType::WRITE_DATA) {
+        request |= 1ul << 28;
+    }
+    request |= ((unsigned long) id) << 16;
+    if (parity(request)) request |= (1ul << 31);
+    return request;
+}
+
+unsigned long OpenTherm::buildResponse(OpenThermMessageType type, OpenThermMessageID id, unsigned int data) {
+    unsigned long response = data;
+    response |= ((unsigned long) type) << 28;
+    response |= ((unsigned long) id) << 16;
+    if (parity(response)) response |= (1ul << 31);
+    return response;
+}
+
+bool OpenTherm::isValidResponse(unsigned long response) {
+    if (parity(response)) return false;
+    uint8_t msgType = (response << 1) >> 29 & 7;
+    return msgType == READ_ACK || msgType == WRITE_ACK;
+}
+
+bool OpenTherm::isValidRequest(unsigned long request) {
+    if (parity(request)) return false;
+    uint8_t msgType = (request << 1) >> 29 & 7;
+    return msgType == READ_DATA || msgType == WRITE_DATA;
+}
+
+unsigned long OpenTherm::buildSetBoilerStatusRequest(
+    bool enableCentralHeating, bool enableHotWater, bool enableCooling, bool enableOutsideTemperatureCompensation,
+    bool enableCentralHeating2, bool summerMode, bool dhwBlock
+) {
+    unsigned int data = enableCentralHeating | (enableHotWater << 1) | (enableCooling << 2)
+        | (enableOutsideTemperatureCompensation << 3) | (enableCentralHeating2 << 4)
+        | (summerMode << 5) | (dhwBlock << 6);
+    data <<= 8;
+    return buildRequest(OpenThermMessageType::READ_DATA, OpenThermMessageID::Status, data);
+}
+
+const char *OpenTherm::statusToString(OpenThermResponseStatus status) {
+    switch (status) {
+        case NONE: return "NONE";
+        case SUCCESS: return "SUCCESS";
+        case INVALID: return "INVALID";
+        case TIMEOUT: return "TIMEOUT";
+        default: return "UNKNOWN";
+    }
+}
+
+const char *OpenTherm::messageTypeToString(OpenThermMessageType message_type) {
+    switch (message_type) {
+        case READ_DATA: return "READ_DATA";
+        case WRITE_DATA: return "WRITE_DATA";
+        case INVALID_DATA: return "INVALID_DATA";
+        case RESERVED: return "RESERVED";
+        case READ_ACK: return "READ_ACK";
+        case WRITE_ACK: return "WRITE_ACK";
+        case DATA_INVALID: return "DATA_INVALID";
+        case UNKNOWN_DATA_ID: return "UNKNOWN_DATA_ID";
+        default: return "UNKNOWN";
+    }
+}
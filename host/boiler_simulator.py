@@ -0,0 +1,371 @@
+"""Simulated OpenTherm boiler for running the hub on the host.
+
+The simulator starts the host driver (see driver.cpp), answers the requests the
+OpenTherm stand-in prints on its stdout and measures how the hub uses the bus.
+It can be used on its own:
+
+    python host/boiler_simulator.py path/to/driver --duration 600
+
+but is normally run by benchmark_bus.py for every example configuration.
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Message types, as in the OpenTherm specification
+READ_DATA = 0
+WRITE_DATA = 1
+READ_ACK = 4
+WRITE_ACK = 5
+DATA_INVALID = 6
+UNKNOWN_DATA_ID = 7
+
+# Duration of a frame on the bus in milliseconds: start bit, 32 data bits and stop bit
+FRAME_DURATION = 34
+# The master has to wait at least 100 ms after a response before sending the
+# next request, and has to communicate at least every second (+15%)
+MIN_REQUEST_GAP = 100
+MAX_REQUEST_INTERVAL = 1150
+# The slave responds between 20 and 800 ms after a request, in practice
+# boilers respond within a fraction of that
+RESPONSE_DELAY = (20, 200)
+
+# Messages this boiler does not know, and messages it never answers
+DEFAULT_UNKNOWN_IDS = {29, 30, 31, 34, 35, 36, 50}
+DEFAULT_SILENT_IDS = {32}
+
+
+def parity(frame: int) -> int:
+    return bin(frame).count("1") & 1
+
+
+def build_frame(msg_type: int, msg_id: int, data: int) -> int:
+    frame = (msg_type << 28) | (msg_id << 16) | (data & 0xFFFF)
+    return frame | (parity(frame) << 31)
+
+
+def f88(value: float) -> int:
+    return int(round(value * 256)) & 0xFFFF
+
+
+def from_f88(data: int) -> float:
+    if data & 0x8000:
+        data -= 0x10000
+    return data / 256
+
+
+def u8u8(hb: int, lb: int) -> int:
+    return ((hb & 0xFF) << 8) | (lb & 0xFF)
+
+
+class Boiler:
+    """A very simple model of a modulating boiler heating a house."""
+
+    def __init__(self, unknown_ids: Set[int], silent_ids: Set[int]) -> None:
+        self.unknown_ids = unknown_ids
+        self.silent_ids = silent_ids
+        self.time = 0.0
+        self.master_flags = 0
+        self.t_set = 0.0
+        self.t_set_ch2 = 0.0
+        self.t_dhw_set = 50.0
+        self.max_t_set = 80.0
+        self.max_rel_mod = 100.0
+        self.t_boiler = 20.0
+        self.modulation = 0.0
+        self.burner_starts = 0
+
+        self.readers: Dict[int, Callable[[], int]] = {
+            0: self.status,
+            1: lambda: f88(self.t_set),
+            3: lambda: u8u8(0b00000001, 0),
+            5: lambda: 0,
+            8: lambda: f88(self.t_set_ch2),
+            14: lambda: f88(self.max_rel_mod),
+            15: lambda: u8u8(24, 10),
+            17: lambda: f88(self.modulation),
+            18: lambda: f88(1.5),
+            19: lambda: f88(0.0),
+            25: lambda: f88(self.t_boiler),
+            26: lambda: f88(48.0),
+            27: lambda: f88(8.0),
+            28: lambda: f88(self.t_ret),
+            33: lambda: 65,
+            48: lambda: u8u8(65, 35),
+            49: lambda: u8u8(80, 20),
+            56: lambda: f88(self.t_dhw_set),
+            57: lambda: f88(self.max_t_set),
+            58: lambda: f88(1.5),
+            115: lambda: 0,
+            116: lambda: self.burner_starts,
+            117: lambda: 1200,
+            118: lambda: 800,
+            119: lambda: 300,
+            120: lambda: 4000,
+            121: lambda: 5000,
+            122: lambda: 1000,
+            123: lambda: 500,
+            125: lambda: f88(2.2),
+            127: lambda: u8u8(1, 4),
+        }
+        self.writers: Dict[int, Callable[[int], None]] = {
+            1: lambda data: setattr(self, "t_set", from_f88(data)),
+            2: lambda data: None,
+            7: lambda data: None,
+            8: lambda data: setattr(self, "t_set_ch2", from_f88(data)),
+            14: lambda data: setattr(self, "max_rel_mod", from_f88(data)),
+            16: lambda data: None,
+            23: lambda data: None,
+            24: lambda data: None,
+            56: lambda data: setattr(self, "t_dhw_set", from_f88(data)),
+            57: lambda data: setattr(self, "max_t_set", from_f88(data)),
+        }
+
+    @property
+    def ch_enable(self) -> bool:
+        return bool(self.master_flags & 0x01)
+
+    @property
+    def flame(self) -> bool:
+        return self.modulation > 0
+
+    @property
+    def t_ret(self) -> float:
+        return self.t_boiler - self.modulation / 10
+
+    def status(self) -> int:
+        slave_flags = (int(self.flame and self.ch_enable) << 1) | (int(self.flame) << 3)
+        return u8u8(self.master_flags, slave_flags)
+
+    def step(self, time: float) -> None:
+        """Advance the model to the given time in seconds."""
+        dt = max(0.0, time - self.time)
+        self.time = time
+        target = min(self.t_set, self.max_t_set)
+        was_on = self.flame
+        if self.ch_enable and target > self.t_boiler:
+            self.modulation = min(self.max_rel_mod, max(10.0, (target - self.t_boiler) * 10))
+        elif self.t_boiler > target + 5 or not self.ch_enable:
+            self.modulation = 0.0
+        if self.flame and not was_on:
+            self.burner_starts += 1
+        self.t_boiler += dt * (self.modulation / 100 * 0.5 - (self.t_boiler - 18) * 0.004)
+
+    def respond(self, request: int) -> Optional[int]:
+        """Build the response to a request, or None if the boiler does not answer."""
+        msg_type = (request >> 28) & 7
+        msg_id = (request >> 16) & 0xFF
+        data = request & 0xFFFF
+        if msg_id in self.silent_ids:
+            return None
+        if msg_id in self.unknown_ids:
+            return build_frame(UNKNOWN_DATA_ID, msg_id, data)
+        if msg_type == READ_DATA and msg_id in self.readers:
+            if msg_id == 0:
+                self.master_flags = data >> 8
+            return build_frame(READ_ACK, msg_id, self.readers[msg_id]())
+        if msg_type == WRITE_DATA and msg_id in self.writers:
+            self.writers[msg_id](data)
+            return build_frame(WRITE_ACK, msg_id, data)
+        return build_frame(UNKNOWN_DATA_ID, msg_id, data)
+
+
+@dataclass
+class Metrics:
+    duration: float = 0.0
+    requests: int = 0
+    invalid_requests: int = 0
+    unknown_responses: int = 0
+    timeouts: int = 0
+    gap_violations: int = 0
+    interval_violations: int = 0
+    # Violations of the bit timing, reported by the bus simulation in sync mode
+    bit_violations: int = 0
+    # Responses the hub considered invalid or did not receive although the boiler
+    # answered, as counted by the hub
+    failed_responses: int = 0
+    # States published by the sensors and binary sensors of the hub
+    publishes: int = 0
+    # Time of the first setpoint write, which is delayed by the initial messages
+    first_setpoint: Optional[int] = None
+    # Size of the hub object, and the heap it allocated in bytes and blocks until
+    # it was set up, as measured by the driver on the host
+    hub_bytes: int = 0
+    heap_bytes: int = 0
+    heap_blocks: int = 0
+    status_intervals: List[int] = field(default_factory=list)
+    setpoint_latencies: List[int] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        def mean(values: List[int]) -> float:
+            return sum(values) / len(values) if values else 0.0
+
+        return {
+            "frames_per_minute": self.requests / self.duration * 60 if self.duration else 0.0,
+            "status_cycle_mean_ms": mean(self.status_intervals),
+            "status_cycle_max_ms": max(self.status_intervals, default=0),
+            "setpoint_latency_mean_ms": mean(self.setpoint_latencies),
+            "setpoint_latency_max_ms": max(self.setpoint_latencies, default=0),
+            "startup_ms": self.first_setpoint or 0,
+            "unknown_responses": self.unknown_responses,
+            "timeouts": self.timeouts,
+            "invalid_requests": self.invalid_requests,
+            "failed_responses": self.failed_responses,
+            "publishes_per_minute": self.publishes / self.duration * 60 if self.duration else 0.0,
+            "timing_violations": self.gap_violations + self.interval_violations + self.bit_violations,
+            "hub_bytes": self.hub_bytes,
+            "heap_bytes": self.heap_bytes,
+            "heap_blocks": self.heap_blocks,
+        }
+
+
+def run(
+    driver: str,
+    duration: int = 600,
+    setpoint_period: int = 60,
+    seed: int = 1,
+    log_level: int = 2,
+    interrupt_latency: int = 0,
+    preferences: Optional[str] = None,
+    min_request_gap: int = MIN_REQUEST_GAP,
+    unknown_ids: Set[int] = DEFAULT_UNKNOWN_IDS,
+    silent_ids: Set[int] = DEFAULT_SILENT_IDS,
+) -> Metrics:
+    """Run the driver against a simulated boiler and measure the bus usage.
+
+    The driver keeps its preferences in the preferences file, if given, so a
+    second run with the same file measures a restart. The boiler does not answer
+    requests that come less than min_request_gap after its last response, which
+    can be lowered to simulate a boiler that is faster than the protocol requires.
+    """
+    rng = random.Random(seed)
+    boiler = Boiler(unknown_ids, silent_ids)
+    metrics = Metrics()
+
+    # End of the last response on the bus, start of the previous request and Status request
+    last_response_end: Optional[int] = None
+    last_request: Optional[int] = None
+    last_status: Optional[int] = None
+    # Setpoints that were set, but didn't reach the boiler yet
+    pending_setpoints: List[Tuple[int, float]] = []
+
+    process = subprocess.Popen(
+        [driver, str(duration), str(setpoint_period), str(log_level), str(interrupt_latency), *([preferences] if preferences else [])],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+    )
+    assert process.stdin is not None and process.stdout is not None
+    for line in process.stdout:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "END":
+            metrics.duration = int(parts[1]) / 1000
+            break
+        if parts[0] == "SET":
+            pending_setpoints.append((int(parts[1]), float(parts[2])))
+            continue
+        if parts[0] == "FAILED":
+            # The hub's timeouts include the requests the boiler never answers
+            metrics.failed_responses = int(parts[1]) + int(parts[2]) - metrics.timeouts
+            continue
+        if parts[0] == "MEMORY":
+            metrics.hub_bytes, metrics.heap_bytes, metrics.heap_blocks = map(int, parts[1:4])
+            continue
+        if parts[0] == "PUBLISHED":
+            metrics.publishes = int(parts[1])
+            continue
+        if parts[0] == "BIT":
+            metrics.bit_violations += 1
+            print(f"Bit timing violation at {parts[1]} ms: {' '.join(parts[2:])}", file=sys.stderr)
+            continue
+        if parts[0] != "REQ":
+            raise RuntimeError(f"Unexpected line from driver: {line!r}")
+
+        time = int(parts[1])
+        request = int(parts[2], 16)
+        msg_type = (request >> 28) & 7
+        msg_id = (request >> 16) & 0xFF
+        metrics.requests += 1
+
+        too_soon = last_response_end is not None and time - last_response_end < min_request_gap
+        if too_soon:
+            metrics.gap_violations += 1
+        if last_request is not None and time - last_request > MAX_REQUEST_INTERVAL:
+            metrics.interval_violations += 1
+        last_request = time
+
+        if msg_id == 0:
+            if last_status is not None:
+                metrics.status_intervals.append(time - last_status)
+            last_status = time
+        if msg_id == 1 and msg_type == WRITE_DATA:
+            if metrics.first_setpoint is None:
+                metrics.first_setpoint = time
+            value = from_f88(request & 0xFFFF)
+            received = time + FRAME_DURATION
+            # Earlier setpoints that never reached the boiler were superseded
+            for index in reversed(range(len(pending_setpoints))):
+                set_time, set_value = pending_setpoints[index]
+                if abs(set_value - value) <= 1 / 256:
+                    metrics.setpoint_latencies.append(received - set_time)
+                    del pending_setpoints[: index + 1]
+                    break
+
+        if parity(request) or msg_type not in (READ_DATA, WRITE_DATA):
+            metrics.invalid_requests += 1
+            response = None
+        elif too_soon:
+            response = None
+        else:
+            boiler.step(time / 1000)
+            response = boiler.respond(request)
+
+        if response is None:
+            metrics.timeouts += 1
+            last_response_end = None
+            process.stdin.write("NONE\n")
+        else:
+            if (response >> 28) & 7 == UNKNOWN_DATA_ID:
+                metrics.unknown_responses += 1
+            delay = rng.randint(*RESPONSE_DELAY)
+            last_response_end = time + 2 * FRAME_DURATION + delay
+            process.stdin.write(f"RSP {delay} {response:08x}\n")
+        process.stdin.flush()
+
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"Driver exited with status {process.returncode}")
+    return metrics
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("driver", help="Path to the compiled host driver")
+    parser.add_argument("--duration", type=int, default=600, help="Simulated time in seconds")
+    parser.add_argument("--setpoint-period", type=int, default=60, help="Seconds between setpoint changes")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the boiler response delays")
+    parser.add_argument("--log-level", type=int, default=2, help="ESPHome log level of the driver")
+    parser.add_argument("--interrupt-latency", type=int, default=0, help="Maximum latency of the pin interrupt in microseconds, in sync mode")
+    parser.add_argument("--preferences", help="File to keep the preferences of the driver in between runs")
+    parser.add_argument("--min-gap", type=int, default=MIN_REQUEST_GAP, help="Time in ms the boiler needs between its response and the next request")
+    args = parser.parse_args()
+
+    metrics = run(
+        args.driver, args.duration, args.setpoint_period, args.seed, args.log_level, args.interrupt_latency,
+        args.preferences, args.min_gap,
+    )
+    json.dump(metrics.summary(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+// Bit level simulation of the OpenTherm bus, used when the hub sends and
+// receives frames itself in sync mode. The levels the component writes to its
+// output pin are decoded into a request and checked against the bit timing of
+// the OpenTherm specification, and the response of the simulated boiler is
+// played back on the input pin, calling the pin interrupt for every edge.
+
+#include "host_bus.h"
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+
+#include "Arduino.h"
+#include "esphome/core/hal.h"
+
+// Duration of half a bit, and the range of the time between the transitions in
+// the middle of two bits allowed by the specification
+static const uint32_t HALF_BIT_US = 500;
+static const uint32_t MID_BIT_INTERVAL_MIN_US = 900;
+static const uint32_t MID_BIT_INTERVAL_MAX_US = 1150;
+static const uint8_t FRAME_BITS = 34;
+
+bool (*host_bus_responder)(uint32_t request, uint32_t &delay_ms, uint32_t &response) = nullptr;
+
+bool host_bus_exchange(uint32_t time_ms, uint32_t request, uint32_t &delay_ms, uint32_t &response) {
+    if (host_bus_responder != nullptr) {
+        return host_bus_responder(request, delay_ms, response);
+    }
+    printf("REQ %u %08x\n", time_ms, request);
+    fflush(stdout);
+
+    char line[64];
+    if (fgets(line, sizeof(line), stdin) == nullptr) {
+        fprintf(stderr, "Simulated boiler closed the connection\n");
+        exit(1);
+    }
+    if (sscanf(line, "RSP %u %x", &delay_ms, &response) == 2) {
+        return true;
+    }
+    if (strncmp(line, "NONE", 4) == 0) {
+        return false;
+    }
+    fprintf(stderr, "Invalid line from simulated boiler: %s", line);
+    exit(1);
+}
+
+void host_bus_violation(const char *description) {
+    printf("BIT %u %s\n", esphome::millis(), description);
+    fflush(stdout);
+}
+
+// The master's output is idle high, the input is idle low, like with the usual
+// OpenTherm adapters
+static int master_level = HIGH;
+static int slave_level = LOW;
+static void (*slave_interrupt)(void) = nullptr;
+
+// The request that is being received from the master
+static bool receiving = false;
+static uint32_t frame_start = 0;
+static uint32_t last_mid_bit = 0;
+static uint8_t bits = 0;
+static uint64_t frame = 0;
+static bool frame_valid = false;
+
+uint32_t host_bus_interrupt_latency_us = 0;
+// Whether an interrupt was delayed and didn't run yet
+static bool interrupt_pending = false;
+// State of the generator for the latencies, fixed so runs can be compared
+static uint32_t latency_random = 1;
+
+static void run_interrupt(void *) {
+    interrupt_pending = false;
+    if (slave_interrupt != nullptr) {
+        slave_interrupt();
+    }
+}
+
+static void set_slave_level(void *level) {
+    int value = (int) (intptr_t) level;
+    if (value == slave_level) {
+        return;
+    }
+    slave_level = value;
+    if (slave_interrupt == nullptr || interrupt_pending) {
+        return;
+    }
+    if (host_bus_interrupt_latency_us == 0) {
+        slave_interrupt();
+        return;
+    }
+    latency_random = latency_random * 1103515245 + 12345;
+    uint32_t latency = (latency_random >> 16) % (host_bus_interrupt_latency_us + 1);
+    interrupt_pending = true;
+    host_schedule_us(esphome::micros() + latency, run_interrupt, nullptr);
+}
+
+static void send_response(uint32_t start, uint32_t response) {
+    // Start bit, the response most significant bit first and a stop bit, where a 1
+    // is active (high) in the first half of the bit and idle in the second half
+    uint64_t bits_to_send = (1ull << 33) | ((uint64_t) response << 1) | 1;
+    for (uint8_t half_bit = 0; half_bit < 2 * FRAME_BITS; half_bit++) {
+        bool value = (bits_to_send >> (FRAME_BITS - 1 - half_bit / 2)) & 1;
+        bool active = (half_bit % 2 == 0) == value;
+        host_schedule_us(start + half_bit * HALF_BIT_US, set_slave_level, (void *) (intptr_t) (active ? HIGH : LOW));
+    }
+    host_schedule_us(start + 2 * FRAME_BITS * HALF_BIT_US, set_slave_level, (void *) (intptr_t) LOW);
+}
+
+static void finish_request() {
+    receiving = false;
+    if (!frame_valid) {
+        return;
+    }
+    if (!((frame >> 33) & 1) || !(frame & 1)) {
+        host_bus_violation("missing start or stop bit");
+        return;
+    }
+
+    uint32_t request = (uint32_t) (frame >> 1);
+    uint32_t delay_ms, response;
+    if (host_bus_exchange(frame_start / 1000, request, delay_ms, response)) {
+        // The boiler waits after the end of the request, then sends its response
+        send_response(frame_start + 2 * FRAME_BITS * HALF_BIT_US + delay_ms * 1000, response);
+    }
+}
+
+void pinMode(uint8_t, uint8_t) {
+}
+
+void digitalWrite(uint8_t, uint8_t value) {
+    if (value == master_level) {
+        return;
+    }
+    master_level = value;
+    uint32_t now = esphome::micros();
+
+    if (receiving && now - frame_start > (FRAME_BITS + 1) * 2 * HALF_BIT_US) {
+        host_bus_violation("incomplete frame");
+        receiving = false;
+    }
+    if (!receiving) {
+        // A request starts with the first half of the start bit, which is active
+        if (value == LOW) {
+            receiving = true;
+            frame_start = now;
+            bits = 0;
+            frame = 0;
+            frame_valid = true;
+        }
+        return;
+    }
+
+    // Transitions half a bit after the start of a bit are in the middle of it,
+    // the others are between two bits with the same value
+    uint32_t offset = now - frame_start;
+    uint32_t bit = offset / (2 * HALF_BIT_US);
+    uint32_t in_bit = offset % (2 * HALF_BIT_US);
+    if (in_bit < HALF_BIT_US / 2 || in_bit >= 3 * HALF_BIT_US / 2) {
+        return;
+    }
+    if (bit != bits) {
+        host_bus_violation("missing transition in the middle of a bit");
+        frame_valid = false;
+    } else if (bits > 0 && (now - last_mid_bit < MID_BIT_INTERVAL_MIN_US || now - last_mid_bit > MID_BIT_INTERVAL_MAX_US)) {
+        host_bus_violation("time between bits out of range");
+        frame_valid = false;
+    }
+    last_mid_bit = now;
+    // Going idle in the middle of the bit means it was active in the first half, a 1
+    frame = (frame << 1) | (value == HIGH);
+    bits++;
+    if (bits == FRAME_BITS) {
+        finish_request();
+    }
+}
+
+int digitalRead(uint8_t) {
+    return slave_level;
+}
+
+void attachInterrupt(uint8_t, void (*callback)(void), int) {
+    slave_interrupt = callback;
+}
+
+void detachInterrupt(uint8_t) {
+    slave_interrupt = nullptr;
+}
@@ -0,0 +1,121 @@
+// Parses and writes the data of messages with the functions of hub.cpp, so
+// tests/test_message_data.py can check that message_data.py does the same. Every
+// line on stdin is one operation, answered with one line on stdout:
+//
+//   > parse <format> <data>            < <value>
+//   > write <format> <value> <data>    < <data>
+//
+// The data is the 16 data bits of the message as a decimal number, and the
+// format one of the message data formats of the schema, like f88 or u8_hb.
+// Values are printed as decimal numbers, flags as 0 or 1. An unknown format is
+// answered with "ERROR".
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+
+#include "hub.h"
+
+namespace esphome {
+namespace opentherm {
+namespace message_data {
+
+// The functions of hub.cpp, which are not declared in a header
+#define HOST_DECLARE_FLAG8(byte, bit) \
+    bool parse_flag8_ ## byte ## _ ## bit(const unsigned long response); \
+    unsigned int write_flag8_ ## byte ## _ ## bit(const bool value, const unsigned int data);
+#define HOST_DECLARE_FLAG8_BYTE(byte) \
+    HOST_DECLARE_FLAG8(byte, 0) HOST_DECLARE_FLAG8(byte, 1) HOST_DECLARE_FLAG8(byte, 2) HOST_DECLARE_FLAG8(byte, 3) \
+    HOST_DECLARE_FLAG8(byte, 4) HOST_DECLARE_FLAG8(byte, 5) HOST_DECLARE_FLAG8(byte, 6) HOST_DECLARE_FLAG8(byte, 7)
+HOST_DECLARE_FLAG8_BYTE(lb)
+HOST_DECLARE_FLAG8_BYTE(hb)
+
+uint8_t parse_u8_lb(const unsigned long response);
+uint8_t parse_u8_hb(const unsigned long response);
+int8_t parse_s8_lb(const unsigned long response);
+int8_t parse_s8_hb(const unsigned long response);
+uint16_t parse_u8_lb_60(const unsigned long response);
+uint16_t parse_u8_hb_60(const unsigned long response);
+uint16_t parse_u16(const unsigned long response);
+int16_t parse_s16(const unsigned long response);
+float parse_f88(const unsigned long response);
+
+unsigned int write_u8_lb(const uint8_t value, const unsigned int data);
+unsigned int write_u8_hb(const uint8_t value, const unsigned int data);
+unsigned int write_s8_lb(const int8_t value, const unsigned int data);
+unsigned int write_s8_hb(const int8_t value, const unsigned int data);
+unsigned int write_u16(const uint16_t value, const unsigned int data);
+unsigned int write_s16(const int16_t value, const unsigned int data);
+unsigned int write_f88(const float value, const unsigned int data);
+
+} // namespace message_data
+} // namespace opentherm
+} // namespace esphome
+
+using namespace esphome::opentherm;
+
+// Parse the data with a format, returns false if the format is unknown
+static bool parse(const char *format, unsigned long data, double &value) {
+    #define HOST_PARSE(name) \
+        if (strcmp(format, #name) == 0) { \
+            value = message_data::parse_ ## name(data); \
+            return true; \
+        }
+    #define HOST_PARSE_FLAG8_BYTE(byte) \
+        HOST_PARSE(flag8_ ## byte ## _0) HOST_PARSE(flag8_ ## byte ## _1) HOST_PARSE(flag8_ ## byte ## _2) HOST_PARSE(flag8_ ## byte ## _3) \
+        HOST_PARSE(flag8_ ## byte ## _4) HOST_PARSE(flag8_ ## byte ## _5) HOST_PARSE(flag8_ ## byte ## _6) HOST_PARSE(flag8_ ## byte ## _7)
+    HOST_PARSE_FLAG8_BYTE(lb)
+    HOST_PARSE_FLAG8_BYTE(hb)
+    HOST_PARSE(u8_lb)
+    HOST_PARSE(u8_hb)
+    HOST_PARSE(s8_lb)
+    HOST_PARSE(s8_hb)
+    HOST_PARSE(u8_lb_60)
+    HOST_PARSE(u8_hb_60)
+    HOST_PARSE(u16)
+    HOST_PARSE(s16)
+    HOST_PARSE(f88)
+    return false;
+}
+
+// Write a value with a format, converted to the type of the format like the
+// hub does for the values of the entities, returns false if the format is unknown
+static bool write(const char *format, double value, unsigned int data, unsigned int &result) {
+    #define HOST_WRITE(name, type) \
+        if (strcmp(format, #name) == 0) { \
+            result = message_data::write_ ## name((type) value, data); \
+            return true; \
+        }
+    #define HOST_WRITE_FLAG8_BYTE(byte) \
+        HOST_WRITE(flag8_ ## byte ## _0, bool) HOST_WRITE(flag8_ ## byte ## _1, bool) HOST_WRITE(flag8_ ## byte ## _2, bool) \
+        HOST_WRITE(flag8_ ## byte ## _3, bool) HOST_WRITE(flag8_ ## byte ## _4, bool) HOST_WRITE(flag8_ ## byte ## _5, bool) \
+        HOST_WRITE(flag8_ ## byte ## _6, bool) HOST_WRITE(flag8_ ## byte ## _7, bool)
+    HOST_WRITE_FLAG8_BYTE(lb)
+    HOST_WRITE_FLAG8_BYTE(hb)
+    HOST_WRITE(u8_lb, uint8_t)
+    HOST_WRITE(u8_hb, uint8_t)
+    HOST_WRITE(s8_lb, int8_t)
+    HOST_WRITE(s8_hb, int8_t)
+    HOST_WRITE(u16, uint16_t)
+    HOST_WRITE(s16, int16_t)
+    HOST_WRITE(f88, float)
+    return false;
+}
+
+int main() {
+    char line[128], format[32];
+    while (fgets(line, sizeof(line), stdin) != nullptr) {
+        double value;
+        unsigned long data;
+        unsigned int result;
+        if (sscanf(line, "parse %31s %lu", format, &data) == 2 && parse(format, data, value)) {
+            printf("%.17g\n", value);
+        } else if (sscanf(line, "write %31s %lf %lu", format, &value, &data) == 3 && write(format, value, data, result)) {
+            printf("%u\n", result);
+        } else {
+            printf("ERROR\n");
+        }
+        fflush(stdout);
+    }
+    return 0;
+}
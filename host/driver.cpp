@@ -0,0 +1,120 @@
+// Runs the OpenTherm hub on the host against the simulated boiler in
+// boiler_simulator.py, which talks to the OpenTherm stand-in over stdin and
+// stdout. The hub is configured by hub_config.h, which benchmark_bus.py
+// extracts from the code ESPHome generated for an example configuration.
+//
+// Usage: driver <duration_s> <setpoint_period_s> [log_level] [interrupt_latency_us] [preferences_file]
+//
+// Every setpoint period the boiler water setpoint alternates between two
+// values, which is reported as "SET <ms> <value>" so the simulator can measure
+// how long it takes to reach the boiler. "FAILED <invalid> <timeouts>" reports
+// the number of invalid and missing responses the hub counted, "PUBLISHED <count>"
+// the number of states published by the sensors and binary sensors,
+// "MEMORY <hub> <heap> <blocks>" the size of the hub and the heap it uses
+// after setup, and "END <ms>" marks the end of the run.
+
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "esphome/core/preferences.h"
+#include "host_bus.h"
+#include "host_heap.h"
+#include "host_hub.h"
+
+using namespace esphome;
+using namespace esphome::opentherm;
+
+// ESPHome's main loop runs at most once every 16 ms, unless a component requests
+// it to run continuously, which the driver approximates with every millisecond
+static const uint32_t LOOP_INTERVAL_MS = 16;
+static const uint32_t HIGH_FREQUENCY_LOOP_INTERVAL_MS = 1;
+
+static const float SETPOINTS[] = { 40.0f, 60.0f };
+
+int main(int argc, char **argv) {
+    if (argc < 3) {
+        fprintf(stderr, "Usage: %s <duration_s> <setpoint_period_s> [log_level] [interrupt_latency_us] [preferences_file]\n", argv[0]);
+        return 2;
+    }
+    uint32_t duration = atoi(argv[1]) * 1000;
+    uint32_t setpoint_period = atoi(argv[2]) * 1000;
+    if (argc > 3) {
+        host_log_level = atoi(argv[3]);
+    }
+    if (argc > 4) {
+        host_bus_interrupt_latency_us = atoi(argv[4]);
+    }
+    if (argc > 5) {
+        host_preferences_file = argv[5];
+    }
+
+    std::vector<Component*> components;
+    HOST_CREATE_HUB(components)
+
+    // The heap the hub uses once it is set up
+    host_count_allocations = true;
+    #include "hub_config.h"
+
+    // The hub has the highest setup priority, so it is set up first
+    hub->setup();
+    host_count_allocations = false;
+    printf("MEMORY %zu %ld %ld\n", sizeof(OpenthermHub), host_heap_bytes, host_heap_blocks);
+    for (auto *component : components) {
+        component->setup();
+    }
+    hub->dump_config();
+
+    OPENTHERM_INPUT_SENSOR_LIST(HOST_PUBLISH_INPUT_SENSOR, )
+
+    uint32_t next_setpoint = setpoint_period;
+    unsigned setpoint_index = 0;
+    while (millis() < duration) {
+        uint32_t start = millis();
+
+        if (setpoint_period > 0 && start >= next_setpoint) {
+            float value = SETPOINTS[setpoint_index++ % 2];
+            float state = value;
+            #if defined(OPENTHERM_HAS_OUTPUT_t_set)
+                t_set_output->set_level((value - t_set_output->get_min_value()) / (t_set_output->get_max_value() - t_set_output->get_min_value()));
+                state = t_set_output->state;
+            #elif defined(OPENTHERM_HAS_NUMBER_t_set)
+                t_set_number->make_call().set_value(value).perform();
+                state = t_set_number->state;
+            #elif defined(OPENTHERM_HAS_INPUT_SENSOR_t_set)
+                t_set_input_sensor->publish_state(value);
+                state = t_set_input_sensor->state;
+            #else
+                setpoint_period = 0;
+            #endif
+            if (setpoint_period > 0) {
+                printf("SET %u %.3f\n", start, state);
+                fflush(stdout);
+            }
+            next_setpoint += setpoint_period;
+        }
+
+        hub->loop();
+        for (auto *component : components) {
+            component->loop();
+        }
+
+        uint32_t elapsed = millis() - start;
+        uint32_t interval = HighFrequencyLoopRequester::is_high_frequency() ? HIGH_FREQUENCY_LOOP_INTERVAL_MS : LOOP_INTERVAL_MS;
+        if (elapsed < interval) {
+            delay(interval - elapsed);
+        }
+    }
+
+    hub->on_shutdown();
+    printf("FAILED %u %u\n", hub->get_invalid_responses(), hub->get_timeouts());
+
+    uint32_t published = 0;
+    #define HOST_COUNT_PUBLISHED(entity) published += entity->publish_count;
+    OPENTHERM_SENSOR_LIST(HOST_COUNT_PUBLISHED, )
+    OPENTHERM_BINARY_SENSOR_LIST(HOST_COUNT_PUBLISHED, )
+    printf("PUBLISHED %u\n", published);
+    printf("END %u\n", millis());
+    fflush(stdout);
+    return 0;
+}
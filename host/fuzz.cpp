@@ -0,0 +1,246 @@
+// Feeds arbitrary responses to the hub, to find inputs that make it crash, log
+// without bound or end up in a broken state. The hub is configured by
+// hub_config.h like for the driver, and fuzz_hub.py builds it with the address
+// and undefined behaviour sanitizers for a configuration with all entities.
+//
+// An input is a sequence of 6 byte records, each one response:
+//   - bytes 0-3: the response frame, little endian
+//   - byte 4: the response status, modulo 4 (none, success, invalid, timeout)
+//   - byte 5: the low 6 bits select the requested message, 0 is the message of
+//     the response and n the nth of the initial and repeating messages, the high
+//     2 bits how much time passed since the previous response: none, 100 ms, 1 s
+//     or 1 min
+// Every input starts with a new hub, and at its end every message must still
+// build a request with its id, a request type and a correct parity.
+//
+// Built with -DHOST_LIBFUZZER, this is a libFuzzer target. Otherwise:
+//
+// Usage: fuzz [-t seconds] [files or directories...]
+//
+// Without -t every file is run once, which reproduces a crash or runs the inputs
+// of another fuzzer like AFL. With -t, random inputs and mutations of the files
+// are run for that long, and the results are reported as
+// "EXECS <inputs> <inputs per second> <responses per second>". Failed checks are
+// reported on stderr and abort, after the input was saved to crash-<hash>.
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <iterator>
+#include <random>
+#include <vector>
+
+#include "esphome/core/preferences.h"
+#include "host_hub.h"
+
+#if defined(__SANITIZE_ADDRESS__)
+#include <sanitizer/common_interface_defs.h>
+#endif
+
+using namespace esphome;
+using namespace esphome::opentherm;
+
+static const size_t RECORD_SIZE = 6;
+static const uint32_t TIME_STEPS_US[] = { 0, 100000, 1000000, 60000000 };
+
+// A response is logged at most a few times, more means a loop of log calls
+static const unsigned long MAX_LOG_CALLS_PER_RESPONSE = 8;
+
+static const uint8_t *current_data = nullptr;
+static size_t current_size = 0;
+
+// Save the input being run, so it can be reproduced
+static void save_current_input() {
+    if (current_data == nullptr) {
+        return;
+    }
+    uint32_t hash = 2166136261u;
+    for (size_t i = 0; i < current_size; i++) {
+        hash = (hash ^ current_data[i]) * 16777619u;
+    }
+    char name[32];
+    snprintf(name, sizeof(name), "crash-%08x", hash);
+    FILE *file = fopen(name, "wb");
+    if (file != nullptr) {
+        fwrite(current_data, 1, current_size, file);
+        fclose(file);
+        fprintf(stderr, "Input saved to %s\n", name);
+    }
+    current_data = nullptr;
+}
+
+static void fail(const char *message, unsigned long value) {
+    fprintf(stderr, "%s: %08lx\n", message, value);
+    save_current_input();
+    abort();
+}
+
+static void run_input(const uint8_t *data, size_t size) {
+    host_reset_time();
+    host_reset_preferences();
+
+    std::vector<Component*> components;
+    HOST_CREATE_HUB(components)
+    #include "hub_config.h"
+
+    hub->setup();
+    for (auto *component : components) {
+        component->setup();
+    }
+    OPENTHERM_INPUT_SENSOR_LIST(HOST_PUBLISH_INPUT_SENSOR, )
+
+    std::vector<OpenThermMessageID> messages = hub->get_messages();
+    for (size_t offset = 0; offset + RECORD_SIZE <= size; offset += RECORD_SIZE) {
+        const uint8_t *record = data + offset;
+        unsigned long response = record[0] | (record[1] << 8) | (record[2] << 16) | ((unsigned long) record[3] << 24);
+        OpenThermResponseStatus status = (OpenThermResponseStatus) (record[4] % 4);
+        host_advance_time_us(TIME_STEPS_US[record[5] >> 6]);
+        unsigned request = record[5] & 0x3F;
+        if (request == 0 || messages.empty()) {
+            hub->set_current_request(OpenTherm::getDataID(response));
+        } else {
+            hub->set_current_request(messages[(request - 1) % messages.size()]);
+        }
+
+        unsigned long log_calls = host_log_calls;
+        hub->process_response(response, status);
+        if (host_log_calls - log_calls > MAX_LOG_CALLS_PER_RESPONSE) {
+            fail("Too many log calls for response", response);
+        }
+    }
+
+    // The responses may change which messages are requested and how, but not the messages themselves
+    if (hub->get_messages() != messages) {
+        fail("Messages changed, count", hub->get_messages().size());
+    }
+    for (auto message_id : messages) {
+        unsigned long request = hub->build_request(message_id);
+        OpenThermMessageType type = OpenTherm::getMessageType(request);
+        if (OpenTherm::getDataID(request) != message_id || OpenTherm::parity(request)
+            || (type != OpenThermMessageType::READ_DATA && type != OpenThermMessageType::WRITE_DATA)) {
+            fail("Invalid request", request);
+        }
+    }
+
+    HOST_DELETE_HUB()
+    host_reset_time();
+}
+
+#ifdef HOST_LIBFUZZER
+
+extern "C" int LLVMFuzzerInitialize(int *argc, char ***argv) {
+    host_log_level = ESPHOME_LOG_LEVEL_NONE;
+    return 0;
+}
+
+extern "C" int LLVMFuzzerTestOneInput(const uint8_t *data, size_t size) {
+    run_input(data, size);
+    return 0;
+}
+
+#else
+
+static void run_current_input(const std::vector<uint8_t> &input) {
+    current_data = input.data();
+    current_size = input.size();
+    run_input(input.data(), input.size());
+    current_data = nullptr;
+}
+
+static void read_inputs(const std::filesystem::path &path, std::vector<std::vector<uint8_t>> &inputs) {
+    if (std::filesystem::is_directory(path)) {
+        for (auto &entry : std::filesystem::directory_iterator(path)) {
+            read_inputs(entry.path(), inputs);
+        }
+        return;
+    }
+    std::ifstream file(path, std::ios::binary);
+    inputs.emplace_back(std::istreambuf_iterator<char>(file), std::istreambuf_iterator<char>());
+}
+
+// Change a seed at random: flip bits, overwrite bytes, repeat or drop records
+static std::vector<uint8_t> mutate(const std::vector<uint8_t> &seed, std::mt19937 &random) {
+    std::vector<uint8_t> input = seed;
+    unsigned mutations = 1 + random() % 4;
+    for (unsigned i = 0; i < mutations; i++) {
+        size_t records = input.size() / RECORD_SIZE;
+        switch (random() % 4) {
+            case 0:
+                if (!input.empty()) {
+                    input[random() % input.size()] ^= 1 << (random() % 8);
+                }
+                break;
+            case 1:
+                if (!input.empty()) {
+                    input[random() % input.size()] = random();
+                }
+                break;
+            case 2:
+                if (records > 0) {
+                    size_t record = random() % records * RECORD_SIZE;
+                    std::vector<uint8_t> copy(input.begin() + record, input.begin() + record + RECORD_SIZE);
+                    input.insert(input.begin() + random() % (records + 1) * RECORD_SIZE, copy.begin(), copy.end());
+                }
+                break;
+            default:
+                if (records > 1) {
+                    size_t record = random() % records * RECORD_SIZE;
+                    input.erase(input.begin() + record, input.begin() + record + RECORD_SIZE);
+                }
+                break;
+        }
+    }
+    return input;
+}
+
+int main(int argc, char **argv) {
+    double duration = 0;
+    std::vector<std::vector<uint8_t>> seeds;
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "-t") == 0 && i + 1 < argc) {
+            duration = atof(argv[++i]);
+        } else {
+            read_inputs(argv[i], seeds);
+        }
+    }
+    host_log_level = ESPHOME_LOG_LEVEL_NONE;
+    #if defined(__SANITIZE_ADDRESS__)
+        __sanitizer_set_death_callback(save_current_input);
+    #endif
+
+    if (duration <= 0) {
+        for (auto &input : seeds) {
+            run_current_input(input);
+        }
+        printf("EXECS %zu\n", seeds.size());
+        return 0;
+    }
+
+    std::mt19937 random(1);
+    unsigned long execs = 0, responses = 0;
+    auto start = std::chrono::steady_clock::now();
+    std::chrono::duration<double> elapsed(0);
+    while (elapsed.count() < duration) {
+        // Half of the inputs are mutated seeds, the rest random responses
+        std::vector<uint8_t> input;
+        if (!seeds.empty() && random() % 2 == 0) {
+            input = mutate(seeds[random() % seeds.size()], random);
+        } else {
+            input.resize((1 + random() % 64) * RECORD_SIZE);
+            for (auto &byte : input) {
+                byte = random();
+            }
+        }
+        run_current_input(input);
+        execs++;
+        responses += input.size() / RECORD_SIZE;
+        elapsed = std::chrono::steady_clock::now() - start;
+    }
+    printf("EXECS %lu %.1f %.1f\n", execs, execs / elapsed.count(), responses / elapsed.count());
+    return 0;
+}
+
+#endif
@@ -0,0 +1,83 @@
+#include "esphome/core/hal.h"
+#include "esphome/core/log.h"
+
+#include <cstdio>
+#include <map>
+#include <utility>
+
+// Simulated clock, starting at zero when the driver starts
+static uint64_t host_time_us = 0;
+
+// Scheduled events by time, events at the same time run in the order they were scheduled
+static std::multimap<uint64_t, std::pair<void (*)(void *), void *>> host_events;
+
+// The timer interrupt, next_time is 0 when the timer is stopped
+static void (*host_timer_callback)(void) = nullptr;
+static uint32_t host_timer_period_us = 0;
+static uint64_t host_timer_next_us = 0;
+
+void host_advance_time_us(uint32_t us) {
+    uint64_t target = host_time_us + us;
+    while (true) {
+        bool has_event = !host_events.empty() && host_events.begin()->first <= target;
+        bool has_timer = host_timer_next_us != 0 && host_timer_next_us <= target;
+        if (has_timer && (!has_event || host_timer_next_us <= host_events.begin()->first)) {
+            host_time_us = host_timer_next_us;
+            host_timer_next_us += host_timer_period_us;
+            host_timer_callback();
+        } else if (has_event) {
+            auto event = host_events.begin()->second;
+            host_time_us = host_events.begin()->first;
+            host_events.erase(host_events.begin());
+            event.first(event.second);
+        } else {
+            break;
+        }
+    }
+    host_time_us = target;
+}
+
+void host_schedule_us(uint64_t time_us, void (*callback)(void *), void *arg) {
+    host_events.emplace(time_us, std::make_pair(callback, arg));
+}
+
+void host_timer_start(void (*callback)(void), uint32_t period_us) {
+    host_timer_callback = callback;
+    host_timer_period_us = period_us;
+    host_timer_next_us = host_time_us + period_us;
+}
+
+void host_timer_stop() {
+    host_timer_next_us = 0;
+}
+
+void host_reset_time() {
+    host_time_us = 0;
+    host_events.clear();
+    host_timer_stop();
+}
+
+namespace esphome {
+
+uint32_t millis() { return (uint32_t) (host_time_us / 1000); }
+uint32_t micros() { return (uint32_t) host_time_us; }
+void delay(uint32_t ms) { host_advance_time_us(ms * 1000); }
+
+int host_log_level = ESPHOME_LOG_LEVEL_WARN;
+unsigned long host_log_calls = 0;
+
+void esp_log_printf_(int level, const char *tag, int line, const char *format, ...) {
+    host_log_calls++;
+    if (level > host_log_level) {
+        return;
+    }
+    static const char *const LETTERS = "?EWICDVV";
+    fprintf(stderr, "[%10u][%c][%s:%03d]: ", millis(), LETTERS[level], tag, line);
+    va_list args;
+    va_start(args, format);
+    vfprintf(stderr, format, args);
+    va_end(args);
+    fputc('\n', stderr);
+}
+
+} // namespace esphome
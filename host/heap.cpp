@@ -0,0 +1,45 @@
+#include "host_heap.h"
+
+#include <cstddef>
+#include <cstdint>
+#include <cstdlib>
+#include <new>
+
+bool host_count_allocations = false;
+long host_heap_bytes = 0, host_heap_blocks = 0;
+long host_heap_allocations = 0, host_heap_allocated_bytes = 0;
+
+// Every block starts with its size, in which the highest bit marks blocks that
+// were counted
+static const size_t HEAP_HEADER_SIZE = alignof(std::max_align_t);
+static const size_t HEAP_COUNTED = ~(SIZE_MAX >> 1);
+
+void *operator new(size_t size) {
+    char *block = (char *) malloc(size + HEAP_HEADER_SIZE);
+    if (block == nullptr) {
+        throw std::bad_alloc();
+    }
+    *(size_t *) block = size | (host_count_allocations ? HEAP_COUNTED : 0);
+    if (host_count_allocations) {
+        host_heap_bytes += size;
+        host_heap_blocks++;
+        host_heap_allocations++;
+        host_heap_allocated_bytes += size;
+    }
+    return block + HEAP_HEADER_SIZE;
+}
+
+void operator delete(void *ptr) noexcept {
+    if (ptr == nullptr) {
+        return;
+    }
+    char *block = (char *) ptr - HEAP_HEADER_SIZE;
+    size_t header = *(size_t *) block;
+    if (header & HEAP_COUNTED) {
+        host_heap_bytes -= header & ~HEAP_COUNTED;
+        host_heap_blocks--;
+    }
+    free(block);
+}
+
+void operator delete(void *ptr, size_t) noexcept { operator delete(ptr); }
@@ -0,0 +1,27 @@
+#pragma once
+
+#include <cstdint>
+
+// The bits of the Arduino API used by the OpenTherm component and library.
+// String is left out on purpose, the component should not allocate per frame.
+
+#define HEX 16
+#define DEC 10
+
+typedef uint8_t byte;
+
+// Pins, implemented by the simulated bus in bus.cpp. The component writes the
+// master's side of the bus and reads the boiler's side, whichever pins are used.
+#define LOW 0
+#define HIGH 1
+#define INPUT 0
+#define OUTPUT 1
+#define CHANGE 3
+
+#define digitalPinToInterrupt(pin) (pin)
+
+void pinMode(uint8_t pin, uint8_t mode);
+void digitalWrite(uint8_t pin, uint8_t value);
+int digitalRead(uint8_t pin);
+void attachInterrupt(uint8_t interrupt, void (*callback)(void), int mode);
+void detachInterrupt(uint8_t interrupt);
@@ -0,0 +1,152 @@
+#pragma once
+
+// Host stand-in for the master side of @freebear-nc's OpenTherm Library. It
+// has the same interface and timing as the library, but instead of driving
+// pins it exchanges whole frames with the simulated boiler, see host_bus.h.
+
+#include <cstdint>
+
+#include "Arduino.h"
+
+enum OpenThermResponseStatus : uint8_t {
+    NONE,
+    SUCCESS,
+    INVALID,
+    TIMEOUT
+};
+
+enum OpenThermMessageType : uint8_t {
+    /*  Master to Slave */
+    READ_DATA = 0,
+    READ = READ_DATA, // for backward compatibility
+    WRITE_DATA = 1,
+    WRITE = WRITE_DATA, // for backward compatibility
+    INVALID_DATA = 2,
+    RESERVED = 3,
+    /* Slave to Master */
+    READ_ACK = 4,
+    WRITE_ACK = 5,
+    DATA_INVALID = 6,
+    UNKNOWN_DATA_ID = 7
+};
+
+enum OpenThermMessageID : uint8_t {
+    Status = 0,
+    TSet = 1,
+    MConfigMMemberIDcode = 2,
+    SConfigSMemberIDcode = 3,
+    RemoteRequest = 4,
+    ASFflags = 5,
+    RBPflags = 6,
+    CoolingControl = 7,
+    TsetCH2 = 8,
+    TrOverride = 9,
+    TSP = 10,
+    TSPindexTSPvalue = 11,
+    FHBsize = 12,
+    FHBindexFHBvalue = 13,
+    MaxRelModLevelSetting = 14,
+    MaxCapacityMinModLevel = 15,
+    TrSet = 16,
+    RelModLevel = 17,
+    CHPressure = 18,
+    DHWFlowRate = 19,
+    DayTime = 20,
+    Date = 21,
+    Year = 22,
+    TrSetCH2 = 23,
+    Tr = 24,
+    Tboiler = 25,
+    Tdhw = 26,
+    Toutside = 27,
+    Tret = 28,
+    Tstorage = 29,
+    Tcollector = 30,
+    TflowCH2 = 31,
+    Tdhw2 = 32,
+    Texhaust = 33,
+    TboilerHeatExchanger = 34,
+    BoilerFanSpeedSetpointAndActual = 35,
+    FlameCurrent = 36,
+    TdhwSetUBTdhwSetLB = 48,
+    MaxTSetUBMaxTSetLB = 49,
+    OTCratio = 50,
+    TdhwSet = 56,
+    MaxTSet = 57,
+    Hcratio = 58,
+    RemoteOverrideFunction = 100,
+    OEMDiagnosticCode = 115,
+    SuccessfulBurnerStarts = 116,
+    CHPumpStarts = 117,
+    DHWPumpValveStarts = 118,
+    DHWBurnerStarts = 119,
+    BurnerOperationHours = 120,
+    CHPumpOperationHours = 121,
+    DHWPumpValveOperationHours = 122,
+    DHWBurnerOperationHours = 123,
+    OpenThermVersionMaster = 124,
+    OpenThermVersionSlave = 125,
+    MasterVersion = 126,
+    SlaveVersion = 127,
+};
+
+enum OpenThermStatus : uint8_t {
+    NOT_INITIALIZED,
+    READY,
+    DELAY,
+    REQUEST_SENDING,
+    RESPONSE_WAITING,
+    RESPONSE_START_BIT,
+    RESPONSE_RECEIVING,
+    RESPONSE_READY,
+    RESPONSE_INVALID
+};
+
+class OpenTherm {
+public:
+    OpenTherm(int inPin = 4, int outPin = 5, bool isSlave = false);
+    volatile OpenThermStatus status;
+    void begin(void (*handleInterruptCallback)(void));
+    void begin(void (*handleInterruptCallback)(void), void (*processResponseCallback)(unsigned long, OpenThermResponseStatus));
+    bool isReady();
+    unsigned long sendRequest(unsigned long request);
+    bool sendResponse(unsigned long request);
+    bool sendRequestAsync(unsigned long request);
+    static unsigned long buildRequest(OpenThermMessageType type, OpenThermMessageID id, unsigned int data);
+    static unsigned long buildResponse(OpenThermMessageType type, OpenThermMessageID id, unsigned int data);
+    unsigned long getLastResponse();
+    OpenThermResponseStatus getLastResponseStatus();
+    static const char *statusToString(OpenThermResponseStatus status);
+    void handleInterrupt();
+    void process();
+    void end();
+
+    static bool parity(unsigned long frame);
+    static OpenThermMessageType getMessageType(unsigned long message);
+    static OpenThermMessageID getDataID(unsigned long frame);
+    static const char *messageTypeToString(OpenThermMessageType message_type);
+    static bool isValidRequest(unsigned long request);
+    static bool isValidResponse(unsigned long response);
+
+    // requests
+    static unsigned long buildSetBoilerStatusRequest(
+        bool enableCentralHeating, bool enableHotWater = false, bool enableCooling = false,
+        bool enableOutsideTemperatureCompensation = false, bool enableCentralHeating2 = false,
+        bool summerMode = false, bool dhwBlock = false
+    );
+
+private:
+    const int inPin;
+    const int outPin;
+    const bool isSlave;
+
+    unsigned long response;
+    OpenThermResponseStatus responseStatus;
+    // Simulated time of the last bus event, or when the pending response
+    // arrives, in microseconds
+    uint32_t responseTimestamp;
+    bool responsePending;
+
+    void (*handleInterruptCallback)();
+    void (*processResponseCallback)(unsigned long, OpenThermResponseStatus);
+};
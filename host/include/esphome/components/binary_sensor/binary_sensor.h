@@ -0,0 +1,36 @@
+#pragma once
+
+#include <cstdint>
+
+#include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+namespace binary_sensor {
+
+class BinarySensor {
+public:
+    bool state{false};
+    // Number of calls to publish_state, for the host benchmarks
+    uint32_t publish_count{0};
+
+    void publish_state(bool state) {
+        // Like ESPHome, binary sensors only send changes
+        if (this->has_state_ && state == this->state) {
+            return;
+        }
+        this->state = state;
+        this->has_state_ = true;
+        this->publish_count++;
+        this->callback_.call(state);
+    }
+    bool has_state() const { return this->has_state_; }
+    void add_on_state_callback(std::function<void(bool)> &&callback) { this->callback_.add(std::move(callback)); }
+
+protected:
+    bool has_state_{false};
+    CallbackManager<void(bool)> callback_;
+};
+
+} // namespace binary_sensor
+} // namespace esphome
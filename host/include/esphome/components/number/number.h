@@ -0,0 +1,71 @@
+#pragma once
+
+#include <cmath>
+
+#include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+namespace number {
+
+class Number;
+
+class NumberTraits {
+public:
+    void set_min_value(float min_value) { this->min_value_ = min_value; }
+    float get_min_value() const { return this->min_value_; }
+    void set_max_value(float max_value) { this->max_value_ = max_value; }
+    float get_max_value() const { return this->max_value_; }
+    void set_step(float step) { this->step_ = step; }
+    float get_step() const { return this->step_; }
+
+protected:
+    float min_value_{NAN};
+    float max_value_{NAN};
+    float step_{NAN};
+};
+
+class NumberCall {
+public:
+    explicit NumberCall(Number *parent) : parent_(parent) {}
+    NumberCall &set_value(float value) {
+        this->value_ = value;
+        return *this;
+    }
+    void perform();
+
+protected:
+    Number *parent_;
+    float value_{NAN};
+};
+
+class Number {
+public:
+    float state{NAN};
+    NumberTraits traits;
+
+    void publish_state(float state) {
+        this->state = state;
+        this->has_state_ = true;
+        this->callback_.call(state);
+    }
+    NumberCall make_call() { return NumberCall(this); }
+    bool has_state() const { return this->has_state_; }
+    void add_on_state_callback(std::function<void(float)> &&callback) { this->callback_.add(std::move(callback)); }
+
+protected:
+    friend class NumberCall;
+
+    virtual void control(float value) = 0;
+
+    bool has_state_{false};
+    CallbackManager<void(float)> callback_;
+};
+
+inline void NumberCall::perform() {
+    float value = clamp(this->value_, this->parent_->traits.get_min_value(), this->parent_->traits.get_max_value());
+    this->parent_->control(value);
+}
+
+} // namespace number
+} // namespace esphome
@@ -0,0 +1,21 @@
+#pragma once
+
+#include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+namespace output {
+
+class FloatOutput {
+public:
+    void set_zero_means_zero(bool zero_means_zero) { this->zero_means_zero_ = zero_means_zero; }
+    void set_level(float state) { this->write_state(clamp(state, 0.0f, 1.0f)); }
+
+protected:
+    virtual void write_state(float state) = 0;
+
+    bool zero_means_zero_{false};
+};
+
+} // namespace output
+} // namespace esphome
@@ -0,0 +1,36 @@
+#pragma once
+
+#include <cmath>
+#include <cstdint>
+
+#include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+namespace sensor {
+
+class Sensor {
+public:
+    float state{NAN};
+    float raw_state{NAN};
+    // Number of calls to publish_state, for the host benchmarks
+    uint32_t publish_count{0};
+
+    void publish_state(float state) {
+        this->raw_state = state;
+        this->state = state;
+        this->has_state_ = true;
+        this->publish_count++;
+        this->callback_.call(state);
+    }
+    bool has_state() const { return this->has_state_; }
+    float get_raw_state() const { return this->raw_state; }
+    void add_on_state_callback(std::function<void(float)> &&callback) { this->callback_.add(std::move(callback)); }
+
+protected:
+    bool has_state_{false};
+    CallbackManager<void(float)> callback_;
+};
+
+} // namespace sensor
+} // namespace esphome
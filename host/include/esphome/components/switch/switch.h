@@ -0,0 +1,35 @@
+#pragma once
+
+#include "esphome/core/component.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+namespace switch_ {
+
+class Switch {
+public:
+    bool state{false};
+
+    // Like the real switch, only changed states are published
+    void publish_state(bool state) {
+        if (this->has_state_ && state == this->state)
+            return;
+        this->state = state;
+        this->has_state_ = true;
+        this->callback_.call(state);
+    }
+    void turn_on() { this->write_state(true); }
+    void turn_off() { this->write_state(false); }
+    // There is no flash on the host, so nothing is ever restored
+    optional<bool> get_initial_state() { return {}; }
+    void add_on_state_callback(std::function<void(bool)> &&callback) { this->callback_.add(std::move(callback)); }
+
+protected:
+    virtual void write_state(bool state) = 0;
+
+    bool has_state_{false};
+    CallbackManager<void(bool)> callback_;
+};
+
+} // namespace switch_
+} // namespace esphome
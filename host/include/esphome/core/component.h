@@ -0,0 +1,37 @@
+#pragma once
+
+#include <cstdint>
+#include <string>
+
+#include "esphome/core/defines.h"
+#include "esphome/core/hal.h"
+#include "esphome/core/helpers.h"
+
+namespace esphome {
+
+namespace setup_priority {
+const float BUS = 1000.0f;
+const float IO = 900.0f;
+const float HARDWARE = 800.0f;
+const float DATA = 600.0f;
+const float PROCESSOR = 400.0f;
+const float LATE = -100.0f;
+} // namespace setup_priority
+
+class Component {
+public:
+    virtual ~Component() = default;
+
+    virtual void setup() {}
+    virtual void loop() {}
+    virtual void dump_config() {}
+    virtual void on_shutdown() {}
+    virtual float get_setup_priority() const { return setup_priority::DATA; }
+
+    void set_component_source(const char *source) { this->component_source_ = source; }
+
+protected:
+    const char *component_source_{nullptr};
+};
+
+} // namespace esphome
@@ -0,0 +1,32 @@
+#pragma once
+
+#include <cstdint>
+
+// Host stand-in for the ESPHome hardware abstraction layer. Time is simulated
+// and only moves forward when the host driver advances it.
+
+#define IRAM_ATTR
+
+namespace esphome {
+
+uint32_t millis();
+uint32_t micros();
+void delay(uint32_t ms);
+
+} // namespace esphome
+
+// Advance the simulated clock, used by the driver and the OpenTherm stand-in.
+// Scheduled events and timer interrupts that fall within the time are run at
+// their exact time.
+void host_advance_time_us(uint32_t us);
+
+// Run a callback at a simulated time in microseconds, like an interrupt
+void host_schedule_us(uint64_t time_us, void (*callback)(void *), void *arg);
+
+// The hardware timer used in sync mode, calling the callback every period
+void host_timer_start(void (*callback)(void), uint32_t period_us);
+void host_timer_stop();
+
+// Reset the simulated clock to zero, dropping scheduled events and stopping the
+// timer, so every input of the fuzzer starts at the same time
+void host_reset_time();
@@ -0,0 +1,67 @@
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <functional>
+#include <optional>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace esphome {
+
+template<typename T> using optional = std::optional<T>;
+
+template<typename T> const T &clamp(const T &v, const T &lo, const T &hi) { return std::clamp(v, lo, hi); }
+
+inline uint32_t fnv1_hash(const std::string &str) {
+    uint32_t hash = 2166136261UL;
+    for (char c : str) {
+        hash *= 16777619UL;
+        hash ^= c;
+    }
+    return hash;
+}
+
+inline float lerp(float completion, float start, float end) { return start + (end - start) * completion; }
+
+template<typename... X> class CallbackManager;
+
+template<typename... Ts> class CallbackManager<void(Ts...)> {
+public:
+    void add(std::function<void(Ts...)> &&callback) { this->callbacks_.push_back(std::move(callback)); }
+    void call(Ts... args) {
+        for (auto &cb : this->callbacks_)
+            cb(args...);
+    }
+    size_t size() const { return this->callbacks_.size(); }
+    void operator()(Ts... args) { call(args...); }
+
+protected:
+    std::vector<std::function<void(Ts...)>> callbacks_;
+};
+
+// Makes the driver run the loop every millisecond instead of every 16 ms
+class HighFrequencyLoopRequester {
+public:
+    void start() {
+        if (!this->started_) {
+            this->started_ = true;
+            num_requests++;
+        }
+    }
+    void stop() {
+        if (this->started_) {
+            this->started_ = false;
+            num_requests--;
+        }
+    }
+    static bool is_high_frequency() { return num_requests > 0; }
+
+protected:
+    bool started_{false};
+    static inline uint8_t num_requests = 0;
+};
+
+} // namespace esphome
@@ -0,0 +1,34 @@
+#pragma once
+
+#include <cinttypes>
+#include <cstdarg>
+
+// Host stand-in for the ESPHome logger, which prints to stderr when the
+// message is within the level set by host_log_level.
+
+#define ESPHOME_LOG_LEVEL_NONE 0
+#define ESPHOME_LOG_LEVEL_ERROR 1
+#define ESPHOME_LOG_LEVEL_WARN 2
+#define ESPHOME_LOG_LEVEL_INFO 3
+#define ESPHOME_LOG_LEVEL_CONFIG 4
+#define ESPHOME_LOG_LEVEL_DEBUG 5
+#define ESPHOME_LOG_LEVEL_VERBOSE 6
+#define ESPHOME_LOG_LEVEL_VERY_VERBOSE 7
+
+namespace esphome {
+
+extern int host_log_level;
+// Number of log calls, including those below the log level
+extern unsigned long host_log_calls;
+
+void esp_log_printf_(int level, const char *tag, int line, const char *format, ...)
+    __attribute__((format(printf, 4, 5)));
+
+} // namespace esphome
+
+#define ESP_LOGE(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_ERROR, tag, __LINE__, __VA_ARGS__)
+#define ESP_LOGW(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_WARN, tag, __LINE__, __VA_ARGS__)
+#define ESP_LOGI(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_INFO, tag, __LINE__, __VA_ARGS__)
+#define ESP_LOGCONFIG(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_CONFIG, tag, __LINE__, __VA_ARGS__)
+#define ESP_LOGD(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_DEBUG, tag, __LINE__, __VA_ARGS__)
+#define ESP_LOGV(tag, ...) esphome::esp_log_printf_(ESPHOME_LOG_LEVEL_VERBOSE, tag, __LINE__, __VA_ARGS__)
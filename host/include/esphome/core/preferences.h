@@ -0,0 +1,49 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <type_traits>
+
+// Host stand-in for the ESPHome preferences. They are kept in memory, and in the
+// file named by host_preferences_file if set, so a second run of the driver
+// starts with what the first one saved, like after a restart.
+
+extern const char *host_preferences_file;
+
+// Forget the preferences in memory, so every input of the fuzzer starts without them
+void host_reset_preferences();
+
+namespace esphome {
+
+class ESPPreferenceObject {
+public:
+    ESPPreferenceObject() = default;
+    ESPPreferenceObject(uint32_t type, size_t length) : type_(type), length_(length), valid_(true) {}
+
+    template<typename T> bool save(const T *src) {
+        return this->valid_ && sizeof(T) == this->length_ && this->save_(reinterpret_cast<const uint8_t *>(src));
+    }
+    template<typename T> bool load(T *dest) {
+        return this->valid_ && sizeof(T) == this->length_ && this->load_(reinterpret_cast<uint8_t *>(dest));
+    }
+
+protected:
+    bool save_(const uint8_t *data);
+    bool load_(uint8_t *data);
+
+    uint32_t type_{0};
+    size_t length_{0};
+    bool valid_{false};
+};
+
+class ESPPreferences {
+public:
+    template<typename T> ESPPreferenceObject make_preference(uint32_t type, bool in_flash = false) {
+        static_assert(std::is_trivially_copyable<T>::value, "Preferences must be trivially copyable");
+        return ESPPreferenceObject(type, sizeof(T));
+    }
+};
+
+extern ESPPreferences *global_preferences;
+
+} // namespace esphome
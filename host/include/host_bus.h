@@ -0,0 +1,26 @@
+#pragma once
+
+#include <cstdint>
+
+// Exchange a request with the simulated boiler in boiler_simulator.py, which
+// answers on stdin:
+//
+//   > REQ <time of the start of the request in ms> <request frame as 8 hex digits>
+//   < RSP <slave response delay in ms> <response frame as 8 hex digits>
+//   < NONE
+//
+// Returns false if the boiler does not answer the request at all.
+bool host_bus_exchange(uint32_t time_ms, uint32_t request, uint32_t &delay_ms, uint32_t &response);
+
+// Answers the requests instead of the simulated boiler when set, like
+// host_bus_exchange, for programs that simulate the boiler themselves
+extern bool (*host_bus_responder)(uint32_t request, uint32_t &delay_ms, uint32_t &response);
+
+// Maximum delay between an edge on the input pin and its interrupt, the actual
+// delay is random. Edges during a delay are merged into a single interrupt, like
+// a latched interrupt that can't run while another component disabled interrupts.
+extern uint32_t host_bus_interrupt_latency_us;
+
+// Report a violation of the bit timing of the OpenTherm specification, as
+// "BIT <time in ms> <description>"
+void host_bus_violation(const char *description);
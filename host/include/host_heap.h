@@ -0,0 +1,9 @@
+#pragma once
+
+// Counts the heap in use while host_count_allocations is set, as the global
+// allocation functions are replaced on the host. Blocks that were allocated while
+// counting and are freed again, even after counting stopped, are subtracted from
+// the bytes and blocks in use, but not from the totals of all allocations.
+extern bool host_count_allocations;
+extern long host_heap_bytes, host_heap_blocks;
+extern long host_heap_allocations, host_heap_allocated_bytes;
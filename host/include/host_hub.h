@@ -0,0 +1,91 @@
+#pragma once
+
+// The hub as used by the programs on the host, which need access to its
+// statistics and messages. HOST_CREATE_HUB creates the hub and every entity it has
+// a field for, using the field name as the variable name, so the configuration
+// lines in hub_config.h can refer to them. The components that need a setup and
+// loop are added to components.
+
+#include <vector>
+
+#include "hub.h"
+
+class HostHub : public esphome::opentherm::OpenthermHub {
+public:
+    using OpenthermHub::OpenthermHub;
+    using OpenthermHub::build_request;
+    using OpenthermHub::next_repeating_message;
+    using OpenthermHub::complete_cycle;
+    uint32_t get_invalid_responses() { return this->invalid_responses; }
+    uint32_t get_timeouts() { return this->timeouts; }
+    uint32_t get_unknown_ids() { return this->unknown_ids; }
+
+    // The initial and repeating messages, without duplicates
+    std::vector<OpenThermMessageID> get_messages() {
+        std::vector<OpenThermMessageID> messages(this->initial_messages.begin(), this->initial_messages.end());
+        for (auto &message : this->repeating_messages) {
+            if (!this->initial_messages.contains(message.id)) {
+                messages.push_back(message.id);
+            }
+        }
+        return messages;
+    }
+
+    // Whether the boiler seems not to support a repeating message
+    bool is_message_unsupported(OpenThermMessageID message_id) {
+        for (auto &message : this->repeating_messages) {
+            if (message.id == message_id) {
+                return this->is_unsupported(message);
+            }
+        }
+        return false;
+    }
+
+    bool is_initializing() { return this->initializing; }
+
+    // Record a request as sent, like the loop does before the response arrives
+    void set_current_request(OpenThermMessageID request_id) {
+        this->current_request_id = request_id;
+        this->request_timestamp = esphome::millis();
+    }
+};
+
+static HostHub *hub;
+
+static void IRAM_ATTR host_handle_interrupt() { hub->handle_interrupt(); }
+static void host_process_response(unsigned long response, OpenThermResponseStatus status) { hub->process_response(response, status); }
+static void IRAM_ATTR host_handle_timer() { hub->handle_timer(); }
+
+#define HOST_CREATE_SENSOR(entity) auto *entity = new OpenthermSensor();
+#define HOST_CREATE_BINARY_SENSOR(entity) auto *entity = new binary_sensor::BinarySensor();
+#define HOST_CREATE_SWITCH(entity) auto *entity = new OpenthermSwitch(); components.push_back(entity);
+#define HOST_CREATE_NUMBER(entity) auto *entity = new OpenthermNumber(); components.push_back(entity);
+#define HOST_CREATE_OUTPUT(entity) auto *entity = new OpenthermOutput(); components.push_back(entity);
+#define HOST_CREATE_INPUT_SENSOR(entity) auto *entity = new sensor::Sensor();
+#define HOST_CREATE_DIAGNOSTIC_SENSOR(entity) auto *entity = new sensor::Sensor();
+
+#define HOST_CREATE_HUB(components) \
+    hub = new HostHub(host_handle_interrupt, host_process_response, host_handle_timer); \
+    OPENTHERM_SENSOR_LIST(HOST_CREATE_SENSOR, ) \
+    OPENTHERM_BINARY_SENSOR_LIST(HOST_CREATE_BINARY_SENSOR, ) \
+    OPENTHERM_SWITCH_LIST(HOST_CREATE_SWITCH, ) \
+    OPENTHERM_NUMBER_LIST(HOST_CREATE_NUMBER, ) \
+    OPENTHERM_OUTPUT_LIST(HOST_CREATE_OUTPUT, ) \
+    OPENTHERM_INPUT_SENSOR_LIST(HOST_CREATE_INPUT_SENSOR, ) \
+    OPENTHERM_DIAGNOSTIC_SENSOR_LIST(HOST_CREATE_DIAGNOSTIC_SENSOR, )
+
+// Delete the hub and the entities created by HOST_CREATE_HUB
+#define HOST_DELETE_ENTITY(entity) delete entity;
+#define HOST_DELETE_HUB() \
+    OPENTHERM_SENSOR_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_BINARY_SENSOR_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_SWITCH_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_NUMBER_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_OUTPUT_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_INPUT_SENSOR_LIST(HOST_DELETE_ENTITY, ) \
+    OPENTHERM_DIAGNOSTIC_SENSOR_LIST(HOST_DELETE_ENTITY, ) \
+    delete hub; \
+    hub = nullptr;
+
+// Input sensors normally come from other components, give them a value
+#define HOST_PUBLISH_INPUT_SENSOR(entity) entity->publish_state(20.0f);
@@ -0,0 +1,86 @@
+// Measures how long the hub takes to build a request and process its response,
+// and how much it allocates on the heap for that, without the bus in between.
+// The hub is configured by hub_config.h like for the driver, and every initial
+// and repeating message of the configuration is exchanged in turn, with the data
+// of read responses alternating between two values, so every response is
+// decoded and published.
+//
+// Usage: microbench [iterations] [log_level]
+//
+// Every request is checked to have the requested id, a request type and a
+// correct parity, and no response may be counted as invalid or unknown. Errors
+// are reported on stderr and make the program exit with 1. The results are
+// reported as "FRAMES <frames> <ns per frame> <allocations per frame> <bytes per frame>".
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "host_heap.h"
+#include "host_hub.h"
+
+using namespace esphome;
+using namespace esphome::opentherm;
+
+static const uint16_t RESPONSE_DATA[] = { 0x1A40, 0x2B80 };
+
+// Exchange every message once, returns the number of errors
+static int exchange_messages(const std::vector<OpenThermMessageID> &messages, unsigned iteration) {
+    int errors = 0;
+    for (auto message_id : messages) {
+        unsigned long request = hub->build_request(message_id);
+        OpenThermMessageType type = OpenTherm::getMessageType(request);
+        if (OpenTherm::getDataID(request) != message_id || OpenTherm::parity(request)
+            || (type != OpenThermMessageType::READ_DATA && type != OpenThermMessageType::WRITE_DATA)) {
+            fprintf(stderr, "Invalid request for message %d: %08lx\n", message_id, request);
+            errors++;
+        }
+        hub->set_current_request(message_id);
+        unsigned long response = type == OpenThermMessageType::WRITE_DATA
+            ? OpenTherm::buildResponse(OpenThermMessageType::WRITE_ACK, message_id, request & 0xFFFF)
+            : OpenTherm::buildResponse(OpenThermMessageType::READ_ACK, message_id, RESPONSE_DATA[iteration % 2]);
+        hub->process_response(response, OpenThermResponseStatus::SUCCESS);
+    }
+    return errors;
+}
+
+int main(int argc, char **argv) {
+    unsigned iterations = argc > 1 ? atoi(argv[1]) : 10000;
+    host_log_level = argc > 2 ? atoi(argv[2]) : 1;
+
+    std::vector<Component*> components;
+    HOST_CREATE_HUB(components)
+    #include "hub_config.h"
+
+    hub->setup();
+    for (auto *component : components) {
+        component->setup();
+    }
+    OPENTHERM_INPUT_SENSOR_LIST(HOST_PUBLISH_INPUT_SENSOR, )
+
+    std::vector<OpenThermMessageID> messages = hub->get_messages();
+    // Warm up, so every response was decoded once and the sensors have a state
+    int errors = exchange_messages(messages, 0) + exchange_messages(messages, 1);
+
+    host_count_allocations = true;
+    auto start = std::chrono::steady_clock::now();
+    for (unsigned iteration = 0; iteration < iterations; iteration++) {
+        errors += exchange_messages(messages, iteration);
+    }
+    auto elapsed = std::chrono::steady_clock::now() - start;
+    host_count_allocations = false;
+
+    if (hub->get_invalid_responses() > 0 || hub->get_unknown_ids() > 0) {
+        fprintf(stderr, "Valid responses counted as invalid or unknown: %u, %u\n", hub->get_invalid_responses(), hub->get_unknown_ids());
+        errors++;
+    }
+
+    double frames = (double) iterations * messages.size();
+    printf(
+        "FRAMES %.0f %.1f %.3f %.1f\n", frames,
+        std::chrono::duration<double, std::nano>(elapsed).count() / frames,
+        host_heap_allocations / frames, host_heap_allocated_bytes / frames
+    );
+    return errors > 0 ? 1 : 0;
+}
@@ -0,0 +1,77 @@
+#include "esphome/core/preferences.h"
+
+#include <algorithm>
+#include <cstdio>
+#include <map>
+#include <vector>
+
+const char *host_preferences_file = nullptr;
+
+namespace esphome {
+
+static ESPPreferences host_preferences;
+ESPPreferences *global_preferences = &host_preferences;
+
+// Preferences by type, read from the file on first use
+static std::map<uint32_t, std::vector<uint8_t>> host_values;
+static bool host_values_read = false;
+
+static void read_values() {
+    if (host_values_read) {
+        return;
+    }
+    host_values_read = true;
+    FILE *file = host_preferences_file != nullptr ? fopen(host_preferences_file, "rb") : nullptr;
+    if (file == nullptr) {
+        return;
+    }
+    uint32_t type, length;
+    while (fread(&type, sizeof(type), 1, file) == 1 && fread(&length, sizeof(length), 1, file) == 1) {
+        std::vector<uint8_t> value(length);
+        if (fread(value.data(), 1, length, file) != length) {
+            break;
+        }
+        host_values[type] = value;
+    }
+    fclose(file);
+}
+
+static bool write_values() {
+    if (host_preferences_file == nullptr) {
+        return true;
+    }
+    FILE *file = fopen(host_preferences_file, "wb");
+    if (file == nullptr) {
+        return false;
+    }
+    for (auto &entry : host_values) {
+        uint32_t length = entry.second.size();
+        fwrite(&entry.first, sizeof(entry.first), 1, file);
+        fwrite(&length, sizeof(length), 1, file);
+        fwrite(entry.second.data(), 1, length, file);
+    }
+    return fclose(file) == 0;
+}
+
+bool ESPPreferenceObject::save_(const uint8_t *data) {
+    read_values();
+    host_values[this->type_].assign(data, data + this->length_);
+    return write_values();
+}
+
+bool ESPPreferenceObject::load_(uint8_t *data) {
+    read_values();
+    auto value = host_values.find(this->type_);
+    if (value == host_values.end() || value->second.size() != this->length_) {
+        return false;
+    }
+    std::copy(value->second.begin(), value->second.end(), data);
+    return true;
+}
+
+} // namespace esphome
+
+void host_reset_preferences() {
+    esphome::host_values.clear();
+    esphome::host_values_read = false;
+}
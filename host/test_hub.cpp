@@ -0,0 +1,457 @@
+// Unit tests of the hub on the host: the schedule of the repeating messages,
+// demoting messages the boiler doesn't support and giving them a new chance,
+// writing changed inputs through, applying the bounds of the boiler and
+// publishing the values of a cycle together, restoring the stored capabilities
+// of the boiler, and decoding responses in the transceiver. The hub is configured
+// by hub_config.h, which tests/conftest.py generates from its test configuration
+// with persist_capabilities, the t_set number, and the t_boiler and t_outside
+// sensors. The tests that run the loop answer the requests themselves.
+//
+// Usage: test_hub [log_level]
+//
+// Failed checks are reported on stderr, and make the program exit with 1. The
+// results are reported as "TESTS <tests> <failed checks>".
+
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "esphome/core/preferences.h"
+#include "f88.h"
+#include "host_bus.h"
+#include "host_hub.h"
+#include "transceiver.h"
+
+using namespace esphome;
+using namespace esphome::opentherm;
+
+static unsigned tests = 0;
+static unsigned failures = 0;
+
+#define CHECK(condition) \
+    do { \
+        if (!(condition)) { \
+            fprintf(stderr, "%s:%d: check failed: %s\n", __FILE__, __LINE__, #condition); \
+            failures++; \
+        } \
+    } while (0)
+
+// Every test starts with a new hub at time 0, set up like by ESPHome
+#define TEST_HUB_SETUP() \
+    tests++; \
+    host_reset_time(); \
+    host_reset_preferences(); \
+    std::vector<Component*> components; \
+    HOST_CREATE_HUB(components)
+
+static void start_hub(const std::vector<Component*> &components) {
+    hub->setup();
+    for (auto *component : components) {
+        component->setup();
+    }
+}
+
+static void respond(OpenThermMessageID message_id, OpenThermMessageType type, uint16_t data,
+                    OpenThermResponseStatus status = OpenThermResponseStatus::SUCCESS) {
+    hub->set_current_request(message_id);
+    hub->process_response(OpenTherm::buildResponse(type, message_id, data), status);
+}
+
+static void time_out(OpenThermMessageID message_id) {
+    hub->set_current_request(message_id);
+    hub->process_response(0, OpenThermResponseStatus::TIMEOUT);
+}
+
+// Select the next repeating message a little later than the previous one
+static OpenThermMessageID next_message() {
+    host_advance_time_us(100000);
+    return hub->next_repeating_message();
+}
+
+// Run the loop of the hub like ESPHome does, every 16 ms
+static void run_hub(uint32_t ms) {
+    uint32_t end = millis() + ms;
+    while (millis() < end) {
+        hub->loop();
+        host_advance_time_us(16000);
+    }
+}
+
+// The simulated boiler, which answers every read with its data for the message
+// after a delay, every write with the written data, and the messages it doesn't
+// know with UNKNOWN_DATA_ID
+static uint16_t boiler_data[256];
+static bool boiler_unknown[256];
+static bool boiler_answers;
+static uint32_t boiler_delay_ms;
+
+static void reset_boiler() {
+    for (int i = 0; i < 256; i++) {
+        boiler_data[i] = 0;
+        boiler_unknown[i] = false;
+    }
+    boiler_answers = true;
+    boiler_delay_ms = 20;
+    host_bus_responder = [](uint32_t request, uint32_t &delay_ms, uint32_t &response) {
+        if (!boiler_answers) {
+            return false;
+        }
+        auto message_id = OpenTherm::getDataID(request);
+        bool read = OpenTherm::getMessageType(request) == OpenThermMessageType::READ_DATA;
+        if (boiler_unknown[message_id]) {
+            response = OpenTherm::buildResponse(OpenThermMessageType::UNKNOWN_DATA_ID, message_id, 0);
+        } else if (read) {
+            response = OpenTherm::buildResponse(OpenThermMessageType::READ_ACK, message_id, boiler_data[message_id]);
+        } else {
+            response = OpenTherm::buildResponse(OpenThermMessageType::WRITE_ACK, message_id, request & 0xFFFF);
+        }
+        delay_ms = boiler_delay_ms;
+        return true;
+    };
+}
+
+// Request every repeating message once, so none of them is new anymore
+static void request_all() {
+    for (size_t i = 0; i < hub->get_messages().size(); i++) {
+        hub->next_repeating_message();
+    }
+}
+
+static void test_schedule() {
+    TEST_HUB_SETUP()
+    #include "hub_config.h"
+    start_hub(components);
+
+    // Messages that were never requested go first, in the order they were added,
+    // with the bound of the setpoint after it
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::TSet);
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::MaxTSet);
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::Tboiler);
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::Toutside);
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::Status);
+
+    // A value with an interval of a minute waits for it, while the others are sent every cycle
+    bool toutside = false;
+    for (int i = 0; i < 100; i++) {
+        host_advance_time_us(100000);
+        toutside |= hub->next_repeating_message() == OpenThermMessageID::Toutside;
+    }
+    CHECK(!toutside);
+    host_advance_time_us(60000000);
+    for (int i = 0; i < 4; i++) {
+        toutside |= hub->next_repeating_message() == OpenThermMessageID::Toutside;
+    }
+    CHECK(toutside);
+
+    HOST_DELETE_HUB()
+}
+
+static void test_demotion_and_recovery() {
+    TEST_HUB_SETUP()
+    #include "hub_config.h"
+    start_hub(components);
+    request_all();
+
+    // A message the boiler doesn't know is demoted after three tries
+    for (int i = 0; i < 3; i++) {
+        CHECK(!hub->is_message_unsupported(OpenThermMessageID::Tboiler));
+        respond(OpenThermMessageID::Tboiler, OpenThermMessageType::UNKNOWN_DATA_ID, 0);
+    }
+    CHECK(hub->is_message_unsupported(OpenThermMessageID::Tboiler));
+
+    // A message that writes an input, like the setpoint, never is
+    for (int i = 0; i < 5; i++) {
+        respond(OpenThermMessageID::TSet, OpenThermMessageType::DATA_INVALID, 0);
+    }
+    CHECK(!hub->is_message_unsupported(OpenThermMessageID::TSet));
+
+    // While the boiler is gone, only the first missing response counts
+    respond(OpenThermMessageID::Status, OpenThermMessageType::READ_ACK, 0);
+    for (int i = 0; i < 5; i++) {
+        time_out(OpenThermMessageID::Toutside);
+    }
+    CHECK(!hub->is_message_unsupported(OpenThermMessageID::Toutside));
+
+    // Once it answers again, every message gets a new chance
+    respond(OpenThermMessageID::Status, OpenThermMessageType::READ_ACK, 0);
+    CHECK(!hub->is_message_unsupported(OpenThermMessageID::Tboiler));
+
+    HOST_DELETE_HUB()
+}
+
+static void test_dirty_write_through() {
+    TEST_HUB_SETUP()
+    #include "hub_config.h"
+    start_hub(components);
+    request_all();
+    host_advance_time_us(60000000);
+
+    // A changed setpoint is sent in the next slot, ahead of the overdue messages,
+    // and then the Status message, as its enable flags depend on the setpoint
+    t_set_number->make_call().set_value(50.0f).perform();
+    CHECK(next_message() == OpenThermMessageID::TSet);
+    CHECK((hub->build_request(OpenThermMessageID::TSet) & 0xFFFF) == (uint16_t) to_f88(50.0f));
+    CHECK(next_message() == OpenThermMessageID::Status);
+
+    // Publishing the same value isn't a change
+    t_set_number->make_call().set_value(50.0f).perform();
+    OpenThermMessageID message_id = next_message();
+    CHECK(message_id != OpenThermMessageID::TSet && message_id != OpenThermMessageID::Status);
+
+    // After two changed inputs in a row, a scheduled message gets a slot
+    t_set_number->make_call().set_value(51.0f).perform();
+    CHECK(next_message() == OpenThermMessageID::TSet);
+    t_set_number->make_call().set_value(52.0f).perform();
+    CHECK(next_message() == OpenThermMessageID::TSet);
+    t_set_number->make_call().set_value(53.0f).perform();
+    CHECK(next_message() != OpenThermMessageID::TSet);
+    CHECK(next_message() == OpenThermMessageID::TSet);
+
+    HOST_DELETE_HUB()
+}
+
+static void test_bounds() {
+    TEST_HUB_SETUP()
+    #include "hub_config.h"
+    start_hub(components);
+    request_all();
+    t_set_number->make_call().set_value(80.0f).perform();
+    hub->next_repeating_message();
+
+    // A lower maximum from the boiler clamps the setpoint, which is sent right away.
+    // With snapshot, the bound is applied at the end of the cycle.
+    respond(OpenThermMessageID::MaxTSet, OpenThermMessageType::READ_ACK, (uint16_t) to_f88(70.0f));
+    hub->complete_cycle();
+    CHECK(t_set_number->get_max_value() == 70.0f);
+    CHECK(t_set_number->state == 70.0f);
+    CHECK(hub->next_repeating_message() == OpenThermMessageID::TSet);
+    CHECK((hub->build_request(OpenThermMessageID::TSet) & 0xFFFF) == (uint16_t) to_f88(70.0f));
+
+    // A maximum below the minimum leaves no valid values and is ignored
+    respond(OpenThermMessageID::MaxTSet, OpenThermMessageType::READ_ACK, (uint16_t) to_f88(-10.0f));
+    hub->complete_cycle();
+    CHECK(t_set_number->get_max_value() == 70.0f);
+
+    HOST_DELETE_HUB()
+}
+
+static void test_snapshot() {
+    TEST_HUB_SETUP()
+    #include "hub_config.h"
+    start_hub(components);
+
+    // The values of a cycle are only published at its end, together
+    respond(OpenThermMessageID::Tboiler, OpenThermMessageType::READ_ACK, (uint16_t) to_f88(42.5f));
+    respond(OpenThermMessageID::Toutside, OpenThermMessageType::READ_ACK, (uint16_t) to_f88(-3.0f));
+    CHECK(!t_boiler_sensor->has_state());
+    CHECK(!t_outside_sensor->has_state());
+    hub->complete_cycle();
+    CHECK(t_boiler_sensor->state == 42.5f);
+    CHECK(t_outside_sensor->state == -3.0f);
+
+    // Unchanged values aren't published again
+    uint32_t publish_count = t_boiler_sensor->publish_count;
+    respond(OpenThermMessageID::Tboiler, OpenThermMessageType::READ_ACK, (uint16_t) to_f88(42.5f));
+    hub->complete_cycle();
+    CHECK(t_boiler_sensor->publish_count == publish_count);
+
+    HOST_DELETE_HUB()
+}
+
+static void test_persisted_capabilities() {
+    tests++;
+    host_reset_time();
+    host_reset_preferences();
+    reset_boiler();
+    boiler_data[OpenThermMessageID::SConfigSMemberIDcode] = 0x0001;
+    boiler_data[OpenThermMessageID::MaxTSet] = (uint16_t) to_f88(70.0f);
+    boiler_unknown[OpenThermMessageID::Toutside] = true;
+
+    // The first start learns the capabilities of the boiler: the bounds, and the
+    // messages it doesn't support after three tries a minute apart
+    {
+        std::vector<Component*> components;
+        HOST_CREATE_HUB(components)
+        #include "hub_config.h"
+        start_hub(components);
+        run_hub(150000);
+        CHECK(!hub->is_initializing());
+        CHECK(t_set_number->get_max_value() == 70.0f);
+        CHECK(hub->is_message_unsupported(OpenThermMessageID::Toutside));
+        HOST_DELETE_HUB()
+    }
+
+    // After a restart, the stored capabilities apply in the first loop, before
+    // the boiler answered anything, and the initial messages revalidate them
+    boiler_data[OpenThermMessageID::MaxTSet] = (uint16_t) to_f88(65.0f);
+    {
+        std::vector<Component*> components;
+        HOST_CREATE_HUB(components)
+        #include "hub_config.h"
+        start_hub(components);
+        hub->loop();
+        CHECK(t_set_number->get_max_value() == 70.0f);
+        CHECK(hub->is_message_unsupported(OpenThermMessageID::Toutside));
+        run_hub(30000);
+        CHECK(!hub->is_initializing());
+        CHECK(t_set_number->get_max_value() == 65.0f);
+        CHECK(hub->is_message_unsupported(OpenThermMessageID::Toutside));
+        HOST_DELETE_HUB()
+    }
+
+    // Another boiler drops them, and every message gets a new chance
+    boiler_data[OpenThermMessageID::SConfigSMemberIDcode] = 0x0002;
+    {
+        std::vector<Component*> components;
+        HOST_CREATE_HUB(components)
+        #include "hub_config.h"
+        start_hub(components);
+        hub->loop();
+        CHECK(hub->is_message_unsupported(OpenThermMessageID::Toutside));
+        run_hub(30000);
+        CHECK(!hub->is_message_unsupported(OpenThermMessageID::Toutside));
+        HOST_DELETE_HUB()
+    }
+
+    host_bus_responder = nullptr;
+}
+
+// The transceiver with access to the buffer of edges of deferred decoding, to
+// feed it edges the simulated bus doesn't produce
+class TestTransceiver : public OpenthermTransceiver {
+public:
+    void record_edge(uint32_t time, bool level) {
+        this->edges[this->edges_head & (EDGE_BUFFER_SIZE - 1)] = (time & ~1u) | level;
+        this->edges_head = this->edges_head + 1;
+    }
+};
+
+static const int IN_PIN = 4;
+static const int OUT_PIN = 5;
+static TestTransceiver *transceiver;
+
+static void IRAM_ATTR test_handle_interrupt() { transceiver->handle_interrupt(); }
+static void IRAM_ATTR test_handle_timer() { transceiver->handle_timer(); }
+
+// Send a request once the transceiver is ready, and run the bus until the exchange
+// is finished, returns false if it isn't within 2 seconds
+static bool exchange(uint32_t request, uint32_t &response, OpenThermResponseStatus &status) {
+    for (int i = 0; i < 2000 && !transceiver->is_ready(); i++) {
+        transceiver->process(response, status);
+        host_advance_time_us(1000);
+    }
+    if (!transceiver->send_request_async(request)) {
+        return false;
+    }
+    for (int i = 0; i < 2000; i++) {
+        host_advance_time_us(1000);
+        if (transceiver->process(response, status)) {
+            return true;
+        }
+    }
+    return false;
+}
+
+// Send a request the boiler doesn't answer, and record edges as if it did
+static OpenThermResponseStatus exchange_edges(const std::vector<std::pair<uint32_t, bool>> &edges) {
+    uint32_t response;
+    OpenThermResponseStatus status = OpenThermResponseStatus::NONE;
+    boiler_answers = false;
+    for (int i = 0; i < 2000 && !transceiver->is_ready(); i++) {
+        transceiver->process(response, status);
+        host_advance_time_us(1000);
+    }
+    transceiver->send_request_async(OpenTherm::buildRequest(OpenThermMessageType::READ_DATA, OpenThermMessageID::Status, 0));
+    host_advance_time_us(OPENTHERM_FRAME_US + 1000);
+    uint32_t start = micros() + 20000;
+    for (auto &edge : edges) {
+        transceiver->record_edge(start + edge.first, edge.second);
+    }
+    host_advance_time_us(50000);
+    if (!transceiver->process(response, status)) {
+        status = OpenThermResponseStatus::NONE;
+    }
+    boiler_answers = true;
+    return status;
+}
+
+static void test_decoding() {
+    tests++;
+    host_reset_time();
+    reset_boiler();
+    boiler_data[OpenThermMessageID::Tboiler] = (uint16_t) to_f88(42.5f);
+    uint32_t request = OpenTherm::buildRequest(OpenThermMessageType::READ_DATA, OpenThermMessageID::Tboiler, 0);
+    uint32_t expected = OpenTherm::buildResponse(OpenThermMessageType::READ_ACK, OpenThermMessageID::Tboiler, boiler_data[OpenThermMessageID::Tboiler]);
+    uint32_t response;
+    OpenThermResponseStatus status;
+
+    // Both decoders receive the response with the delay until its start, also
+    // when the interrupt is delayed by other components
+    for (bool deferred : { false, true }) {
+        transceiver = new TestTransceiver();
+        transceiver->set_deferred_decoding(deferred);
+        CHECK(transceiver->setup(IN_PIN, OUT_PIN, test_handle_interrupt, test_handle_timer));
+        for (uint32_t latency : { 0, 100, 200 }) {
+            host_bus_interrupt_latency_us = latency;
+            CHECK(exchange(request, response, status));
+            CHECK(status == OpenThermResponseStatus::SUCCESS);
+            CHECK(response == expected);
+            CHECK(transceiver->get_response_delay() >= 20000 && transceiver->get_response_delay() <= 20000 + latency + 2);
+        }
+        host_bus_interrupt_latency_us = 0;
+
+        // A missing response times out a second after the end of the request
+        boiler_answers = false;
+        CHECK(exchange(request, response, status));
+        CHECK(status == OpenThermResponseStatus::TIMEOUT);
+        boiler_answers = true;
+
+        transceiver->end();
+        delete transceiver;
+    }
+
+    // The deferred decoder rejects edges that can't be a valid frame
+    transceiver = new TestTransceiver();
+    transceiver->set_deferred_decoding(true);
+    transceiver->setup(IN_PIN, OUT_PIN, test_handle_interrupt, test_handle_timer);
+    // Starting with an idle level
+    CHECK(exchange_edges({ { 0, false } }) == OpenThermResponseStatus::INVALID);
+    // Two edges with the same level after the start bit, one got lost
+    CHECK(exchange_edges({ { 0, true }, { 500, false }, { 1500, false } }) == OpenThermResponseStatus::INVALID);
+    // A glitch shorter than a quarter bit
+    CHECK(exchange_edges({ { 0, true }, { 100, false } }) == OpenThermResponseStatus::INVALID);
+    // More edges than the buffer holds before the loop decodes them
+    std::vector<std::pair<uint32_t, bool>> edges;
+    for (uint32_t i = 0; i <= EDGE_BUFFER_SIZE; i++) {
+        edges.push_back({ i * 500, i % 2 == 0 });
+    }
+    CHECK(exchange_edges(edges) == OpenThermResponseStatus::INVALID);
+    // A start bit that isn't followed by the rest of the frame times out a second
+    // after its last edge
+    CHECK(exchange_edges({ { 0, true }, { 500, false } }) == OpenThermResponseStatus::NONE);
+    host_advance_time_us(OPENTHERM_RESPONSE_TIMEOUT_US - 40000);
+    CHECK(!transceiver->process(response, status));
+    host_advance_time_us(20000);
+    CHECK(transceiver->process(response, status));
+    CHECK(status == OpenThermResponseStatus::TIMEOUT);
+    transceiver->end();
+    delete transceiver;
+    transceiver = nullptr;
+
+    host_bus_responder = nullptr;
+}
+
+int main(int argc, char **argv) {
+    host_log_level = argc > 1 ? atoi(argv[1]) : ESPHOME_LOG_LEVEL_NONE;
+
+    test_schedule();
+    test_demotion_and_recovery();
+    test_dirty_write_through();
+    test_bounds();
+    test_snapshot();
+    test_persisted_capabilities();
+    test_decoding();
+
+    printf("TESTS %u %u\n", tests, failures);
+    return failures > 0 ? 1 : 0;
+}
@@ -0,0 +1,56 @@
+"""Fixtures for the tests, which build the programs in host/ for the test
+configuration of the hub. ESPHome generates its code, like for the benchmarks,
+so the tests are skipped without it.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "components"))
+
+# The configuration and programs are written here, like those of the fuzzer
+TEST_DIR = os.path.join(ROOT, "examples", ".esphome", "tests")
+
+# The entities host/test_hub.cpp refers to
+TEST_OPTIONS = """\
+opentherm:
+  snapshot: true
+  persist_capabilities: true
+
+number:
+  - platform: opentherm
+    t_set:
+      name: "t_set"
+      auto_max_value: true
+
+sensor:
+  - platform: opentherm
+    t_boiler:
+      name: "t_boiler"
+      update_interval: 0s
+    t_outside:
+      name: "t_outside"
+      update_interval: 60s
+"""
+
+
+@pytest.fixture(scope="session")
+def build_program():
+    """Build a program of host/ for the test configuration, by name."""
+    if shutil.which("esphome") is None:
+        pytest.skip("ESPHome is needed to generate the code of the hub")
+    # These import ESPHome, so only once it is known to be there
+    import benchmark_bus
+    import benchmark_size
+
+    os.makedirs(TEST_DIR, exist_ok=True)
+    config = os.path.join(TEST_DIR, "test-hub.yaml")
+    with open(config, "w") as f:
+        f.write(benchmark_size.BASE_CONFIG.format(name="test-hub", components=os.path.join(ROOT, "components")) + TEST_OPTIONS)
+    cxx = os.environ.get("CXX", "g++")
+    return lambda program: benchmark_bus.build_driver(config, os.path.join(TEST_DIR, "build"), cxx, program)
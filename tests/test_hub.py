@@ -0,0 +1,11 @@
+import re
+import subprocess
+
+
+def test_hub(build_program):
+    """Run the unit tests of the hub in host/test_hub.cpp."""
+    program = build_program("test_hub")
+    res = subprocess.run([program], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    assert res.returncode == 0, res.stdout
+    match = re.search(r"^TESTS (\d+) 0$", res.stdout, re.MULTILINE)
+    assert match is not None and int(match.group(1)) > 0, res.stdout
@@ -0,0 +1,93 @@
+"""Check that message_data.py parses and writes the data of messages like the
+functions of hub.cpp, which host/codec.cpp runs, and that its NumPy batch
+decoding gives the same values as decoding frame by frame.
+"""
+
+import random
+import subprocess
+from typing import Dict, List
+
+import pytest
+
+# The opentherm package is an ESPHome component, and imports ESPHome itself
+pytest.importorskip("esphome")
+
+from opentherm import message_data, schema  # noqa: E402
+
+FORMATS = (
+    [f"flag8_{byte}_{bit}" for byte in ("lb", "hb") for bit in range(8)]
+    + [f"{kind}_{byte}{scale}" for kind in ("u8", "s8") for byte in ("lb", "hb") for scale in ("", "_60") if not (kind == "s8" and scale)]
+    + ["u16", "s16", "f88"]
+)
+
+# Data with the edge cases of every format, and some at random
+SAMPLE_DATA = [0x0000, 0x0001, 0x007F, 0x0080, 0x00FF, 0x0100, 0x7F7F, 0x7FFF, 0x8000, 0x8080, 0xFF00, 0xFFFF] + [
+    random.Random(1).randrange(0x10000) for _ in range(100)
+]
+
+# Values in the range of the type of every format, as the hub converts them
+# before writing. f88 values outside its range saturate, and values between two
+# steps are rounded.
+SAMPLE_VALUES: Dict[str, List[float]] = {
+    "flag8": [0, 1],
+    "u8": [0, 1, 127, 128, 255],
+    "s8": [-128, -1, 0, 1, 127],
+    "u16": [0, 1, 32768, 65535],
+    "s16": [-32768, -1, 0, 1, 32767],
+    "f88": [-1000, -128.5, -128, -21.5, -0.5, -0.001953125, 0, 0.001953125, 0.00390625, 21.5, 60.25, 127.99, 127.998046875, 128, 1000],
+}
+
+
+def run_codec(program: str, operations: List[str]) -> List[str]:
+    res = subprocess.run([program], input="".join(f"{operation}\n" for operation in operations), stdout=subprocess.PIPE, text=True, check=True)
+    return res.stdout.splitlines()
+
+
+@pytest.fixture(scope="module")
+def codec(build_program):
+    return build_program("codec")
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_parse(codec, fmt):
+    results = run_codec(codec, [f"parse {fmt} {data}" for data in SAMPLE_DATA])
+    for data, result in zip(SAMPLE_DATA, results):
+        assert float(message_data.parse(fmt, data)) == float(result), f"{fmt} of {data:04x}"
+
+
+@pytest.mark.parametrize("fmt", [fmt for fmt in FORMATS if not fmt.endswith("_60")])
+def test_write(codec, fmt):
+    values = SAMPLE_VALUES[message_data.parse_format(fmt).kind]
+    cases = [(value, data) for value in values for data in SAMPLE_DATA[:12]]
+    results = run_codec(codec, [f"write {fmt} {value!r} {data}" for value, data in cases])
+    for (value, data), result in zip(cases, results):
+        assert message_data.write(fmt, value, data) == int(result), f"{fmt} of {value} into {data:04x}"
+
+
+@pytest.mark.parametrize("schema_name", ["SENSORS", "BINARY_SENSORS", "SWITCHES", "INPUTS"])
+def test_decode_frames(schema_name):
+    np = pytest.importorskip("numpy")
+    schema_ = getattr(schema, schema_name)
+
+    # Frames for the messages of the schema and others, with every message type,
+    # half of them with a valid parity bit and half with a random one
+    rng = random.Random(2)
+    msg_ids = sorted({message_data.MESSAGE_IDS[entity["message"]] for entity in schema_.values()})
+    frames = []
+    for i in range(20000):
+        msg_type = rng.randrange(8)
+        msg_id = rng.choice(msg_ids) if rng.random() < 0.8 else rng.randrange(0x100)
+        frame = message_data.build_frame(msg_type, msg_id, rng.randrange(0x10000))
+        if i % 2:
+            frame = (frame & 0x7fffffff) | (rng.randrange(2) << 31)
+        frames.append(frame)
+
+    values = message_data.decode_frames(np.array(frames, dtype=np.uint32), schema_)
+    assert set(values) == set(schema_)
+    for i, frame in enumerate(frames):
+        decoded = message_data.decode_frame(frame, schema_)
+        for key, array in values.items():
+            if key in decoded:
+                assert array[i] == float(decoded[key]), f"{key} of {frame:08x}"
+            else:
+                assert np.isnan(array[i]), f"{key} of {frame:08x}"